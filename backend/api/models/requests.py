@@ -2,43 +2,91 @@ from pydantic import BaseModel
 from typing import Optional, List
 
 class BugAnalysisRequest(BaseModel):
-    code: str
+    code: Optional[str] = None
+    code_ref: Optional[str] = None  # Hash returned by POST /code, instead of code
     model_choice: str = "gpt-4o"
+    compact: Optional[bool] = None  # Strip comments/docstrings before prompting; None = per-type default
+    structured: bool = False  # Ask for JSON findings (returned in ``findings``) instead of free text
     
 class ExplanationRequest(BaseModel):
-    code:str
+    code: Optional[str] = None
+    code_ref: Optional[str] = None  # Hash returned by POST /code, instead of code
     model_choice :str = "gpt-4o"
     
 class OptimizationRequest(BaseModel):
-    code: str
+    code: Optional[str] = None
+    code_ref: Optional[str] = None  # Hash returned by POST /code, instead of code
+    model_choice: str = "gpt-4o"
+    compact: Optional[bool] = None
+    diff_only: bool = False  # Ask for a unified diff and patch the file server-side (full rewrite if it does not apply)
+    
+class OptimizationVerifyRequest(BaseModel):
+    code: Optional[str] = None
+    code_ref: Optional[str] = None  # Hash returned by POST /code, instead of code
     model_choice: str = "gpt-4o"
+    compact: Optional[bool] = None
+    diff_only: bool = False
+    optimized_code: Optional[str] = None  # Benchmark this version instead of optimizing first
+    function: Optional[str] = None  # Top-level function to compare; default: those both versions define
+    inputs: Optional[list] = None  # Argument lists or {"args": [...], "kwargs": {...}}; default: generated
     
 class EdgeCaseRequest(BaseModel):
-    code:str
+    code: Optional[str] = None
+    code_ref: Optional[str] = None  # Hash returned by POST /code, instead of code
     model_choice : str ="gpt-4o"
+    compact: Optional[bool] = None
+    structured: bool = False
+    run_tests: bool = False  # Run the generated pytest cases in the sandbox (SANDBOX_ENABLED; not with structured)
     
 class UnitTestRequest(BaseModel):
-    code:str
+    code: Optional[str] = None
+    code_ref: Optional[str] = None  # Hash returned by POST /code, instead of code
     model_choice : str = "gpt-4o"
+    compact: Optional[bool] = None
+    run_tests: bool = False  # Run the generated tests against the code in the sandbox (SANDBOX_ENABLED)
     
 class ConversationalRequest(BaseModel):
-    code:str
+    code: Optional[str] = None
+    code_ref: Optional[str] = None  # Hash returned by POST /code, instead of code
     question: str
     session_id: str
     model_choice: str = "gpt-4o"
+    bypass_cache: Optional[bool] = None  # True/False turns the response cache off/on for this session
     
 class ProjectChatRequest(BaseModel):
     question: str
     file_index: Optional[int] = None  # 0=first file, 1=second file, None=entire project
     session_id: str = "default"
     model_choice: str = "gpt-4o"
+    bypass_cache: Optional[bool] = None  # True/False turns the response cache off/on for this session
 
 class ProjectAnalysisRequest(BaseModel):
     file_index: int  # Required for file-specific analysis
     analysis_type: str  # "bugs", "optimize", "explain", "tests", "edge-cases"
     model_choice: str = "gpt-4o"
+    include_dependency_context: bool = True  # Attach summaries of imported project modules
+    compact: Optional[bool] = None  # None = CODE_COMPACTION_TYPES default for the analysis type
+    structured: bool = False  # JSON findings; "bugs" and "edge-cases" only
+    
+class ProjectScanRequest(BaseModel):
+    analysis_type: str = "bugs"  # "bugs" or "edge-cases"
+    file_indices: Optional[List[int]] = None  # None = every file
+    model_choice: str = "gpt-4o"
+    cascade: bool = True  # Triage with a small model first, escalate only suspicious regions
+    triage_model: Optional[str] = None  # Defaults to SCAN_TRIAGE_MODEL
+    pack: bool = True  # Put several small files into one prompt
+    compact: Optional[bool] = None  # Compact files before triage/analysis; None = per-type default
+    structured: bool = False  # Return JSON findings per file, merged across packed/escalated calls
     
 class GitHubRequest(BaseModel):
     repo_url: str
     model_choice: str = "gpt-4o"
 
+
+class ProjectExplainRequest(BaseModel):
+    model_choice: str = "gpt-4o"
+    include_file_summaries: bool = False
+
+
+class CodeRegisterRequest(BaseModel):
+    code: str
@@ -6,30 +6,75 @@ class AnalysisResponse(BaseModel):
     result: str
     execution_time: float
     model_used: str
+    prompt_tokens: Optional[int] = None  # LLM token usage of this request; None when no model was called
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    findings: Optional[List[list]] = None  # Structured mode: one row per finding, fields as in finding_fields
+    finding_fields: Optional[List[str]] = None
     
 class ExplanationResponse(BaseModel):
     status: str
     explanation: str  
     execution_time: float
     model_used: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
     
 class OptimizationResponse(BaseModel):
     status: str
     optimized_code : str
     execution_time: float
     model_used: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    patch: Optional[str] = None  # Diff mode: unified diff from the original; optimized_code is then the patched file
+    patch_applied: Optional[bool] = None  # Diff mode: False when the answer fell back to a full rewrite
+    syntax_valid: Optional[bool] = None  # Every python block compiles (after repair); None when nothing was checked
+    syntax_repairs: Optional[int] = None  # Broken blocks fixed by a targeted repair instead of a regeneration
+    
+class OptimizationVerifyResponse(BaseModel):
+    status: str
+    optimized_code: str
+    execution_time: float
+    model_used: Optional[str] = None  # None when optimized_code was supplied
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    equivalent: Optional[bool] = None  # Both versions agreed on every input; None when nothing ran
+    speedup: Optional[float] = None  # Geometric mean over inputs of original / optimized median time per call
+    # {"status", "equivalent", "speedup", "significant", "max_memory_delta", "inputs_measured", "wall_time",
+    #  "functions": [{"function", "status", "inputs": [{"label", "status", "equivalent", "number", "repeats",
+    #  "original": {...}, "optimized": {...}, "speedup", "significant", "memory_peak_original",
+    #  "memory_peak_optimized", "memory_delta"}]}]}; timings in seconds per call, memory in bytes
+    benchmark: dict
     
 class EdgeCaseResponse(BaseModel):
     status: str
     edge_case_analysis: str
     execution_time: float
     model_used: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    findings: Optional[List[list]] = None
+    finding_fields: Optional[List[str]] = None
+    # run_tests: {"status", "passed", "failed", "errors", "skipped", "duration", "files": [...],
+    #             "tests": [{"file", "test", "outcome", "duration", "message"}]}
+    test_results: Optional[dict] = None
     
 class UnitTestResponse(BaseModel):
     status : str
     unit_tests : str
     execution_time: float
     model_used: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    syntax_valid: Optional[bool] = None
+    syntax_repairs: Optional[int] = None
+    test_results: Optional[dict] = None
     
 class ConversationalResponse(BaseModel):
     status: str
@@ -37,6 +82,10 @@ class ConversationalResponse(BaseModel):
     session_id: str
     execution_time: float
     model_used: str
+    cached: bool = False  # Answer served from the chat response cache
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
     
 class ProjectUploadResponse(BaseModel):
     status: str
@@ -44,6 +93,7 @@ class ProjectUploadResponse(BaseModel):
     project_name: str
     total_files: int
     files: List[dict]  # [{"index": 0, "name": "main.py", "path": "main.py", "size": 1234}]
+    ranked_files: List[int] = []  # File indices by analysis priority (centrality, size, complexity)
 
 class ProjectChatResponse(BaseModel):
     status: str
@@ -52,6 +102,10 @@ class ProjectChatResponse(BaseModel):
     session_id: str
     execution_time: float
     project_id: str
+    cached: bool = False  # Answer served from the chat response cache
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
 
 class ProjectFileAnalysisResponse(BaseModel):
     status: str
@@ -62,6 +116,26 @@ class ProjectFileAnalysisResponse(BaseModel):
     result: str
     execution_time: float
     model_used: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    findings: Optional[List[list]] = None
+    finding_fields: Optional[List[str]] = None
+    syntax_valid: Optional[bool] = None  # "optimize" and "tests" only
+    syntax_repairs: Optional[int] = None
+
+class ProjectScanResponse(BaseModel):
+    status: str
+    project_id: str
+    analysis_type: str
+    results: List[dict]  # [{"file_index", "path", "status": "clean"|"escalated"|"analyzed"|"reused", "result", "regions", "units", "packed", "findings"}]
+    report: dict  # Token usage and estimated cost/latency against a single-model run
+    execution_time: float
+    model_used: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    finding_fields: Optional[List[str]] = None  # Field order of each result's "findings" rows (structured mode)
 
 class GitHubAnalysisResponse(BaseModel):
     status: str
@@ -70,4 +144,36 @@ class GitHubAnalysisResponse(BaseModel):
     project_id: str
     total_files: int
     files: List[dict]
-    download_time: float
\ No newline at end of file
+    download_time: float
+
+class ProjectSymbolsResponse(BaseModel):
+    status: str
+    project_id: str
+    query: Optional[str] = None
+    file_index: Optional[int] = None
+    stats: dict
+    definitions: List[dict]  # [{"file_index": 0, "path": "main.py", "line": 12, "kind": "function", "scope": None}]
+    references: List[dict]
+    calls: List[dict]
+    imports: List[dict]  # [{"from_path": "main.py", "module": "utils", "to_path": "utils.py", "line": 3}]
+
+class ProjectExplanationResponse(BaseModel):
+    status: str
+    project_id: str
+    overview: str
+    packages: dict  # {"pkg/sub": "summary", ...}
+    files: Optional[dict] = None  # {"pkg/sub/mod.py": "summary", ...} when requested
+    llm_calls: int
+    cache_hits: int
+    execution_time: float
+    model_used: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+
+
+class CodeRegisterResponse(BaseModel):
+    status: str
+    code_ref: str  # Send as code_ref in later analysis and chat requests
+    size: int
+    lines: int
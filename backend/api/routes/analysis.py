@@ -1,9 +1,7 @@
 # backend/api/routes/analysis.py
 from fastapi import APIRouter, HTTPException
-from langchain_openai import ChatOpenAI
 import time
 import os
-from langchain_openai import ChatOpenAI
 from google.cloud import firestore
 from langchain_google_firestore import FirestoreChatMessageHistory
 from core.chains.bug_chains import get_bugchains
@@ -13,11 +11,62 @@ from core.chains.edgecases_chain import get_edge_case_chains
 from core.chains.unittest import unittestchains
 # from api.routes.projects import get_file_content, projects_storage
 from core.chains.conversational import conversational_agent
-from api.models.requests import BugAnalysisRequest,ExplanationRequest, OptimizationRequest, EdgeCaseRequest, UnitTestRequest, ConversationalRequest
-from api.models.responses import AnalysisResponse, ExplanationResponse, OptimizationResponse, EdgeCaseResponse, UnitTestResponse, ConversationalResponse
+from core.minhash_index import analysis_index
+from core.llm_scheduler import PRIORITY_ANALYSIS, track_usage, usage_stats
+from core.model_router import run_routed, route_stats
+from core.tokenizer import count_tokens
+from core.code_compactor import compact_for_analysis, compaction_stats
+from core.code_patcher import apply_unified_diff, diff_stats, make_unified_diff
+from core.code_repair import validate_generated_code, repair_stats
+from core.test_runner import run_generated_tests
+from core.optimization_benchmark import benchmark_optimization
+from core.sandbox import SANDBOX_ENABLED
+from core.findings import FINDING_FIELDS, findings_from_wire, findings_to_wire, read_findings, render_findings
+from core.code_store import code_store, resolve_code, describe_code
+from api.models.requests import BugAnalysisRequest,ExplanationRequest, OptimizationRequest, OptimizationVerifyRequest, EdgeCaseRequest, UnitTestRequest, ConversationalRequest, CodeRegisterRequest
+from api.models.responses import AnalysisResponse, ExplanationResponse, OptimizationResponse, OptimizationVerifyResponse, EdgeCaseResponse, UnitTestResponse, ConversationalResponse, CodeRegisterResponse
 
 router = APIRouter()
 
+
+def resolve_request_code(request) -> str:
+    """Code sent inline or by ``code_ref``; 404 when the reference is unknown so clients re-register"""
+    try:
+        return resolve_code(request.code, request.code_ref)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown code_ref {request.code_ref}; register the code with POST /code")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post("/code", response_model=CodeRegisterResponse)
+async def register_code(request: CodeRegisterRequest):
+    """Register code once; later analysis and chat requests can send its code_ref instead"""
+    try:
+        code_store.register(request.code)
+        return CodeRegisterResponse(status="success", **describe_code(request.code))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Code registration failed: {str(e)}"
+        )
+
+
+@router.get("/routing/stats")
+async def routing_stats():
+    """Calls, escalations and latency per analysis type and route for model_choice=auto"""
+    return {"status": "success", "routes": route_stats.stats()}
+
+
+@router.get("/usage/stats")
+async def usage_statistics():
+    """Token usage and provider prefix-cache hit ratio (cached_tokens / prompt_tokens) per model,
+    the tokens saved by code compaction per analysis type, diff-mode optimize outcomes, and the
+    full regenerations avoided by repairing generated code that did not compile"""
+    return {"status": "success", "models": usage_stats(), "compaction": compaction_stats.stats(),
+            "optimize_diff": diff_stats.stats(), "syntax_repair": repair_stats.stats()}
+
+
 #Bug analysis endpoint
 @router.post("/analyze/bugs", response_model=AnalysisResponse)
 async def analyze_bugs(request: BugAnalysisRequest):
@@ -29,27 +78,62 @@ async def analyze_bugs(request: BugAnalysisRequest):
             raise HTTPException(status_code=500, detail="OpenAI API key not configured")
         
         start_time = time.time()
+        code = resolve_request_code(request)
+        
+        # Reuse stored findings for the same code analyzed before; findings point at lines, so a
+        # near-duplicate (e.g. the file with the bug just fixed) is analyzed afresh
+        reuse_key = "bugs:findings" if request.structured else "bugs"
+        reused = analysis_index.lookup(code, reuse_key, exact_only=True)
+        if reused:
+            findings = findings_from_wire(reused["result"]) if request.structured else None
+            return AnalysisResponse(
+                status="success",
+                result=render_findings(findings) if request.structured else reused["result"],
+                execution_time=time.time() - start_time,
+                model_used=reused["model_used"],
+                findings=findings_to_wire(findings) if request.structured else None,
+                finding_fields=FINDING_FIELDS if request.structured else None
+            )
         
         # Use your existing dynamic bug detection
-        llm = ChatOpenAI(
-            temperature=0, 
-            model=request.model_choice,
-            openai_api_key=openai_api_key
-        )
-        bug_chain = get_bugchains(llm, request.code, use_dynamic=True)
-        
-        # Run analysis
-        result = bug_chain.invoke({"code": request.code})
-        
+        # model_choice="auto" picks a model by code size/complexity and escalates a weak first pass
+        # Comments, docstrings and blank lines are dropped per analysis type; findings are mapped back
+        # to original line numbers (see core.code_compactor)
+        compacted = compact_for_analysis(code, "bugs", request.compact)
+        with track_usage() as usage:
+            result, model_used = await run_routed(
+                "bugs", compacted.text, request.model_choice,
+                lambda llm: get_bugchains(llm, code, use_dynamic=True, structured=request.structured),
+                {"code": compacted.numbered() if request.structured else compacted.text}, PRIORITY_ANALYSIS,
+                openai_api_key=openai_api_key
+            )
+        
+        # Structured mode: JSON findings on the original line numbers the code was shown with,
+        # de-duplicated; a model that ignored the format falls back to the text result
+        findings = read_findings(result) if request.structured else None
+        if findings is not None:
+            result = render_findings(findings)
+            analysis_index.record(code, "bugs:findings", findings_to_wire(findings), model_used)
+        else:
+            if not request.structured:
+                result = compacted.remap(result)
+                analysis_index.record(code, "bugs", result, model_used)
         execution_time = time.time() - start_time
         
         return AnalysisResponse(
             status="success",
             result=result,
             execution_time=execution_time,
-            model_used=request.model_choice
+            model_used=model_used,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens,
+            findings=findings_to_wire(findings) if findings is not None else None,
+            finding_fields=FINDING_FIELDS if findings is not None else None
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -67,27 +151,42 @@ async def explain_code(request: ExplanationRequest):
             raise HTTPException(status_code=500, detail="OpenAI API key not configured")
         
         start_time = time.time()
+        code = resolve_request_code(request)
+        
+        # Reuse stored findings for a near-identical unit analyzed before
+        reused = analysis_index.lookup(code, "explain")
+        if reused:
+            return ExplanationResponse(
+                status="success",
+                explanation=reused["result"],
+                execution_time=time.time() - start_time,
+                model_used=reused["model_used"]
+            )
         
         # Use your existing dynamic explanation chain
-        llm = ChatOpenAI(
-            temperature=0, 
-            model=request.model_choice,
-            openai_api_key=openai_api_key
-        )
-        explanation_chain = get_explanationchains(llm, request.code, use_dynamic=True)
-        
-        # Run analysis
-        result = explanation_chain.invoke({"code": request.code})
+        # model_choice="auto" picks a model by code size/complexity and escalates a weak first pass
+        with track_usage() as usage:
+            result, model_used = await run_routed(
+                "explain", code, request.model_choice,
+                lambda llm: get_explanationchains(llm, code, use_dynamic=True),
+                {"code": code}, PRIORITY_ANALYSIS, openai_api_key=openai_api_key
+            )
         
         execution_time = time.time() - start_time
+        analysis_index.record(code, "explain", result, model_used)
         
         return ExplanationResponse(
             status="success",
             explanation=result,
             execution_time=execution_time,
-            model_used=request.model_choice
+            model_used=model_used,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -104,33 +203,131 @@ async def optimize_code(request: OptimizationRequest):
             raise HTTPException(status_code=500, detail="OpenAI API key not configured")
         
         start_time = time.time()
+        code = resolve_request_code(request)
+        
+        # Reuse the stored rewrite for the same code optimized before
+        reused = analysis_index.lookup(code, "optimize:diff" if request.diff_only else "optimize", exact_only=True)
+        if reused:
+            return OptimizationResponse(
+                status="success",
+                optimized_code=reused["result"]["code"] if request.diff_only else reused["result"],
+                execution_time=time.time() - start_time,
+                model_used=reused["model_used"],
+                patch=reused["result"]["patch"] if request.diff_only else None,
+                patch_applied=True if request.diff_only else None
+            )
         
         # Use your existing dynamic explanation chain
-        llm = ChatOpenAI(
-            temperature=0, 
-            model=request.model_choice,
-            openai_api_key=openai_api_key
-        )
-        optimization_chain= get_optimized_chains(llm, request.code, use_dynamic=True)
-        
-        # Run analysis
-        result = optimization_chain.invoke({"code": request.code})
-        
+        # model_choice="auto" picks a model by code size/complexity and escalates a weak first pass
+        compacted = compact_for_analysis(code, "optimize", request.compact)
+        patch = checked = None
+        with track_usage() as usage:
+            result, model_used = await run_routed(
+                "optimize", compacted.text, request.model_choice,
+                lambda llm: get_optimized_chains(llm, code, use_dynamic=True, diff=request.diff_only),
+                {"code": compacted.text}, PRIORITY_ANALYSIS, openai_api_key=openai_api_key
+            )
+            
+            # Diff mode: the model writes only the changed lines and the original file is patched here;
+            # an answer that does not apply costs one full rewrite
+            if request.diff_only:
+                patched = apply_unified_diff(code, result, compacted.original_line)
+                diff_stats.record(patched, usage.completion_tokens, count_tokens(patched.code or ""))
+                if patched.applied:
+                    patch = make_unified_diff(code, patched.code)
+                else:
+                    result, model_used = await run_routed(
+                        "optimize", compacted.text, request.model_choice,
+                        lambda llm: get_optimized_chains(llm, code, use_dynamic=True),
+                        {"code": compacted.text}, PRIORITY_ANALYSIS, openai_api_key=openai_api_key
+                    )
+            
+            # A rewrite that does not compile gets its broken regions repaired, not a second full run
+            # (an applied patch was already checked by the patcher)
+            if patch is None:
+                checked = await validate_generated_code(result, model_used, PRIORITY_ANALYSIS,
+                                                        usage.prompt_tokens + usage.completion_tokens,
+                                                        openai_api_key=openai_api_key)
+                result = checked.text
+        
+        if patch is not None:
+            result = patched.code
+            analysis_index.record(code, "optimize:diff", {"code": result, "patch": patch}, model_used)
+        elif checked.valid:
+            # Generated code is returned as written: line references in it are code, not prose to remap
+            analysis_index.record(code, "optimize", result, model_used)
         execution_time = time.time() - start_time
         
         return OptimizationResponse(
             status="success",
             optimized_code=result,
             execution_time=execution_time,
-            model_used=request.model_choice
+            model_used=model_used,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens,
+            patch=patch,
+            patch_applied=patch is not None if request.diff_only else None,
+            syntax_valid=checked.valid if checked and checked.blocks else None,
+            syntax_repairs=checked.repaired if checked else None
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, 
             detail=f"Code Optimization failed: {str(e)}"
         )
         
+async def verify_optimization(request: OptimizationVerifyRequest):
+    """Optimize code (or take the given optimized version) and measure it against the original in the sandbox
+
+    This executes request-supplied code, so the route exists only when the
+    sandbox is enabled (SANDBOX_ENABLED; see ``core.sandbox.SandboxPool``).
+    """
+    try:
+        start_time = time.time()
+        code = resolve_request_code(request)
+        
+        optimization = None
+        optimized_code = request.optimized_code
+        if optimized_code is None:
+            optimization = await optimize_code(OptimizationRequest(
+                code=code, model_choice=request.model_choice, compact=request.compact, diff_only=request.diff_only
+            ))
+            optimized_code = optimization.optimized_code
+        
+        # The claimed speedup, measured: equivalence on every input first, then repeated timed runs of both
+        benchmark = await benchmark_optimization(code, optimized_code, request.function, request.inputs)
+        
+        return OptimizationVerifyResponse(
+            status="success",
+            optimized_code=optimized_code,
+            execution_time=time.time() - start_time,
+            model_used=optimization.model_used if optimization else None,
+            prompt_tokens=optimization.prompt_tokens if optimization else None,
+            completion_tokens=optimization.completion_tokens if optimization else None,
+            cached_tokens=optimization.cached_tokens if optimization else None,
+            equivalent=benchmark.get("equivalent"),
+            speedup=benchmark.get("speedup"),
+            benchmark=benchmark
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Optimization verification failed: {str(e)}"
+        )
+
+
+# Running request-supplied code is opt-in: without SANDBOX_ENABLED the route is not registered at all
+if SANDBOX_ENABLED:
+    router.add_api_route("/analyze/optimize/verify", verify_optimization, methods=["POST"],
+                         response_model=OptimizationVerifyResponse)
+        
 @router.post("/analyze/edgecase", response_model=EdgeCaseResponse)
 async def edge_case(request: EdgeCaseRequest):
     """Generate Edge Cases That Can Break Code using dynamic AI chains"""
@@ -140,28 +337,68 @@ async def edge_case(request: EdgeCaseRequest):
         if not openai_api_key:
             raise HTTPException(status_code=500, detail="OpenAI API key not configured")
         
+        # Findings rows are not runnable tests
+        if request.structured and request.run_tests:
+            raise HTTPException(status_code=422, detail="run_tests needs the text result; it cannot be combined with structured")
+        
         start_time = time.time()
+        code = resolve_request_code(request)
+        
+        # Reuse stored findings for the same code analyzed before
+        reuse_key = "edge-cases:findings" if request.structured else "edge-cases"
+        reused = analysis_index.lookup(code, reuse_key, exact_only=True)
+        if reused:
+            findings = findings_from_wire(reused["result"]) if request.structured else None
+            result = render_findings(findings, empty="No unhandled edge cases found.") if request.structured else reused["result"]
+            return EdgeCaseResponse(
+                status="success",
+                edge_case_analysis=result,
+                execution_time=time.time() - start_time,
+                model_used=reused["model_used"],
+                findings=findings_to_wire(findings) if request.structured else None,
+                finding_fields=FINDING_FIELDS if request.structured else None,
+                test_results=await run_generated_tests(code, result) if request.run_tests else None
+            )
         
         # Use your existing dynamic explanation chain
-        llm = ChatOpenAI(
-            temperature=0, 
-            model=request.model_choice,
-            openai_api_key=openai_api_key
-        )
-        edgecases_chain = get_edge_case_chains(llm, request.code, use_dynamic=True)
-        
-        # Run analysis
-        result = edgecases_chain.invoke({"code": request.code})
-        
+        # model_choice="auto" picks a model by code size/complexity and escalates a weak first pass
+        compacted = compact_for_analysis(code, "edge-cases", request.compact)
+        with track_usage() as usage:
+            result, model_used = await run_routed(
+                "edge-cases", compacted.text, request.model_choice,
+                lambda llm: get_edge_case_chains(llm, code, use_dynamic=True, structured=request.structured),
+                {"code": compacted.numbered() if request.structured else compacted.text}, PRIORITY_ANALYSIS,
+                openai_api_key=openai_api_key
+            )
+        
+        findings = read_findings(result) if request.structured else None
+        if findings is not None:
+            result = render_findings(findings, empty="No unhandled edge cases found.")
+            analysis_index.record(code, "edge-cases:findings", findings_to_wire(findings), model_used)
+        else:
+            if not request.structured:
+                result = compacted.remap(result)
+                analysis_index.record(code, "edge-cases", result, model_used)
+        
+        # Generated pytest cases run against the submitted code in the sandbox (core.sandbox)
+        test_results = await run_generated_tests(code, result) if request.run_tests else None
         execution_time = time.time() - start_time
         
         return EdgeCaseResponse(
             status="success",
             edge_case_analysis=result,
             execution_time=execution_time,
-            model_used=request.model_choice
+            model_used=model_used,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens,
+            findings=findings_to_wire(findings) if findings is not None else None,
+            finding_fields=FINDING_FIELDS if findings is not None else None,
+            test_results=test_results
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -179,27 +416,53 @@ async def unit_test(request: UnitTestRequest):
             raise HTTPException(status_code=500, detail="OpenAI API key not configured")
         
         start_time = time.time()
+        code = resolve_request_code(request)
+        
+        # Reuse stored tests for the same code analyzed before
+        reused = analysis_index.lookup(code, "tests", exact_only=True)
+        if reused:
+            return UnitTestResponse(
+                status="success",
+                unit_tests=reused["result"],
+                execution_time=time.time() - start_time,
+                model_used=reused["model_used"],
+                test_results=await run_generated_tests(code, reused["result"]) if request.run_tests else None
+            )
         
         # Use your existing dynamic explanation chain
-        llm = ChatOpenAI(
-            temperature=0, 
-            model=request.model_choice,
-            openai_api_key=openai_api_key
-        )
-        unittest_chain = unittestchains(llm, request.code, use_dynamic=True)
-        
-        # Run analysis
-        result = unittest_chain.invoke({"code": request.code})
-        
+        # model_choice="auto" picks a model by code size/complexity and escalates a weak first pass
+        compacted = compact_for_analysis(code, "tests", request.compact)
+        with track_usage() as usage:
+            result, model_used = await run_routed(
+                "tests", compacted.text, request.model_choice,
+                lambda llm: unittestchains(llm, code, use_dynamic=True),
+                {"code": compacted.text}, PRIORITY_ANALYSIS, openai_api_key=openai_api_key
+            )
+            checked = await validate_generated_code(result, model_used, PRIORITY_ANALYSIS,
+                                                    usage.prompt_tokens + usage.completion_tokens,
+                                                    openai_api_key=openai_api_key)
+        
+        result = checked.text
+        if checked.valid:
+            analysis_index.record(code, "tests", result, model_used)
+        test_results = await run_generated_tests(code, result) if request.run_tests else None
         execution_time = time.time() - start_time
         
         return UnitTestResponse(
             status="success",
             unit_tests=result,
             execution_time=execution_time,
-            model_used=request.model_choice
+            model_used=model_used,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens,
+            syntax_valid=checked.valid if checked.blocks else None,
+            syntax_repairs=checked.repaired,
+            test_results=test_results
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, 
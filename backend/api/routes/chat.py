@@ -1,9 +1,17 @@
-from fastapi import APIRouter, HTTPException
-from langchain_openai import ChatOpenAI
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from typing import Optional
+import asyncio
 import time
-from google.cloud import firestore
-from langchain_google_firestore import FirestoreChatMessageHistory
 from core.chains.conversational import conversational_agent
+from core.chat_history import get_chat_history
+from core.code_slicer import slice_code_for_question
+from core.response_cache import chat_response_cache
+from core.code_store import code_hash, resolve_code
+from core.llm_scheduler import create_llm, track_usage, PRIORITY_INTERACTIVE
+from core.model_router import route_model, route_stats
+from core.tokenizer import truncate_to_tokens
+from langchain_core.messages import AIMessage, HumanMessage
+from api.routes.analysis import resolve_request_code
 from api.models.requests import ConversationalRequest, ProjectChatRequest
 from api.models.responses import ConversationalResponse,ProjectChatResponse
 import os
@@ -11,52 +19,72 @@ from core.storage import projects_storage,get_project, get_file_content
 
 router = APIRouter()
 
+# Per-file share of the prompt when chatting about a whole project
+CHAT_PROJECT_FILE_TOKENS = int(os.getenv("CHAT_PROJECT_FILE_TOKENS", "500"))
+
 @router.post("/conversational/chat", response_model=ConversationalResponse)
 async def conversational(request: ConversationalRequest):
     """Ask Doubts about Code using dynamic AI chains"""
     try:
         # Get API key from environment
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/home/nuclearreactor3010/AI-CodeBugger/backend/regata-2ca53-df75398184a5.json"
         openai_api_key = os.getenv("OPENAI_API_KEY")
         if not openai_api_key:
             raise HTTPException(status_code=500, detail="OpenAI API key not configured")
         
         start_time = time.time()
+        code = resolve_request_code(request)
         
-        PROJECT_ID = "regata-2ca53"
-        COLLECTION_NAME = "chat_history_chains"
+        chat_memory = get_chat_history(request.session_id)
         
-        client = firestore.Client(project=PROJECT_ID)
-        chat_memory = FirestoreChatMessageHistory(
-            session_id=request.session_id,
-            collection=COLLECTION_NAME,
-            client=client,
-        )
+        # Send only the parts of the file the question is about
+        prompt_code, _ = slice_code_for_question(code, request.question)
+        
+        # model_choice="auto" picks a model by the size/complexity of what is sent
+        route = route_model(prompt_code, "chat", request.model_choice)
+        
+        # Same (or a near-identical) question about the same code answered before
+        chat_response_cache.set_bypass(request.session_id, request.bypass_cache)
+        cached = await chat_response_cache.alookup(code, route.model, request.question, request.session_id)
+        if cached:
+            chat_memory.add_messages([HumanMessage(content=request.question), AIMessage(content=cached["answer"])])
+            return ConversationalResponse(
+                status="success",
+                response=cached["answer"],
+                session_id=request.session_id,
+                execution_time=time.time() - start_time,
+                model_used=route.model,
+                cached=True
+            )
         
         # Use your existing dynamic explanation chain
-        llm = ChatOpenAI(
-            temperature=0, 
-            model=request.model_choice,
-            openai_api_key=openai_api_key
-        )
-        conversational_chain = conversational_agent(llm, chat_memory,request.code, use_dynamic=True)
+        llm = create_llm(route.model, priority=PRIORITY_INTERACTIVE, openai_api_key=openai_api_key)
+        conversational_chain = conversational_agent(llm, chat_memory, code, use_dynamic=True)
         
         # Run analysis
-        result = conversational_chain.invoke(
-            {"code": request.code, "question": request.question},
-            config={"configurable": {"session_id": request.session_id}}
-        )
+        llm_start = time.monotonic()
+        with track_usage() as usage:
+            result = await conversational_chain.ainvoke(
+                {"code": prompt_code, "question": request.question},
+                config={"configurable": {"session_id": request.session_id}}
+            )
+        route_stats.record(route, time.monotonic() - llm_start)
         
         execution_time = time.time() - start_time
+        await chat_response_cache.astore(code, route.model, request.question, result, request.session_id)
         
         return ConversationalResponse(
             status="success",
             response=result,
             session_id=request.session_id,
             execution_time=execution_time,
-            model_used=request.model_choice
+            model_used=route.model,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -83,8 +111,8 @@ async def chat_about_project_file(project_id: str, request: ProjectChatRequest):
                     with open(file_info["full_path"], 'r', encoding='utf-8', errors='ignore') as f:
                         content = f.read()
                         
-                        if len(content) > 2000:
-                            content = content[:2000] + "\n# ... (file truncated)"
+                        content = truncate_to_tokens(content, CHAT_PROJECT_FILE_TOKENS,
+                                                     marker="\n# ... (file truncated)")
                         
                         combined_code.append(f"""
 # ========== {file_info['path']} ==========
@@ -106,34 +134,48 @@ async def chat_about_project_file(project_id: str, request: ProjectChatRequest):
             with open(target_file["full_path"], 'r', encoding='utf-8', errors='ignore') as f:
                 context_code = f.read()
             context_info = f"File: {target_file['name']}"
+            prompt_code, slice_info = slice_code_for_question(context_code, request.question)
+            if slice_info["sliced"]:
+                context_info += f" ({', '.join(slice_info['units'])})"
         else:
             # Chat about entire project
             context_code = get_combined_project_code(project)
             context_info = f"Project: {project['name']}"
+            prompt_code = context_code
             
-        # Setup Firestore chat
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/home/nuclearreactor3010/AI-CodeBugger/backend/regata-2ca53-df75398184a5.json"
+        # Cached session history (shared Firestore client, write-behind appends)
+        session_key = f"{project_id}_{request.session_id}"
+        chat_memory = get_chat_history(session_key)
         
-        PROJECT_ID = "regata-2ca53"
-        COLLECTION_NAME = "chat_history_chains"
-        
-        client = firestore.Client(project=PROJECT_ID)
-        chat_memory = FirestoreChatMessageHistory(
-            session_id=f"{project_id}_{request.session_id}",
-            collection=COLLECTION_NAME,
-            client=client,
-        )
+        route = route_model(prompt_code, "chat", request.model_choice)
+        chat_response_cache.set_bypass(session_key, request.bypass_cache)
+        cached = await chat_response_cache.alookup(context_code, route.model, request.question, session_key)
+        if cached:
+            chat_memory.add_messages([HumanMessage(content=request.question), AIMessage(content=cached["answer"])])
+            return ProjectChatResponse(
+                status="success",
+                response=cached["answer"],
+                context_info=context_info,
+                session_id=session_key,
+                execution_time=time.time() - start_time,
+                project_id=project_id,
+                cached=True
+            )
         
         # Dynamic conversational agent
-        llm = ChatOpenAI(temperature=0, openai_api_key=os.getenv("OPENAI_API_KEY"))
+        llm = create_llm(route.model, priority=PRIORITY_INTERACTIVE)
         conversational_chain = conversational_agent(llm, chat_memory, context_code, use_dynamic=True)
         
-        response = conversational_chain.invoke(
-            {"code": context_code, "question": request.question},
-            config={"configurable": {"session_id": f"{project_id}_{request.session_id}"}}
-        )
+        llm_start = time.monotonic()
+        with track_usage() as usage:
+            response = await conversational_chain.ainvoke(
+                {"code": prompt_code, "question": request.question},
+                config={"configurable": {"session_id": f"{project_id}_{request.session_id}"}}
+            )
+        route_stats.record(route, time.monotonic() - llm_start)
         
         execution_time = time.time() - start_time
+        await chat_response_cache.astore(context_code, route.model, request.question, response, session_key)
         
         return ProjectChatResponse(
             status="success",
@@ -141,8 +183,133 @@ async def chat_about_project_file(project_id: str, request: ProjectChatRequest):
             context_info=context_info,
             session_id=f"{project_id}_{request.session_id}",
             execution_time=execution_time,
-            project_id=project_id
+            project_id=project_id,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Project chat failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Project chat failed: {str(e)}")
+
+class _WarmChatSession:
+    """Per-connection chat state kept between turns: code, model, chain and history"""
+    
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.chat_memory = get_chat_history(session_id)
+        self.code = None
+        self.model_choice = None
+        self.route = None
+        self.chain = None
+    
+    def configure(self, code: str, model_choice: str) -> None:
+        """Build the chain once; later turns reuse it until the code or model changes"""
+        if code == self.code and model_choice == self.model_choice and self.chain is not None:
+            return
+        # model_choice="auto" is routed once per code, not per turn, so the warm chain is kept
+        self.route = route_model(code, "chat", model_choice)
+        llm = create_llm(self.route.model, priority=PRIORITY_INTERACTIVE, streaming=True)
+        self.chain = conversational_agent(llm, self.chat_memory, code, use_dynamic=True)
+        self.code = code
+        self.model_choice = model_choice
+    
+    async def answer(self, websocket: WebSocket, question: str, bypass_cache: Optional[bool] = None) -> None:
+        """Stream one answer as token messages, then a done message"""
+        start_time = time.time()
+        try:
+            chat_response_cache.set_bypass(self.session_id, bypass_cache)
+            cached = await chat_response_cache.alookup(self.code, self.route.model, question, self.session_id)
+            if cached:
+                self.chat_memory.add_messages([HumanMessage(content=question), AIMessage(content=cached["answer"])])
+                await websocket.send_json({"type": "token", "content": cached["answer"]})
+                await websocket.send_json({"type": "done", "response": cached["answer"], "cached": True,
+                                           "execution_time": time.time() - start_time})
+                return
+            
+            prompt_code, _ = slice_code_for_question(self.code, question)
+            chunks = []
+            llm_start = time.monotonic()
+            with track_usage() as usage:
+                async for chunk in self.chain.astream(
+                    {"code": prompt_code, "question": question},
+                    config={"configurable": {"session_id": self.session_id}}
+                ):
+                    chunks.append(chunk)
+                    await websocket.send_json({"type": "token", "content": chunk})
+            
+            result = "".join(chunks)
+            route_stats.record(self.route, time.monotonic() - llm_start)
+            await chat_response_cache.astore(self.code, self.route.model, question, result, self.session_id)
+            await websocket.send_json({"type": "done", "response": result, "cached": False,
+                                       "execution_time": time.time() - start_time,
+                                       "prompt_tokens": usage.prompt_tokens,
+                                       "completion_tokens": usage.completion_tokens,
+                                       "cached_tokens": usage.cached_tokens})
+        except asyncio.CancelledError:
+            # Cancelled turns are not written to history
+            await websocket.send_json({"type": "cancelled"})
+            raise
+        except Exception as e:
+            await websocket.send_json({"type": "error", "detail": f"Chat Failed {str(e)}"})
+
+
+@router.websocket("/ws/conversational/{session_id}")
+async def conversational_stream(websocket: WebSocket, session_id: str):
+    """Streaming chat over one long-lived connection
+    
+    Client messages:
+        {"type": "init", "code" | "code_ref": ..., "model_choice": "gpt-4o"}
+        {"type": "question", "question": ..., "bypass_cache": null}
+        {"type": "cancel"}
+    Server messages: ready, token, done, cancelled, error
+    """
+    await websocket.accept()
+    if not os.getenv("OPENAI_API_KEY"):
+        await websocket.send_json({"type": "error", "detail": "OpenAI API key not configured"})
+        await websocket.close()
+        return
+    
+    session = _WarmChatSession(session_id)
+    generation: Optional[asyncio.Task] = None
+    try:
+        while True:
+            message = await websocket.receive_json()
+            message_type = message.get("type")
+            
+            if message_type == "cancel":
+                if generation is not None and not generation.done():
+                    generation.cancel()
+            
+            elif message_type == "init":
+                try:
+                    code = resolve_code(message.get("code"), message.get("code_ref"))
+                except KeyError:
+                    await websocket.send_json({"type": "error", "detail": "Unknown code_ref; register the code with POST /code"})
+                    continue
+                except ValueError as e:
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+                    continue
+                session.configure(code, message.get("model_choice", "gpt-4o"))
+                await websocket.send_json({"type": "ready", "code_ref": code_hash(code)})
+            
+            elif message_type == "question":
+                if session.chain is None:
+                    await websocket.send_json({"type": "error", "detail": "Send an init message with the code first"})
+                elif generation is not None and not generation.done():
+                    await websocket.send_json({"type": "error", "detail": "A response is already in progress; cancel it first"})
+                else:
+                    generation = asyncio.create_task(
+                        session.answer(websocket, message.get("question", ""), message.get("bypass_cache"))
+                    )
+            
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown message type {message_type}"})
+    
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if generation is not None and not generation.done():
+            generation.cancel()
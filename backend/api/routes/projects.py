@@ -3,15 +3,26 @@ import tempfile
 import zipfile
 import os
 from pathlib import Path
+from typing import Optional
 import uuid
 import time
-from langchain_openai import ChatOpenAI
-from api.models.requests import ProjectChatRequest, ProjectAnalysisRequest, GitHubRequest
-from api.models.responses import ProjectUploadResponse, ProjectChatResponse, ProjectFileAnalysisResponse
+from core.llm_scheduler import create_llm, track_usage, PRIORITY_BULK
+from core.model_router import run_routed, AUTO_MODEL, ROUTER_STANDARD_MODEL, ROUTER_STRONG_MODEL
+from api.models.requests import ProjectChatRequest, ProjectAnalysisRequest, GitHubRequest, ProjectExplainRequest, ProjectScanRequest
+from api.models.responses import ProjectUploadResponse, ProjectChatResponse, ProjectFileAnalysisResponse, ProjectSymbolsResponse, ProjectExplanationResponse, ProjectScanResponse
 import requests
 import tempfile
 import os
 from core.storage import projects_storage, store_project
+from core.minhash_index import analysis_index
+from core.symbol_index import build_symbol_index
+from core.file_ranking import rank_project_files
+from core.dependency_context import build_dependency_context, dependency_messages
+from core.project_explainer import explain_project
+from core.project_scanner import scan_project, SCAN_TYPES
+from core.code_compactor import compact_for_analysis
+from core.code_repair import validate_generated_code
+from core.findings import FINDING_FIELDS, findings_from_wire, findings_to_wire, read_findings, render_findings
 
 router = APIRouter()
 
@@ -60,6 +71,10 @@ async def upload_project(file: UploadFile = File(...)):
                     })
                     file_index += 1
         
+        # Index symbols and rank files so important ones are analyzed first
+        symbol_index = build_symbol_index(python_files)
+        file_ranking = rank_project_files(symbol_index, python_files)
+        
         # Store project info
         project_info = {
             "project_id": project_id,
@@ -67,7 +82,9 @@ async def upload_project(file: UploadFile = File(...)):
             "upload_time": time.time(),
             "extracted_path": extract_dir,
             "python_files": python_files,
-            "total_files": len(python_files)
+            "total_files": len(python_files),
+            "symbol_index": symbol_index,
+            "file_ranking": file_ranking
         }
         
         store_project(project_id, project_info)
@@ -82,7 +99,8 @@ async def upload_project(file: UploadFile = File(...)):
                 "name": f["name"], 
                 "path": f["path"],
                 "size": f["size"]
-            } for f in python_files]
+            } for f in python_files],
+            ranked_files=[r["index"] for r in file_ranking]
         )
         
     except Exception as e:
@@ -110,29 +128,79 @@ async def analyze_project_file(project_id: str, request: ProjectAnalysisRequest)
         
         start_time = time.time()
         
+        # JSON findings are available for the analyses that report issues
+        structured = request.structured and request.analysis_type in SCAN_TYPES
+        reuse_key = f"{request.analysis_type}:findings" if structured else request.analysis_type
+        
+        # Reuse stored results for the same file from any project (near-duplicates only for
+        # explanations: the other results embed the code or point at its lines)
+        reused = analysis_index.lookup(file_content, reuse_key, exact_only=request.analysis_type != "explain")
+        if reused:
+            findings = findings_from_wire(reused["result"]) if structured else None
+            return ProjectFileAnalysisResponse(
+                status="success",
+                project_id=project_id,
+                file_index=request.file_index,
+                file_name=target_file["name"],
+                analysis_type=request.analysis_type,
+                result=render_findings(findings) if structured else reused["result"],
+                execution_time=time.time() - start_time,
+                model_used=reused["model_used"],
+                findings=findings_to_wire(findings) if structured else None,
+                finding_fields=FINDING_FIELDS if structured else None
+            )
+        
         # Run analysis based on type
         openai_api_key = os.getenv("OPENAI_API_KEY")
-        llm = ChatOpenAI(temperature=0, model=request.model_choice, openai_api_key=openai_api_key)
-        
         if request.analysis_type == "optimize":
             from core.chains.optimize_chains import get_optimized_chains
-            chain = get_optimized_chains(llm, file_content, use_dynamic=True)
+            build_chain = get_optimized_chains
         elif request.analysis_type == "bugs":
             from core.chains.bug_chains import get_bugchains
-            chain = get_bugchains(llm, file_content, use_dynamic=True)
+            build_chain = get_bugchains
         elif request.analysis_type == "explain":
             from core.chains.explanation_chains import get_explanationchains
-            chain = get_explanationchains(llm, file_content, use_dynamic=True)
+            build_chain = get_explanationchains
         elif request.analysis_type == "tests":
             from core.chains.unittest import unittestchains
-            chain = unittestchains(llm, file_content, use_dynamic=True)
+            build_chain = unittestchains
         elif request.analysis_type == "edge-cases":
             from core.chains.edgecases_chain import get_edge_case_chains
-            chain = get_edge_case_chains(llm, file_content, use_dynamic=True)
+            build_chain = get_edge_case_chains
         else:
             raise HTTPException(status_code=400, detail="Invalid analysis type")
         
-        result = chain.invoke({"code": file_content})
+        # Attach summaries of directly imported project modules so the model
+        # does not guess what they do (the optimizer must only see the file itself);
+        # they are a separate prompt input, not part of the code
+        compacted = compact_for_analysis(file_content, request.analysis_type, request.compact)
+        inputs = {"code": compacted.numbered() if structured else compacted.text}
+        if request.include_dependency_context and request.analysis_type != "optimize":
+            inputs["dependencies"] = dependency_messages(build_dependency_context(project, request.file_index))
+        
+        # model_choice="auto" picks a model by file size/complexity and escalates a weak first pass
+        with track_usage() as usage:
+            result, model_used = await run_routed(
+                request.analysis_type, compacted.text, request.model_choice,
+                lambda llm: build_chain(llm, file_content, use_dynamic=True, **({"structured": True} if structured else {})),
+                inputs, PRIORITY_BULK, openai_api_key=openai_api_key
+            )
+            checked = None
+            if request.analysis_type in ("optimize", "tests"):
+                checked = await validate_generated_code(result, model_used, PRIORITY_BULK,
+                                                        usage.prompt_tokens + usage.completion_tokens,
+                                                        openai_api_key=openai_api_key)
+                result = checked.text
+        source = f"{project_id}:{target_file['path']}"
+        findings = read_findings(result) if structured else None  # cites the numbered original lines
+        if findings is not None:
+            result = render_findings(findings)
+            analysis_index.record(file_content, reuse_key, findings_to_wire(findings), model_used, source=source)
+        else:
+            if checked is None and not structured:  # prose only; generated code is returned as written
+                result = compacted.remap(result)
+            if not structured and (checked is None or checked.valid):
+                analysis_index.record(file_content, request.analysis_type, result, model_used, source=source)
         execution_time = time.time() - start_time
         
         return ProjectFileAnalysisResponse(
@@ -143,12 +211,154 @@ async def analyze_project_file(project_id: str, request: ProjectAnalysisRequest)
             analysis_type=request.analysis_type,
             result=result,
             execution_time=execution_time,
-            model_used=request.model_choice
+            model_used=model_used,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens,
+            findings=findings_to_wire(findings) if findings is not None else None,
+            finding_fields=FINDING_FIELDS if findings is not None else None,
+            syntax_valid=checked.valid if checked and checked.blocks else None,
+            syntax_repairs=checked.repaired if checked else None
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"File analysis failed: {str(e)}")
 
+@router.post("/projects/{project_id}/scan", response_model=ProjectScanResponse)
+async def scan_project_files(project_id: str, request: ProjectScanRequest):
+    """Bug or edge-case scan of many files; in cascade mode a small model triages and only
+    suspicious regions reach the requested model"""
+    try:
+        if project_id not in projects_storage:
+            raise HTTPException(status_code=404, detail="Project not found")
+        if request.analysis_type not in SCAN_TYPES:
+            raise HTTPException(status_code=400, detail=f"Scans support {', '.join(SCAN_TYPES)}")
+        
+        project = projects_storage[project_id]
+        if request.file_indices is not None and any(
+                index < 0 or index >= len(project["python_files"]) for index in request.file_indices):
+            raise HTTPException(status_code=400, detail="File index out of range")
+        
+        start_time = time.time()
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        if not openai_api_key:
+            raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+        
+        # The cascade already puts the small model first, so "auto" means the strong model here
+        model = ROUTER_STRONG_MODEL if request.model_choice == AUTO_MODEL else request.model_choice
+        with track_usage() as usage:
+            scan = await scan_project(project, request.analysis_type, model, request.file_indices,
+                                      request.cascade, request.pack, request.triage_model, openai_api_key,
+                                      request.compact, request.structured)
+        
+        return ProjectScanResponse(
+            status="success",
+            project_id=project_id,
+            analysis_type=request.analysis_type,
+            results=scan["results"],
+            report=scan["report"],
+            execution_time=time.time() - start_time,
+            model_used=model,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens,
+            finding_fields=FINDING_FIELDS if request.structured else None
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Project scan failed: {str(e)}")
+
+@router.get("/projects/{project_id}/symbols", response_model=ProjectSymbolsResponse)
+async def get_project_symbols(project_id: str, name: Optional[str] = None, file_index: Optional[int] = None, limit: int = 200):
+    """Query the project symbol index (definitions, references, call sites, imports)"""
+    try:
+        if project_id not in projects_storage:
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        project = projects_storage[project_id]
+        symbol_index = project.get("symbol_index")
+        if symbol_index is None:
+            # Projects stored before indexing existed are indexed on first use
+            symbol_index = build_symbol_index(project["python_files"])
+            project["symbol_index"] = symbol_index
+        
+        if file_index is not None and not 0 <= file_index < len(project["python_files"]):
+            raise HTTPException(status_code=400, detail=f"File index {file_index} out of range")
+        
+        definitions, references, calls = [], [], []
+        if name:
+            definitions = symbol_index.find_definitions(name)
+            references = symbol_index.find_references(name)
+            calls = symbol_index.find_calls(name)
+            if file_index is not None:
+                definitions = [d for d in definitions if d["file_index"] == file_index]
+                references = [r for r in references if r["file_index"] == file_index]
+                calls = [c for c in calls if c["file_index"] == file_index]
+        elif file_index is not None:
+            definitions = [dict(d, file_index=file_index, path=symbol_index.files[file_index])
+                           for d in symbol_index.file_definitions(file_index)]
+        
+        return ProjectSymbolsResponse(
+            status="success",
+            project_id=project_id,
+            query=name,
+            file_index=file_index,
+            stats=symbol_index.stats(),
+            definitions=definitions[:limit],
+            references=references[:limit],
+            calls=calls[:limit],
+            imports=symbol_index.import_edges(file_index, local_only=file_index is None)[:limit]
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Symbol lookup failed: {str(e)}")
+
+@router.post("/projects/{project_id}/explain", response_model=ProjectExplanationResponse)
+async def explain_project_overview(project_id: str, request: ProjectExplainRequest):
+    """Explain the whole project: file summaries (map) -> package summaries (reduce) -> overview"""
+    try:
+        if project_id not in projects_storage:
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        project = projects_storage[project_id]
+        start_time = time.time()
+        
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        if not openai_api_key:
+            raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+        
+        # Summaries are cached per model, so "auto" maps to one model rather than routing per file
+        model = ROUTER_STANDARD_MODEL if request.model_choice == AUTO_MODEL else request.model_choice
+        llm = create_llm(model, priority=PRIORITY_BULK, openai_api_key=openai_api_key)
+        with track_usage() as usage:
+            explanation = await explain_project(project, llm, model)
+        
+        execution_time = time.time() - start_time
+        
+        return ProjectExplanationResponse(
+            status="success",
+            project_id=project_id,
+            overview=explanation["overview"],
+            packages=explanation["packages"],
+            files=explanation["files"] if request.include_file_summaries else None,
+            llm_calls=explanation["llm_calls"],
+            cache_hits=explanation["cache_hits"],
+            execution_time=execution_time,
+            model_used=model,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Project explanation failed: {str(e)}")
+
 @router.post("/projects/github", response_model=ProjectUploadResponse)
 async def analyze_github_repo(request: GitHubRequest):
     """Download GitHub repo and use existing ZIP processing pipeline"""
@@ -346,6 +556,10 @@ async def upload_project(file: UploadFile = File(...)):
             logger.warning("No Python files found in uploaded project")
             raise HTTPException(status_code=400, detail="No Python files found in the uploaded project")
         
+        # Index symbols and rank files so important ones are analyzed first
+        symbol_index = build_symbol_index(python_files)
+        file_ranking = rank_project_files(symbol_index, python_files)
+        
         # Store project info
         project_info = {
             "project_id": project_id,
@@ -353,7 +567,9 @@ async def upload_project(file: UploadFile = File(...)):
             "upload_time": time.time(),
             "extracted_path": extract_dir,
             "python_files": python_files,
-            "total_files": len(python_files)
+            "total_files": len(python_files),
+            "symbol_index": symbol_index,
+            "file_ranking": file_ranking
         }
         
         store_project(project_id, project_info)
@@ -369,7 +585,8 @@ async def upload_project(file: UploadFile = File(...)):
                 "name": f["name"], 
                 "path": f["path"],
                 "size": f["size"]
-            } for f in python_files]
+            } for f in python_files],
+            ranked_files=[r["index"] for r in file_ranking]
         )
         
     except HTTPException:
@@ -26,9 +26,12 @@
 #     logging.info("There has been an Error..")
 #     raise CustomException(e,sys)
 from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 from langchain.schema.output_parser import StrOutputParser
+from core.code_store import cached_template
+from core.prompt_layout import layout_prompt
+from core.chains.findings_chains import findings_format, json_mode
+from core.tokenizer import complexity_level
 from core.src.logger import logging
 from core.src.exception import CustomException
 import sys
@@ -89,19 +92,7 @@ class CodeAnalyzer:
     @staticmethod
     def assess_complexity(code: str) -> str:
         """Assess code complexity level"""
-        lines = len([line for line in code.split('\n') if line.strip()])
-        functions = code.count('def ')
-        classes = code.count('class ')
-        imports = len([line for line in code.split('\n') if line.strip().startswith(('import ', 'from '))])
-        
-        complexity_score = lines + (functions * 3) + (classes * 5) + imports
-        
-        if complexity_score < 20:
-            return 'simple'
-        elif complexity_score < 60:
-            return 'medium'
-        else:
-            return 'complex'
+        return complexity_level(code, ('simple', 'medium', 'complex'), (20, 60))
     
     @staticmethod
     def detect_security_indicators(code: str) -> list:
@@ -266,30 +257,34 @@ Provide enterprise-level analysis with architectural assessment and strategic re
 }
 
 try:
-    def get_dynamic_bugchains(llm, code):
+    def get_dynamic_bugchains(llm, code, structured=False):
         """Generate dynamic bug detection chain based on code analysis"""
+
+        def _select_template():
+            # Analyze the code
+            analyzer = CodeAnalyzer()
+            code_type = analyzer.detect_code_type(code)
+            complexity = analyzer.assess_complexity(code)
+            security_indicators = analyzer.detect_security_indicators(code)
         
-        # Analyze the code
-        analyzer = CodeAnalyzer()
-        code_type = analyzer.detect_code_type(code)
-        complexity = analyzer.assess_complexity(code)
-        security_indicators = analyzer.detect_security_indicators(code)
+            # Select appropriate template
+            template_category = DYNAMIC_BUG_TEMPLATES.get(code_type, DYNAMIC_BUG_TEMPLATES['general'])
+            template_text = template_category.get(complexity, template_category['simple'])
         
-        # Select appropriate template
-        template_category = DYNAMIC_BUG_TEMPLATES.get(code_type, DYNAMIC_BUG_TEMPLATES['general'])
-        template_text = template_category.get(complexity, template_category['simple'])
+            # Structured mode answers with JSON finding rows (see core.findings)
+            if structured:
+                template_text = f"{template_text}\n\n{findings_format('bugs')}"
         
-        # Create dynamic prompt template
-        bug_template = PromptTemplate(
-            input_variables=["code"],
-            template=template_text
-        )
+            # Stable instructions first, code last (see core.prompt_layout)
+            return layout_prompt(template_text)
+
+        bug_template = cached_template("bugs-findings" if structured else "bugs", code, _select_template)
         
         # Return the same pattern: template | llm | parser
-        return bug_template | llm | StrOutputParser()
+        return bug_template | (json_mode(llm) if structured else llm) | StrOutputParser()
     
     # Backward compatibility - keep original function but add dynamic option
-    def get_bugchains(llm, code=None, use_dynamic=True):
+    def get_bugchains(llm, code=None, use_dynamic=True, structured=False):
         """
         Get bug detection chain - supports both static and dynamic modes
         
@@ -297,16 +292,17 @@ try:
             llm: Language model instance
             code: Code to analyze (required for dynamic mode)
             use_dynamic: Whether to use dynamic prompting (default: True)
+            structured: Answer with JSON finding rows instead of markdown (default: False)
         """
         if use_dynamic and code:
-            return get_dynamic_bugchains(llm, code)
+            return get_dynamic_bugchains(llm, code, structured)
         else:
             # Fallback to original static template
-            bug_template = PromptTemplate(
-                input_variables=["code"],
-                template='''You are a Python expert. Review the following code and list any bugs, errors, or bad practices with explanations:\n\n{code}'''
-            )
-            return bug_template | llm | StrOutputParser()
+            template_text = '''You are a Python expert. Review the following code and list any bugs, errors, or bad practices with explanations:\n\n{code}'''
+            if structured:
+                template_text = f"{template_text}\n\n{findings_format('bugs')}"
+            bug_template = layout_prompt(template_text)
+            return bug_template | (json_mode(llm) if structured else llm) | StrOutputParser()
     
 except Exception as e:
     raise CustomException(e, sys)
\ No newline at end of file
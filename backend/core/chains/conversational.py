@@ -40,6 +40,10 @@
 from langchain.prompts import PromptTemplate
 from langchain.schema.output_parser import StrOutputParser
 from langchain_core.runnables.history import RunnableWithMessageHistory
+from core.conversation_memory import SummarizingChatMessageHistory
+from core.code_store import cached_template
+from core.prompt_layout import layout_prompt
+from core.tokenizer import complexity_level
 from core.src.logger import logging
 from core.src.exception import CustomException
 import sys
@@ -98,18 +102,7 @@ class ConversationAnalyzer:
     @staticmethod
     def assess_conversation_complexity(code: str) -> str:
         """Assess appropriate conversation depth"""
-        lines = len([line for line in code.split('\n') if line.strip()])
-        functions = code.count('def ')
-        classes = code.count('class ')
-        
-        complexity_score = lines + (functions * 2) + (classes * 3)
-        
-        if complexity_score < 20:
-            return 'beginner'
-        elif complexity_score < 50:
-            return 'intermediate'
-        else:
-            return 'advanced'
+        return complexity_level(code, ('beginner', 'intermediate', 'advanced'), (20, 50))
 
 # Dynamic conversational templates
 DYNAMIC_CONVERSATIONAL_TEMPLATES = {
@@ -380,26 +373,50 @@ Provide expert-level Python guidance with advanced technical insights and profes
     }
 }
 
+# Folds turns that fall out of the verbatim window into the rolling summary
+HISTORY_SUMMARY_TEMPLATE = '''Progressively summarize a conversation between a developer and a Python assistant about their code.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+Return the updated summary in at most 150 words. Keep the questions asked, conclusions reached, and any
+code names (functions, classes, variables) that were discussed.'''
+
 try:
+    def get_history_summary_chain(llm):
+        """Chain that folds older conversation turns into a rolling summary"""
+        template = PromptTemplate(input_variables=['summary', 'new_lines'], template=HISTORY_SUMMARY_TEMPLATE)
+        return template | llm | StrOutputParser()
+
+    def summarizing_memory(llm, memory):
+        """Wrap chat history with the token-budgeted rolling-summary policy"""
+        if isinstance(memory, SummarizingChatMessageHistory):
+            return memory
+        return SummarizingChatMessageHistory(memory, get_history_summary_chain(llm))
+
     def get_dynamic_conversational_agent(llm, memory, code):
         """Generate dynamic conversational agent based on code analysis"""
+
+        def _select_template():
+            # Analyze the code for context
+            analyzer = ConversationAnalyzer()
+            code_type = analyzer.detect_code_type(code)
+            complexity = analyzer.assess_conversation_complexity(code)
         
-        # Analyze the code for context
-        analyzer = ConversationAnalyzer()
-        code_type = analyzer.detect_code_type(code)
-        complexity = analyzer.assess_conversation_complexity(code)
-        
-        # Select appropriate template
-        template_category = DYNAMIC_CONVERSATIONAL_TEMPLATES.get(code_type, DYNAMIC_CONVERSATIONAL_TEMPLATES['general'])
-        template_text = template_category.get(complexity, template_category['beginner'])
+            # Select appropriate template
+            template_category = DYNAMIC_CONVERSATIONAL_TEMPLATES.get(code_type, DYNAMIC_CONVERSATIONAL_TEMPLATES['general'])
+            template_text = template_category.get(complexity, template_category['beginner'])
         
-        # Create dynamic conversational template
-        conversational_template = PromptTemplate(
-            input_variables=['code', 'question'],
-            template=template_text
-        )
+            # Instructions, then code, history messages and the question (see core.prompt_layout)
+            return layout_prompt(template_text)
+
+        conversational_template = cached_template("conversational", code, _select_template)
         
         base_chain = conversational_template | llm | StrOutputParser()
+        memory = summarizing_memory(llm, memory)
         
         wrapped_chain = RunnableWithMessageHistory(
             base_chain,
@@ -416,7 +433,7 @@ try:
         
         Args:
             llm: Language model instance
-            memory: Conversation memory
+            memory: Conversation memory (older turns are folded into a rolling summary)
             code: Code context (required for dynamic mode)
             use_dynamic: Whether to use dynamic prompting (default: True)
         """
@@ -424,17 +441,15 @@ try:
             return get_dynamic_conversational_agent(llm, memory, code)
         else:
             # Fallback to original static template
-            conversational_template = PromptTemplate(
-                input_variables=['code', 'question'],
-                template=(
-                    "You are an expert Python developer.\n"
-                    "Here is a Python code snippet:\n\n{code}\n\n"
-                    "Previous Conversation:\n{history}\n\n"
-                    "Now answer this question about the code:\n\n{question}"
-                )
+            conversational_template = layout_prompt(
+                "You are an expert Python developer.\n"
+                "Here is a Python code snippet:\n{code}\n\n"
+                "Previous Conversation:\n{history}\n\n"
+                "Now answer this question about the code:\n{question}"
             )
             
             base_chain = conversational_template | llm | StrOutputParser()
+            memory = summarizing_memory(llm, memory)
             
             wrapped_chain = RunnableWithMessageHistory(
                 base_chain,
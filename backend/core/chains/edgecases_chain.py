@@ -258,82 +258,13 @@
 #     logging.error("Error in edge case chains...")
 #     raise CustomException(e, sys)
 
-# # Test execution utilities
-# class TestExecutor:
-#     """Execute generated test cases safely"""
-    
-#     def __init__(self):
-#         self.timeout_seconds = 10
-#         self.max_memory_mb = 100
-    
-#     def execute_test_case(self, test_code: str, original_code: str) -> Dict[str, Any]:
-#         """Execute a single test case and return results"""
-#         try:
-#             # Create safe execution environment
-#             namespace = {
-#                 '__builtins__': __builtins__,
-#                 'sys': __import__('sys'),
-#                 'pytest': __import__('pytest')
-#             }
-            
-#             # Execute original code first
-#             exec(original_code, namespace)
-            
-#             # Execute test case
-#             exec(test_code, namespace)
-            
-#             return {
-#                 'status': 'passed',
-#                 'execution_time': 0.0,  # Would implement timing
-#                 'memory_usage': 0,      # Would implement memory tracking
-#                 'output': 'Test executed successfully'
-#             }
-            
-#         except Exception as e:
-#             return {
-#                 'status': 'failed',
-#                 'error': str(e),
-#                 'error_type': type(e).__name__,
-#                 'output': f'Test failed with error: {str(e)}'
-#             }
-    
-#     def benchmark_performance(self, code: str, test_inputs: List[Any]) -> Dict[str, Any]:
-#         """Benchmark code performance with different inputs"""
-#         import time
-#         import tracemalloc
-        
-#         results = {}
-        
-#         for i, test_input in enumerate(test_inputs):
-#             try:
-#                 # Memory tracking
-#                 tracemalloc.start()
-#                 start_time = time.time()
-                
-#                 # Execute code (would need safer execution)
-#                 # result = execute_code_with_input(code, test_input)
-                
-#                 execution_time = time.time() - start_time
-#                 current, peak = tracemalloc.get_traced_memory()
-#                 tracemalloc.stop()
-                
-#                 results[f'test_{i}'] = {
-#                     'execution_time': execution_time,
-#                     'memory_peak': peak / 1024 / 1024,  # MB
-#                     'input_size': len(str(test_input)),
-#                     'status': 'completed'
-#                 }
-                
-#             except Exception as e:
-#                 results[f'test_{i}'] = {
-#                     'status': 'failed',
-#                     'error': str(e)
-#                 }
-        
-#         return results
+# Generated test cases are executed by core.test_runner, in the sandbox of core.sandbox
 from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
 from langchain.schema.output_parser import StrOutputParser
+from core.code_store import cached_template
+from core.prompt_layout import layout_prompt
+from core.chains.findings_chains import findings_format, json_mode
+from core.tokenizer import complexity_level
 from core.src.logger import logging
 from core.src.exception import CustomException
 import sys
@@ -662,11 +593,7 @@ class EdgeCaseAnalyzer:
     
     def assess_complexity(self, code: str) -> str:
         """Assess code complexity for edge case depth"""
-        lines = len([line for line in code.split('\n') if line.strip()])
-        functions = code.count('def ')
-        complexity_score = lines + (functions * 3)
-        
-        return 'complex' if complexity_score > 50 else 'simple'
+        return complexity_level(code, ('simple', 'complex'), (51,))
     
     def analyze_code_risks(self, code: str) -> Dict[str, List[str]]:
         """Identify potential risk areas in code"""
@@ -699,51 +626,50 @@ class EdgeCaseAnalyzer:
             return {}
 
 try:
-    def get_dynamic_edge_case_chains(llm, code):
+    def get_dynamic_edge_case_chains(llm, code, structured=False):
         """Generate dynamic edge case chain based on code analysis"""
+
+        def _select_template():
+            # Analyze the code
+            analyzer = EdgeCaseAnalyzer()
+            code_type = analyzer.detect_code_type(code)
+            complexity = analyzer.assess_complexity(code)
+            risk_analysis = analyzer.analyze_code_risks(code)
         
-        # Analyze the code
-        analyzer = EdgeCaseAnalyzer()
-        code_type = analyzer.detect_code_type(code)
-        complexity = analyzer.assess_complexity(code)
-        risk_analysis = analyzer.analyze_code_risks(code)
+            # Select appropriate template
+            template_category = DYNAMIC_EDGE_CASE_TEMPLATES.get(code_type, DYNAMIC_EDGE_CASE_TEMPLATES['general'])
+            template_text = template_category.get(complexity, template_category['simple'])
         
-        # Select appropriate template
-        template_category = DYNAMIC_EDGE_CASE_TEMPLATES.get(code_type, DYNAMIC_EDGE_CASE_TEMPLATES['general'])
-        template_text = template_category.get(complexity, template_category['simple'])
+            # Convert risk analysis to safe string format
+            risk_summary = []
+            for risk_type, details in risk_analysis.items():
+                risk_summary.append(f"- {risk_type}: {', '.join(map(str, details))}")
         
-        # Convert risk analysis to safe string format
-        risk_summary = []
-        for risk_type, details in risk_analysis.items():
-            risk_summary.append(f"- {risk_type}: {', '.join(map(str, details))}")
+            risk_text = '\n'.join(risk_summary) if risk_summary else "No specific risks detected"
         
-        risk_text = '\n'.join(risk_summary) if risk_summary else "No specific risks detected"
+            if structured:
+                # JSON finding rows (see core.findings) instead of test code
+                template_text = (f"{template_text}\n\nFocus on the detected risk areas listed with the code.\n\n"
+                                 f"{findings_format('edge-cases')}")
+            else:
+                template_text = (f"{template_text}\n\nFocus on the detected risk areas listed with the code "
+                                 f"and generate executable pytest test cases.")
         
-        # Enhance template with analysis results
-        enhanced_template = f"""{template_text}
+            # Risk areas are per-code, so they go with the code after the stable instructions
+            return layout_prompt(template_text, f"Detected risk areas:\n{risk_text}")
 
-Detected risk areas:
-{risk_text}
-
-Focus on the specific risk patterns identified above and generate executable pytest test cases."""
-        
-        # Create dynamic prompt template
-        edge_case_template = PromptTemplate(
-            input_variables=["code"],
-            template=enhanced_template
-        )
+        edge_case_template = cached_template("edge-cases-findings" if structured else "edge-cases", code,
+                                             _select_template)
         
-        return edge_case_template | llm | StrOutputParser()
+        return edge_case_template | (json_mode(llm) if structured else llm) | StrOutputParser()
     
-    def get_edge_case_chains(llm, code=None, use_dynamic=True):
-        """Get edge case chain with dynamic support"""
+    def get_edge_case_chains(llm, code=None, use_dynamic=True, structured=False):
+        """Get edge case chain with dynamic support (``structured``: JSON finding rows instead of tests)"""
         if use_dynamic and code:
-            return get_dynamic_edge_case_chains(llm, code)
+            return get_dynamic_edge_case_chains(llm, code, structured)
         else:
             # Static fallback
-            edge_case_template = PromptTemplate(
-                input_variables=["code"],
-                template='''You are a senior QA engineer specializing in finding edge cases that break code.
+            template_text = '''You are a senior QA engineer specializing in finding edge cases that break code.
 
 Code to analyze:
 {code}
@@ -751,8 +677,10 @@ Code to analyze:
 Generate comprehensive edge cases covering input validation, error handling, and performance limits.
 
 Format as clean pytest test cases.'''
-            )
-            return edge_case_template | llm | StrOutputParser()
+            if structured:
+                template_text = f"{template_text}\n\n{findings_format('edge-cases')}"
+            edge_case_template = layout_prompt(template_text)
+            return edge_case_template | (json_mode(llm) if structured else llm) | StrOutputParser()
 
 except Exception as e:
     raise CustomException(e, sys)
\ No newline at end of file
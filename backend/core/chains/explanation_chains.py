@@ -22,7 +22,9 @@
 #     raise CustomException(e,sys)
 from langchain_openai import ChatOpenAI
 from langchain.schema.output_parser import StrOutputParser
-from langchain.prompts import PromptTemplate
+from core.code_store import cached_template
+from core.prompt_layout import layout_prompt
+from core.tokenizer import complexity_level
 from core.src.logger import logging
 from core.src.exception import CustomException
 import sys
@@ -81,19 +83,7 @@ class ExplanationAnalyzer:
     @staticmethod
     def assess_complexity(code: str) -> str:
         """Assess code complexity for explanation depth"""
-        lines = len([line for line in code.split('\n') if line.strip()])
-        functions = code.count('def ')
-        classes = code.count('class ')
-        imports = len([line for line in code.split('\n') if line.strip().startswith(('import ', 'from '))])
-        
-        complexity_score = lines + (functions * 2) + (classes * 3) + imports
-        
-        if complexity_score < 15:
-            return 'beginner'
-        elif complexity_score < 40:
-            return 'intermediate'
-        else:
-            return 'advanced'
+        return complexity_level(code, ('beginner', 'intermediate', 'advanced'), (15, 40))
     
     @staticmethod
     def identify_key_concepts(code: str) -> list:
@@ -360,27 +350,26 @@ Provide expert-level analysis with architectural insights and advanced technique
 try:
     def get_dynamic_explanation_chains(llm, code):
         """Generate dynamic explanation chain based on code analysis"""
+
+        def _select_template():
+            # Analyze the code
+            analyzer = ExplanationAnalyzer()
+            code_type = analyzer.detect_code_type(code)
+            complexity = analyzer.assess_complexity(code)
+            key_concepts = analyzer.identify_key_concepts(code)
         
-        # Analyze the code
-        analyzer = ExplanationAnalyzer()
-        code_type = analyzer.detect_code_type(code)
-        complexity = analyzer.assess_complexity(code)
-        key_concepts = analyzer.identify_key_concepts(code)
-        
-        # Select appropriate template
-        template_category = DYNAMIC_EXPLANATION_TEMPLATES.get(code_type, DYNAMIC_EXPLANATION_TEMPLATES['general'])
-        template_text = template_category.get(complexity, template_category['beginner'])
+            # Select appropriate template
+            template_category = DYNAMIC_EXPLANATION_TEMPLATES.get(code_type, DYNAMIC_EXPLANATION_TEMPLATES['general'])
+            template_text = template_category.get(complexity, template_category['beginner'])
         
-        # Enhance template with identified concepts
-        if key_concepts:
-            concept_guidance = f"\n\nPay special attention to explaining these concepts: {', '.join(key_concepts)}"
-            template_text += concept_guidance
+            # Identified concepts travel with the code, after the stable instructions
+            concept_guidance = ""
+            if key_concepts:
+                concept_guidance = f"Pay special attention to explaining these concepts: {', '.join(key_concepts)}"
         
-        # Create dynamic prompt template
-        explanation_template = PromptTemplate(
-            input_variables=["code"],
-            template=template_text
-        )
+            return layout_prompt(template_text, concept_guidance)
+
+        explanation_template = cached_template("explain", code, _select_template)
         
         # Return the same pattern: template | llm | parser
         return explanation_template | llm | StrOutputParser()
@@ -399,9 +388,8 @@ try:
             return get_dynamic_explanation_chains(llm, code)
         else:
             # Fallback to original static template
-            explanation_template = PromptTemplate(
-                input_variables=['code'],
-                template='''You're an experienced Python instructor.Explain the following code **line by line** in simple, beginner-friendly language:\n\n{code}'''
+            explanation_template = layout_prompt(
+                '''You're an experienced Python instructor.Explain the following code **line by line** in simple, beginner-friendly language:\n\n{code}'''
             )
             return explanation_template | llm | StrOutputParser()
     
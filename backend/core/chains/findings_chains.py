@@ -0,0 +1,40 @@
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Appended to the selected analysis template in structured mode. Rows instead of objects keep the
+# output (the slow, expensive part) short; core.findings.FINDING_FIELDS gives the field order.
+FINDINGS_FORMAT = '''Report your findings as JSON only, with no prose and no markdown:
+{{"findings": [[severity, start_line, end_line, category, message, fix], ...]}}
+- severity: "critical", "high", "medium" or "low"
+- start_line, end_line: line numbers in the code as given (the number before "|" when lines are numbered)
+- category: one short snake_case word, such as {categories}
+- message: one sentence stating {subject}
+- fix: {fix}
+Report each problem once. Use {{"findings": []}} when there is nothing to report.'''
+
+FINDINGS_STYLE = {
+    "bugs": {
+        "categories": "logic, crash, security, resource_leak, concurrency, error_handling, performance",
+        "subject": "the bug and its consequence",
+        "fix": "the minimal fix as one sentence or a short code fragment",
+    },
+    "edge-cases": {
+        "categories": "empty_input, none_value, boundary, invalid_type, overflow, io_error, concurrency",
+        "subject": "the unhandled input or condition and what goes wrong",
+        "fix": "a one-line pytest assertion or the guard that handles it",
+    },
+}
+
+
+def findings_format(analysis_type: str) -> str:
+    """Structured-output instructions for an analysis type, still escaped for use in a prompt template"""
+    text = FINDINGS_FORMAT
+    for name, value in FINDINGS_STYLE[analysis_type].items():
+        text = text.replace("{" + name + "}", value)
+    return text
+
+
+def json_mode(llm):
+    """The model bound to JSON-object output (the prompt must mention JSON)"""
+    return llm.bind(response_format={"type": "json_object"})
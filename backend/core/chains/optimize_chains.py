@@ -24,9 +24,11 @@
 #     logging.info("There has been an Error..")
 #     raise CustomException(e,sys)
 from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 from langchain.schema.output_parser import StrOutputParser
+from core.code_store import cached_template
+from core.prompt_layout import layout_prompt
+from core.tokenizer import complexity_level
 from core.src.logger import logging
 from core.src.exception import CustomException
 import sys
@@ -81,19 +83,7 @@ class OptimizationAnalyzer:
     @staticmethod
     def assess_complexity(code: str) -> str:
         """Assess code complexity level"""
-        lines = len([line for line in code.split('\n') if line.strip()])
-        functions = code.count('def ')
-        classes = code.count('class ')
-        imports = len([line for line in code.split('\n') if line.strip().startswith(('import ', 'from '))])
-        
-        complexity_score = lines + (functions * 3) + (classes * 5) + imports
-        
-        if complexity_score < 20:
-            return 'simple'
-        elif complexity_score < 60:
-            return 'medium'
-        else:
-            return 'complex'
+        return complexity_level(code, ('simple', 'medium', 'complex'), (20, 60))
     
     @staticmethod
     def detect_optimization_opportunities(code: str) -> dict:
@@ -338,46 +328,56 @@ Provide enterprise-level Python optimization with comprehensive performance stra
     }
 }
 
+# Appended in diff mode: only the changed lines come back and core.code_patcher applies them
+DIFF_FORMAT = '''Answer with the changes only, as a unified diff against the code exactly as given, and nothing else:
+```diff
+@@ -<start>,<count> +<start>,<count> @@
+ unchanged context line
+-removed line
++added line
+```
+- Copy context and removed lines verbatim, including indentation, with about 3 context lines around each change
+- One hunk per changed region, in file order; never repeat unchanged code beyond the context
+- Keep the public interface and behavior; answer with an empty diff block when nothing is worth changing'''
+
 try:
-    def get_dynamic_optimization_chains(llm, code):
+    def get_dynamic_optimization_chains(llm, code, diff=False):
         """Generate dynamic optimization chain based on code analysis"""
+
+        def _select_template():
+            # Analyze the code
+            analyzer = OptimizationAnalyzer()
+            code_type = analyzer.detect_code_type(code)
+            complexity = analyzer.assess_complexity(code)
+            optimization_opportunities = analyzer.detect_optimization_opportunities(code)
+            performance_metrics = analyzer.calculate_performance_metrics(code)
         
-        # Analyze the code
-        analyzer = OptimizationAnalyzer()
-        code_type = analyzer.detect_code_type(code)
-        complexity = analyzer.assess_complexity(code)
-        optimization_opportunities = analyzer.detect_optimization_opportunities(code)
-        performance_metrics = analyzer.calculate_performance_metrics(code)
-        
-        # Select appropriate template
-        template_category = DYNAMIC_OPTIMIZATION_TEMPLATES.get(code_type, DYNAMIC_OPTIMIZATION_TEMPLATES['general'])
-        template_text = template_category.get(complexity, template_category['simple'])
+            # Select appropriate template
+            template_category = DYNAMIC_OPTIMIZATION_TEMPLATES.get(code_type, DYNAMIC_OPTIMIZATION_TEMPLATES['general'])
+            template_text = template_category.get(complexity, template_category['simple'])
         
-        # Enhance template with specific analysis
-        enhanced_template = f"""{template_text}
-
-DETECTED OPTIMIZATION OPPORTUNITIES:
+            # The analysis of this code goes with the code, after the stable instructions
+            analysis_notes = f"""DETECTED OPTIMIZATION OPPORTUNITIES:
 {chr(10).join([f"- {area}: {', '.join(issues)}" for area, issues in optimization_opportunities.items()])}
 
 PERFORMANCE METRICS:
 - Code complexity: {performance_metrics['complexity_estimate']}
 - Total functions: {performance_metrics['function_count']}
 - Loop count: {performance_metrics['loop_count']}
-- Lines of code: {performance_metrics['total_lines']}
-
-Focus on the specific line-level optimizations identified above."""
+- Lines of code: {performance_metrics['total_lines']}"""
         
-        # Create dynamic prompt template
-        optimization_template = PromptTemplate(
-            input_variables=["code"],
-            template=enhanced_template
-        )
+            template_text = f"{template_text}\n\nFocus on the specific line-level optimizations listed with the code."
+            if diff:
+                template_text = f"{template_text}\n\n{DIFF_FORMAT}"
+            return layout_prompt(template_text, analysis_notes)
+
+        optimization_template = cached_template("optimize-diff" if diff else "optimize", code, _select_template)
         
         # Return the same pattern: template | llm | parser
         return optimization_template | llm | StrOutputParser()
     
     # Backward compatibility - keep original function but add dynamic option
-    def get_optimized_chains(llm, code=None, use_dynamic=True):
+    def get_optimized_chains(llm, code=None, use_dynamic=True, diff=False):
         """
         Get optimization chain - supports both static and dynamic modes
         
@@ -385,16 +385,17 @@ Focus on the specific line-level optimizations identified above."""
             llm: Language model instance
             code: Code to optimize (required for dynamic mode)
             use_dynamic: Whether to use dynamic prompting (default: True)
+            diff: Answer with a unified diff instead of the rewritten code (default: False)
         """
         if use_dynamic and code:
-            return get_dynamic_optimization_chains(llm, code)
+            return get_dynamic_optimization_chains(llm, code, diff)
         else:
             # Fallback to original static template
-            optimization_template = PromptTemplate(
-                input_variables=["code"],
-                template='''You are a senior Python engineer. Refactor the code below to make it cleaner, more readable, 
+            template_text = '''You are a senior Python engineer. Refactor the code below to make it cleaner, more readable, 
                           and more efficient:\n\n{code}'''
-            )
+            if diff:
+                template_text = f"{template_text}\n\n{DIFF_FORMAT}"
+            optimization_template = layout_prompt(template_text)
             return optimization_template | llm | StrOutputParser()
     
 except Exception as e:
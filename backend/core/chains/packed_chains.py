@@ -0,0 +1,91 @@
+from langchain.prompts import PromptTemplate
+from langchain.schema.output_parser import StrOutputParser
+from core.chains.triage_chains import TRIAGE_FOCUS
+from core.chains.findings_chains import FINDINGS_STYLE, json_mode
+from core.src.logger import logging
+from core.src.exception import CustomException
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Several small files in one prompt; every file is delimited and answered under its own id
+PACKED_TRIAGE_TEMPLATE = '''You are triaging Python files before an expensive {focus} review.
+
+For EACH file below decide whether it needs that review. Mark a file "suspicious" only if some
+region plausibly contains {focus_detail}. Style issues, missing docstrings and naming do not count.
+Files are independent; judge each one on its own. Lines are numbered as "<line>| <code>".
+
+Answer with one JSON object only, no prose, with an entry for every file id:
+{{"<file id>": {{"verdict": "clean" | "suspicious", "regions": [{{"start": <line>, "end": <line>, "reason": "<few words>"}}]}}}}
+Line numbers refer to the file's own numbering. Use an empty regions list for a clean file.
+
+{files}'''
+
+PACKED_ANALYSIS_INSTRUCTIONS = {
+    "bugs": '''You are a senior Python engineer reviewing several small, independent modules for bugs.
+
+For each file report logic errors, crashes on ordinary input, security vulnerabilities and
+resource leaks, with the line, why it is a problem, and a minimal fix. Say "No issues found."
+for a file without real problems. Do not report style issues.''',
+    "edge-cases": '''You are a senior QA engineer finding edge cases that break several small, independent modules.
+
+For each file list the inputs and conditions it does not handle (empty/None values, boundaries,
+invalid types, errors from I/O or dependencies) and give pytest test cases for them. Say
+"No edge cases found." for a file that handles its inputs fully.''',
+}
+
+PACKED_ANALYSIS_TEMPLATE = '''{instructions}
+
+Answer every file in order. Start each file's answer with a line "### FILE <file id>" (exactly,
+e.g. "### FILE f3") and put nothing before the first header. Never mix findings across files.
+
+{files}'''
+
+# Structured variant: finding rows keyed by file id (see core.findings.FINDING_FIELDS)
+PACKED_FINDINGS_TEMPLATE = '''You are a senior Python engineer reviewing several small, independent modules for {focus}.
+
+Judge each file on its own and never mix findings across files. Do not report style issues.
+Answer with one JSON object only, no prose, with an entry for every file id:
+{{"<file id>": [[severity, start_line, end_line, category, message, fix], ...]}}
+- severity: "critical", "high", "medium" or "low"
+- start_line, end_line: the line numbers shown before "|" in that file
+- category: one short snake_case word, such as {categories}
+- message: one sentence stating {subject}
+- fix: {fix}
+Use an empty list for a file without findings.
+
+{files}'''
+
+try:
+    def get_packed_triage_chain(llm, analysis_type: str):
+        """Triage several delimited files at once -> JSON verdicts keyed by file id"""
+        focus, focus_detail = TRIAGE_FOCUS[analysis_type]
+        template = PromptTemplate(
+            input_variables=["files"],
+            template=PACKED_TRIAGE_TEMPLATE,
+            partial_variables={"focus": focus, "focus_detail": focus_detail},
+        )
+        return template | llm | StrOutputParser()
+
+    def get_packed_analysis_chain(llm, analysis_type: str):
+        """Analyze several delimited files at once -> one "### FILE <id>" section per file"""
+        template = PromptTemplate(
+            input_variables=["files"],
+            template=PACKED_ANALYSIS_TEMPLATE,
+            partial_variables={"instructions": PACKED_ANALYSIS_INSTRUCTIONS[analysis_type]},
+        )
+        return template | llm | StrOutputParser()
+
+    def get_packed_findings_chain(llm, analysis_type: str):
+        """Packed structured chain: delimited, numbered files -> JSON {file id: finding rows}"""
+        template = PromptTemplate(
+            input_variables=["files"],
+            template=PACKED_FINDINGS_TEMPLATE,
+            partial_variables={"focus": TRIAGE_FOCUS[analysis_type][0] + " issues", **FINDINGS_STYLE[analysis_type]},
+        )
+        return template | json_mode(llm) | StrOutputParser()
+
+except Exception as e:
+    logging.info("There has been an Error..")
+    raise CustomException(e, sys)
@@ -0,0 +1,68 @@
+from langchain.prompts import PromptTemplate
+from langchain.schema.output_parser import StrOutputParser
+from core.src.logger import logging
+from core.src.exception import CustomException
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Map step: one file -> short summary
+FILE_SUMMARY_TEMPLATE = '''You are a senior Python engineer documenting an unfamiliar codebase.
+
+Summarize the file below in at most 6 bullet points:
+- Its responsibility within the project
+- The main classes/functions it exposes
+- Important dependencies and side effects (I/O, network, global state)
+
+Be concise and factual. Do not repeat the code.
+
+File: {path}
+{code}'''
+
+# Reduce step: file (or sub-group) summaries of one package -> package summary
+PACKAGE_SUMMARY_TEMPLATE = '''You are a software architect explaining one package of a Python project.
+
+Combine the summaries below into a single package description (at most 8 bullet points):
+- What the package is responsible for
+- How its modules work together
+- Its key entry points
+
+Be concise. Refer to modules by file name.
+
+Package: {package}
+{summaries}'''
+
+# Final step: package summaries -> project overview
+PROJECT_OVERVIEW_TEMPLATE = '''You are a principal engineer writing the overview of a Python project for a new team member.
+
+Using the package descriptions below, explain:
+## Purpose
+## Architecture (how the packages fit together)
+## Main entry points and data flow
+## Notable risks or technical debt
+
+Keep it under 400 words.
+
+Project: {project}
+{summaries}'''
+
+try:
+    def get_file_summary_chain(llm):
+        """Map chain: summarize a single file"""
+        template = PromptTemplate(input_variables=["path", "code"], template=FILE_SUMMARY_TEMPLATE)
+        return template | llm | StrOutputParser()
+
+    def get_package_summary_chain(llm):
+        """Reduce chain: merge file summaries of one package"""
+        template = PromptTemplate(input_variables=["package", "summaries"], template=PACKAGE_SUMMARY_TEMPLATE)
+        return template | llm | StrOutputParser()
+
+    def get_project_overview_chain(llm):
+        """Final chain: merge package summaries into a project overview"""
+        template = PromptTemplate(input_variables=["project", "summaries"], template=PROJECT_OVERVIEW_TEMPLATE)
+        return template | llm | StrOutputParser()
+
+except Exception as e:
+    logging.info("There has been an Error..")
+    raise CustomException(e, sys)
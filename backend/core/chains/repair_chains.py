@@ -0,0 +1,32 @@
+from langchain.prompts import PromptTemplate
+from langchain.schema.output_parser import StrOutputParser
+from core.src.logger import logging
+from core.src.exception import CustomException
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Fixes one broken region of generated code instead of regenerating the whole answer
+REPAIR_TEMPLATE = '''The Python code below was cut out of a larger generated file and does not compile:
+{error}
+
+Fix only the syntax error. Keep everything else exactly as it is, including indentation,
+names and behavior. Answer with the corrected lines {start}-{end} in one ```python block,
+without line numbers and without any explanation.
+
+Lines are numbered as "<line>| <code>".
+{region}'''
+
+try:
+    def get_repair_chain(llm):
+        """Repair chain: compile error and the numbered broken region -> corrected region"""
+        template = PromptTemplate(
+            input_variables=["error", "start", "end", "region"],
+            template=REPAIR_TEMPLATE,
+        )
+        return template | llm | StrOutputParser()
+
+except Exception as e:
+    logging.info("There has been an Error..")
+    raise CustomException(e, sys)
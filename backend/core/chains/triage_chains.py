@@ -0,0 +1,41 @@
+from langchain.prompts import PromptTemplate
+from langchain.schema.output_parser import StrOutputParser
+from core.src.logger import logging
+from core.src.exception import CustomException
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Cheap first pass of a project scan: is the file worth a full review, and where
+TRIAGE_TEMPLATE = '''You are triaging Python files before an expensive {focus} review.
+
+Decide whether the file below needs that review. Mark it "suspicious" only if some region
+plausibly contains {focus_detail}. Style issues, missing docstrings and naming do not count.
+
+Answer with JSON only, no prose:
+{{"verdict": "clean" | "suspicious", "regions": [{{"start": <line>, "end": <line>, "reason": "<few words>"}}]}}
+Use an empty regions list for a clean file. Keep regions tight (the lines at fault, not the whole file).
+
+Lines are numbered as "<line>| <code>".
+{code}'''
+
+TRIAGE_FOCUS = {
+    "bugs": ("bug and security", "a bug, a security vulnerability, or a crash on ordinary input"),
+    "edge-cases": ("edge case", "unhandled edge cases (empty/None input, boundaries, errors, concurrency)"),
+}
+
+try:
+    def get_triage_chain(llm, analysis_type: str):
+        """Triage chain: numbered code -> JSON verdict with suspicious line regions"""
+        focus, focus_detail = TRIAGE_FOCUS[analysis_type]
+        template = PromptTemplate(
+            input_variables=["code"],
+            template=TRIAGE_TEMPLATE,
+            partial_variables={"focus": focus, "focus_detail": focus_detail},
+        )
+        return template | llm | StrOutputParser()
+
+except Exception as e:
+    logging.info("There has been an Error..")
+    raise CustomException(e, sys)
@@ -22,10 +22,12 @@
 #     logging.info("There has been a Problem..")
 #     raise CustomException(e,sys)
 
-from langchain.prompts import PromptTemplate
 import sys
 from dotenv import load_dotenv
 from langchain.schema.output_parser import StrOutputParser
+from core.code_store import cached_template
+from core.prompt_layout import layout_prompt
+from core.tokenizer import complexity_level
 from core.src.logger import logging
 from core.src.exception import CustomException
 import re
@@ -82,18 +84,7 @@ class TestAnalyzer:
     @staticmethod
     def assess_test_complexity(code: str) -> str:
         """Assess testing complexity needed"""
-        lines = len([line for line in code.split('\n') if line.strip()])
-        functions = code.count('def ')
-        classes = code.count('class ')
-        
-        complexity_score = lines + (functions * 2) + (classes * 3)
-        
-        if complexity_score < 20:
-            return 'simple'
-        elif complexity_score < 50:
-            return 'comprehensive'
-        else:
-            return 'enterprise'
+        return complexity_level(code, ('simple', 'comprehensive', 'enterprise'), (20, 50))
     
     @staticmethod
     def identify_test_scenarios(code: str) -> dict:
@@ -366,28 +357,27 @@ Design enterprise Python testing architecture with advanced patterns, comprehens
 try:
     def get_dynamic_unittest_chains(llm, code):
         """Generate dynamic unit test chain based on code analysis"""
+
+        def _select_template():
+            # Analyze the code
+            analyzer = TestAnalyzer()
+            code_type = analyzer.detect_code_type(code)
+            complexity = analyzer.assess_test_complexity(code)
+            test_scenarios = analyzer.identify_test_scenarios(code)
         
-        # Analyze the code
-        analyzer = TestAnalyzer()
-        code_type = analyzer.detect_code_type(code)
-        complexity = analyzer.assess_test_complexity(code)
-        test_scenarios = analyzer.identify_test_scenarios(code)
-        
-        # Select appropriate template
-        template_category = DYNAMIC_UNITTEST_TEMPLATES.get(code_type, DYNAMIC_UNITTEST_TEMPLATES['general'])
-        template_text = template_category.get(complexity, template_category['simple'])
+            # Select appropriate template
+            template_category = DYNAMIC_UNITTEST_TEMPLATES.get(code_type, DYNAMIC_UNITTEST_TEMPLATES['general'])
+            template_text = template_category.get(complexity, template_category['simple'])
         
-        # Enhance template with identified scenarios
-        if test_scenarios:
-            scenario_text = '\n'.join([f"- {k}: {', '.join(map(str, v))}" for k, v in test_scenarios.items()])
-            scenario_guidance = f"\n\nSpecific test scenarios to cover:\n{scenario_text}"
-            template_text += scenario_guidance
+            # Identified scenarios travel with the code, after the stable instructions
+            scenario_guidance = ""
+            if test_scenarios:
+                scenario_text = '\n'.join([f"- {k}: {', '.join(map(str, v))}" for k, v in test_scenarios.items()])
+                scenario_guidance = f"Specific test scenarios to cover:\n{scenario_text}"
         
-        # Create dynamic prompt template
-        unittest_template = PromptTemplate(
-            input_variables=["code"],
-            template=template_text
-        )
+            return layout_prompt(template_text, scenario_guidance)
+
+        unittest_template = cached_template("tests", code, _select_template)
         
         # Return the same pattern: template | llm | parser
         return unittest_template | llm | StrOutputParser()
@@ -406,9 +396,8 @@ try:
             return get_dynamic_unittest_chains(llm, code)
         else:
             # Fallback to original static template
-            unittest_template = PromptTemplate(
-                input_variables=['code'],
-                template='''You are a Senior Python Developer. 
+            unittest_template = layout_prompt(
+                '''You are a Senior Python Developer. 
                 Write Unit test code for the following python code:\n\n{code}'''
             )
             return unittest_template | llm | StrOutputParser()
@@ -0,0 +1,179 @@
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Sequence
+
+from google.cloud import firestore
+from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+from langchain_core.messages import BaseMessage
+from langchain_google_firestore import FirestoreChatMessageHistory
+from core.sqlite_history import SQLiteChatMessageHistory, window_messages
+from core.src.logger import logging
+
+# Chat history configuration (overridable through environment)
+CHAT_HISTORY_BACKEND = os.getenv("CHAT_HISTORY_BACKEND", "firestore")  # "firestore", "sqlite" or "memory"
+FIRESTORE_PROJECT_ID = os.getenv("FIRESTORE_PROJECT_ID", "regata-2ca53")
+CHAT_COLLECTION_NAME = os.getenv("CHAT_COLLECTION_NAME", "chat_history_chains")
+CHAT_HISTORY_FLUSH_INTERVAL = float(os.getenv("CHAT_HISTORY_FLUSH_INTERVAL", "2.0"))
+CHAT_HISTORY_CACHE_SESSIONS = int(os.getenv("CHAT_HISTORY_CACHE_SESSIONS", "1000"))
+CHAT_HISTORY_SQLITE_KEEP = int(os.getenv("CHAT_HISTORY_SQLITE_KEEP", "500"))  # 0 disables compaction
+DEFAULT_CREDENTIALS_PATH = "/home/nuclearreactor3010/AI-CodeBugger/backend/regata-2ca53-df75398184a5.json"
+
+
+@lru_cache(maxsize=1)
+def get_firestore_client() -> firestore.Client:
+    """Process-wide Firestore client (credentials are resolved once)"""
+    os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", DEFAULT_CREDENTIALS_PATH)
+    logging.info(f"Creating Firestore client for project {FIRESTORE_PROJECT_ID}")
+    return firestore.Client(project=FIRESTORE_PROJECT_ID)
+
+
+class BufferedChatMessageHistory(BaseChatMessageHistory):
+    """Write-behind chat history.
+
+    Reads are served from an in-memory copy loaded once per session; appends
+    are queued and written to the backing store by the background flusher,
+    so a chat turn never waits on the database.
+    """
+
+    def __init__(self, session_id: str, store: BaseChatMessageHistory):
+        self.session_id = session_id
+        self._store = store
+        self._messages: List[BaseMessage] = list(store.messages)
+        self._pending: List[BaseMessage] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with self._lock:
+            if isinstance(self._store, SQLiteChatMessageHistory):
+                # Same window the store applies on load, so prompt size stays bounded
+                return window_messages(self._messages, self._store.window_turns, self._store.window_tokens)
+            return list(self._messages)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        with self._lock:
+            self._messages.extend(messages)
+            self._pending.extend(messages)
+            if isinstance(self._store, SQLiteChatMessageHistory) and self._store.window_turns:
+                # Older turns live in SQLite only
+                del self._messages[:-self._store.window_turns * 2]
+        _flusher.mark_dirty(self)
+
+    def flush(self) -> None:
+        """Write queued messages to the backing store"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            try:
+                if isinstance(self._store, FirestoreChatMessageHistory):
+                    # One document write for the whole batch instead of one per message
+                    self._store.messages.extend(pending)
+                    self._store._upsert_messages()
+                else:
+                    self._store.add_messages(pending)
+            except Exception:
+                if isinstance(self._store, FirestoreChatMessageHistory):
+                    del self._store.messages[-len(pending):]
+                with self._lock:
+                    self._pending = pending + self._pending
+                raise
+
+    def clear(self) -> None:
+        with self._lock:
+            self._messages = []
+            self._pending = []
+        self._store.clear()
+
+
+class _HistoryFlusher:
+    """Background thread that periodically flushes dirty sessions"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def mark_dirty(self, history: BufferedChatMessageHistory) -> None:
+        with self._lock:
+            self._dirty.add(history)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="chat-history-flusher", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush_all()
+
+    def flush_all(self) -> None:
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        for history in dirty:
+            try:
+                history.flush()
+            except Exception as e:
+                logging.error(f"Chat history flush failed for {history.session_id}: {str(e)}")
+                with self._lock:
+                    self._dirty.add(history)
+
+
+_flusher = _HistoryFlusher(CHAT_HISTORY_FLUSH_INTERVAL)
+atexit.register(_flusher.flush_all)
+
+# session_id -> history, least recently used first
+_session_histories: "OrderedDict[str, BufferedChatMessageHistory]" = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def _create_store(session_id: str) -> BaseChatMessageHistory:
+    if CHAT_HISTORY_BACKEND == "memory":
+        return InMemoryChatMessageHistory()
+    if CHAT_HISTORY_BACKEND == "sqlite":
+        store = SQLiteChatMessageHistory(session_id)
+        if CHAT_HISTORY_SQLITE_KEEP:
+            deleted = store.compact(CHAT_HISTORY_SQLITE_KEEP)
+            if deleted:
+                logging.info(f"Compacted {deleted} old messages of session {session_id}")
+        return store
+    return FirestoreChatMessageHistory(
+        session_id=session_id,
+        collection=CHAT_COLLECTION_NAME,
+        client=get_firestore_client(),
+    )
+
+
+def get_chat_history(session_id: str) -> BaseChatMessageHistory:
+    """Get the cached history for a session, loading it from the backend on first use"""
+    with _sessions_lock:
+        history = _session_histories.get(session_id)
+        if history is not None:
+            _session_histories.move_to_end(session_id)
+            return history
+
+    history = BufferedChatMessageHistory(session_id, _create_store(session_id))
+
+    evicted = []
+    with _sessions_lock:
+        # Another request may have loaded the same session meanwhile
+        existing = _session_histories.get(session_id)
+        if existing is not None:
+            return existing
+        _session_histories[session_id] = history
+        while len(_session_histories) > CHAT_HISTORY_CACHE_SESSIONS:
+            evicted.append(_session_histories.popitem(last=False)[1])
+
+    for old_history in evicted:
+        try:
+            old_history.flush()
+        except Exception as e:
+            logging.error(f"Chat history flush on eviction failed: {str(e)}")
+    return history
@@ -0,0 +1,259 @@
+import ast
+import inspect
+import io
+import os
+import re
+import threading
+import tokenize
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from core.src.logger import logging
+from core.tokenizer import count_tokens
+
+# What each analysis type can do without. Explanations and chat have no profile:
+# comments and docstrings are part of what users ask about there.
+COMPACTION_PROFILES: Dict[str, Dict[str, Any]] = {
+    "bugs": {"docstrings": "drop", "collapse": True},
+    "edge-cases": {"docstrings": "summary", "collapse": True},
+    "tests": {"docstrings": "summary", "collapse": False},  # docstrings describe the behavior to test
+    "optimize": {"docstrings": "summary", "collapse": False},  # the rewrite is based on what is sent
+}
+
+# Compaction policy (overridable through environment); a request's ``compact`` flag overrides the type default
+CODE_COMPACTION_TYPES = {t.strip() for t in os.getenv("CODE_COMPACTION_TYPES", "bugs,edge-cases").split(",") if t.strip()}
+CODE_COMPACTION_MIN_LINES = int(os.getenv("CODE_COMPACTION_MIN_LINES", "40"))  # shorter code is sent as written
+DOCSTRING_SUMMARY_CHARS = int(os.getenv("DOCSTRING_SUMMARY_CHARS", "120"))
+
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+_DOCSTRING_OWNERS = (ast.Module, ast.ClassDef) + _FUNCTION_NODES
+_TRIVIAL_STATEMENTS = (ast.Pass, ast.Return, ast.Raise, ast.Expr, ast.Assign, ast.AugAssign, ast.AnnAssign)
+
+# "line 12", "Line 12:", "lines 12-15", "lines 12 to 15"
+_LINE_REFERENCE = re.compile(r"\b([Ll]ines?|LINES?)(\s+)(\d+)(?:(\s*(?:-|–|to)\s*)(\d+))?\b")
+# Fenced code blocks (to the end of the text when unclosed) and inline code spans
+_CODE_SPAN = re.compile(r"(```.*?(?:```|\Z)|`[^`\n]*`)", re.DOTALL)
+
+
+class CompactedCode:
+    """Code as sent to the model, with the original line number of each of its lines"""
+
+    def __init__(self, text: str, line_map: List[int], original_tokens: int, compact_tokens: int):
+        self.text = text
+        self.line_map = line_map
+        self.original_tokens = original_tokens
+        self.compact_tokens = compact_tokens
+
+    @property
+    def compacted(self) -> bool:
+        return self.compact_tokens < self.original_tokens
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.compact_tokens
+
+    def original_line(self, line: int) -> int:
+        """Original line number of a compacted line (numbers outside the text are returned as given)"""
+        return self.line_map[line - 1] if 1 <= line <= len(self.line_map) else line
+
+    def numbered(self) -> str:
+        """The text with original line numbers ("N| ..."), for answers that cite lines directly"""
+        return number_lines(self.text, self.line_map)
+
+    def remap(self, text: str) -> str:
+        """``text`` with its "line N" / "lines N-M" references rewritten to original line numbers
+
+        Only prose is rewritten: fenced code blocks and inline code spans are
+        kept as written, as a "line 3" in a string or comment there is part
+        of the program (and may be run as a generated test).
+        """
+        if not self.compacted:
+            return text
+
+        def _replace(match: re.Match) -> str:
+            word, space, start, separator, end = match.groups()
+            remapped = f"{word}{space}{self.original_line(int(start))}"
+            if end is not None:
+                remapped += f"{separator}{self.original_line(int(end))}"
+            return remapped
+
+        # Odd parts of the split are the code spans
+        parts = _CODE_SPAN.split(text)
+        return "".join(part if index % 2 else _LINE_REFERENCE.sub(_replace, part)
+                       for index, part in enumerate(parts))
+
+
+def number_lines(code: str, line_map: Optional[List[int]] = None) -> str:
+    """Code prefixed with line numbers (the original ones from ``line_map`` for compacted or sliced
+    code, where 0 marks an inserted line that gets no number)"""
+    lines = code.split("\n")
+    numbers = line_map if line_map is not None else range(1, len(lines) + 1)
+    return "\n".join(f"{number}| {line}" if number else line for number, line in zip(numbers, lines))
+
+
+def _identity(code: str) -> CompactedCode:
+    tokens = count_tokens(code)
+    return CompactedCode(code, list(range(1, code.count("\n") + 2)), tokens, tokens)
+
+
+def _docstring(node: ast.AST, lines: List[str]) -> Optional[ast.Expr]:
+    """Docstring statement of a module/class/function when it sits on lines of its own"""
+    body = getattr(node, "body", None)
+    if not body or not isinstance(body[0], ast.Expr) or not isinstance(body[0].value, ast.Constant) \
+            or not isinstance(body[0].value.value, str):
+        return None
+    expr = body[0]
+    if not isinstance(node, ast.Module) and expr.lineno == node.lineno:
+        return None  # one-line "def f(): '''doc'''"
+    before = lines[expr.lineno - 1][:expr.col_offset]
+    after = lines[expr.end_lineno - 1][expr.end_col_offset:]
+    if before.strip() or (after.strip() and not after.strip().startswith("#")):
+        return None  # shares its lines with other statements
+    return expr
+
+
+def _summary_line(indent: str, docstring: str) -> str:
+    first = next((line.strip() for line in inspect.cleandoc(docstring).splitlines() if line.strip()), "")
+    if len(first) > DOCSTRING_SUMMARY_CHARS:
+        first = first[:DOCSTRING_SUMMARY_CHARS].rstrip() + "..."
+    first = first.replace("\\", "\\\\").replace('"""', '\\"\\"\\"')
+    if first.endswith('"'):
+        first += " "
+    return f'{indent}"""{first}"""'
+
+
+def compact_code(code: str, docstrings: str = "drop", collapse: bool = True) -> CompactedCode:
+    """Code without comments and blank lines, with docstrings dropped or cut to their first line
+    (``docstrings``: "drop", "summary" or "keep") and one-statement function bodies joined to the
+    ``def`` line. Lines inside multi-line strings are kept as written; code that does not parse is
+    returned unchanged.
+    """
+    code = code.replace("\r\n", "\n")
+    try:
+        tree = ast.parse(code)
+        comments = [token for token in tokenize.generate_tokens(io.StringIO(code).readline)
+                    if token.type == tokenize.COMMENT]
+    except (SyntaxError, ValueError, tokenize.TokenError, IndentationError, RecursionError):
+        return _identity(code)
+
+    lines = code.split("\n")
+    keep = [True] * (len(lines) + 1)  # 1-based
+    override: Dict[int, str] = {}
+    protected = set()  # inside multi-line string literals
+    docstring_lines = set()
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Constant, ast.JoinedStr)) and getattr(node, "end_lineno", None) \
+                and node.end_lineno > node.lineno:
+            protected.update(range(node.lineno + 1, node.end_lineno + 1))
+
+    # Docstrings: dropped (a lone docstring body becomes "..."), or cut to their first line
+    removed_docstrings = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, _DOCSTRING_OWNERS) or docstrings == "keep":
+            continue
+        expr = _docstring(node, lines)
+        if expr is None:
+            continue
+        span = range(expr.lineno, expr.end_lineno + 1)
+        docstring_lines.update(span)
+        protected.difference_update(span)
+        indent = lines[expr.lineno - 1][:expr.col_offset]
+        for line in span:
+            keep[line] = False
+        if docstrings == "summary":
+            keep[expr.lineno] = True
+            override[expr.lineno] = _summary_line(indent, expr.value.value)
+        elif len(node.body) == 1 and not isinstance(node, ast.Module):
+            keep[expr.lineno] = True
+            override[expr.lineno] = f"{indent}..."
+        else:
+            removed_docstrings.add(id(expr))
+
+    # Comments: comment-only lines go, trailing comments are cut off
+    for token in comments:
+        row, col = token.start
+        if row in docstring_lines:
+            continue
+        text = override.get(row, lines[row - 1])[:col].rstrip()
+        if text:
+            override[row] = text
+        else:
+            keep[row] = False
+
+    for number in range(1, len(lines) + 1):
+        if keep[number] and number not in protected and not override.get(number, lines[number - 1]).strip():
+            keep[number] = False
+
+    # One-statement function bodies join the (one-line) header: "def name(self): return self._name"
+    if collapse:
+        for node in ast.walk(tree):
+            if not isinstance(node, _FUNCTION_NODES):
+                continue
+            body = [stmt for stmt in node.body if id(stmt) not in removed_docstrings]
+            if len(body) != 1 or not isinstance(body[0], _TRIVIAL_STATEMENTS) \
+                    or body[0].lineno != body[0].end_lineno or body[0].lineno in protected:
+                continue
+            line = body[0].lineno
+            header = next((number for number in range(line - 1, node.lineno - 1, -1) if keep[number]), None)
+            if header is None or header in protected:
+                continue
+            header_text = override.get(header, lines[header - 1])
+            if not header_text.rstrip().endswith(":"):
+                continue
+            override[header] = f"{header_text.rstrip()} {override.get(line, lines[line - 1]).strip()}"
+            keep[line] = False
+
+    output, line_map = [], []
+    for number in range(1, len(lines) + 1):
+        if keep[number]:
+            output.append(override.get(number, lines[number - 1]))
+            line_map.append(number)
+    text = "\n".join(output)
+    return CompactedCode(text, line_map, count_tokens(code), count_tokens(text))
+
+
+class CompactionStats:
+    """Tokens saved by compaction per analysis type, since startup"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {"calls": 0, "original_tokens": 0, "compact_tokens": 0})
+
+    def record(self, analysis_type: str, compacted: CompactedCode) -> None:
+        with self._lock:
+            entry = self._stats[analysis_type]
+            entry["calls"] += 1
+            entry["original_tokens"] += compacted.original_tokens
+            entry["compact_tokens"] += compacted.compact_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                analysis_type: {
+                    **entry,
+                    "saved_pct": round(100 * (1 - entry["compact_tokens"] / entry["original_tokens"]), 1)
+                    if entry["original_tokens"] else None,
+                }
+                for analysis_type, entry in self._stats.items()
+            }
+
+
+compaction_stats = CompactionStats()
+
+
+def compact_for_analysis(code: str, analysis_type: str, enabled: Optional[bool] = None) -> CompactedCode:
+    """Code to send for an analysis: compacted with the type's profile when compaction is on
+    (``enabled``, else CODE_COMPACTION_TYPES) and the code is long enough, otherwise unchanged"""
+    profile = COMPACTION_PROFILES.get(analysis_type)
+    if enabled is None:
+        enabled = analysis_type in CODE_COMPACTION_TYPES
+    if not enabled or profile is None or code.count("\n") + 1 < CODE_COMPACTION_MIN_LINES:
+        return _identity(code)
+
+    compacted = compact_code(code, **profile)
+    compaction_stats.record(analysis_type, compacted)
+    if compacted.compacted:
+        logging.info(f"Compacted {analysis_type} code: {compacted.original_tokens} -> "
+                     f"{compacted.compact_tokens} tokens ({len(compacted.line_map)} lines)")
+    return compacted
@@ -0,0 +1,236 @@
+import ast
+import difflib
+import os
+import re
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from core.src.logger import logging
+
+# Patching policy (overridable through environment)
+PATCH_MAX_FUZZ = int(os.getenv("PATCH_MAX_FUZZ", "2"))  # context lines a hunk may lose at each end
+PATCH_MIN_SIMILARITY = float(os.getenv("PATCH_MIN_SIMILARITY", "0.85"))  # for blocks that differ beyond whitespace
+
+_HUNK_HEADER = re.compile(r"^@@+\s*-(\d+)(?:,(\d+))?\s+\+(\d+)(?:,(\d+))?\s*@@+")
+_BARE_HUNK_HEADER = re.compile(r"^@@.*@@")
+_DIFF_FENCE = re.compile(r"```(?:diff|patch|udiff)?[ \t]*\n(.*?)```", re.DOTALL)
+
+# Line comparisons from strictest to loosest; the first that locates a hunk wins
+_NORMALIZERS: List[Callable[[str], str]] = [
+    lambda line: line,
+    str.rstrip,
+    lambda line: " ".join(line.split()),
+]
+
+
+class Hunk:
+    """One ``@@`` section of a unified diff: (kind, text) lines with kind " ", "-" or "+" """
+
+    def __init__(self, old_start: Optional[int], lines: List[Tuple[str, str]]):
+        self.old_start = old_start
+        self.lines = lines
+
+    @property
+    def old(self) -> List[str]:
+        return [text for kind, text in self.lines if kind != "+"]
+
+    def trimmed(self, fuzz: int) -> "Hunk":
+        """The hunk without up to ``fuzz`` context lines at each end (as ``patch --fuzz``)"""
+        lines = list(self.lines)
+        start = self.old_start
+        for _ in range(fuzz):
+            if len(lines) > 1 and lines[0][0] == " ":
+                lines.pop(0)
+                start = start + 1 if start else start
+        for _ in range(fuzz):
+            if len(lines) > 1 and lines[-1][0] == " ":
+                lines.pop()
+        return Hunk(start, lines)
+
+
+def parse_unified_diff(text: str) -> Optional[List[Hunk]]:
+    """Hunks of a unified diff answer (fenced or bare); [] for an empty diff, None when it is not a diff"""
+    fenced = _DIFF_FENCE.findall(text or "")
+    body = "\n".join(fenced) if fenced else (text or "")
+    if not body.strip():
+        return []
+
+    hunks: List[Hunk] = []
+    current: Optional[Hunk] = None
+    lines = body.split("\n")
+    for i, line in enumerate(lines):
+        header = _HUNK_HEADER.match(line)
+        if header or _BARE_HUNK_HEADER.match(line):
+            current = Hunk(int(header.group(1)) if header else None, [])
+            hunks.append(current)
+        elif line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            current = None  # file header of the next file section
+        elif current is None or line.startswith("\\"):
+            continue  # prose before the first hunk, "\ No newline at end of file"
+        elif line[:1] in (" ", "-", "+"):
+            current.lines.append((line[0], line[1:]))
+        elif not line.strip():
+            current.lines.append((" ", ""))  # blank context line without its leading space
+        else:
+            current = None  # prose after a hunk
+
+    hunks = [hunk for hunk in hunks if any(kind != " " for kind, _ in hunk.lines)]
+    if not hunks:
+        return None if "@@" not in body and body.strip() else []
+    return hunks
+
+
+def _find_block(lines: List[str], block: List[str], start: int, hint: Optional[int]) -> Optional[Tuple[int, int]]:
+    """(position, comparison level) of ``block`` in ``lines`` at or after ``start``, nearest the hint"""
+    if not block:
+        return None
+    span = len(block)
+    positions = range(start, len(lines) - span + 1)
+    for level, normalize in enumerate(_NORMALIZERS):
+        wanted = [normalize(line) for line in block]
+        found = [i for i in positions if all(normalize(lines[i + k]) == wanted[k] for k in range(span))]
+        if found:
+            return min(found, key=lambda i: abs(i - hint) if hint is not None else i), level
+
+    # Last resort: a block close enough as a whole (typos, reflowed expressions)
+    wanted_text = "\n".join(line.strip() for line in block)
+    best, best_ratio = None, PATCH_MIN_SIMILARITY
+    for i in positions:
+        matcher = difflib.SequenceMatcher(None, wanted_text, "\n".join(line.strip() for line in lines[i:i + span]))
+        if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio > best_ratio or (ratio == best_ratio and best is not None and hint is not None
+                                  and abs(i - hint) < abs(best - hint)):
+            best, best_ratio = i, ratio
+    return (best, len(_NORMALIZERS)) if best is not None else None
+
+
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+class PatchResult:
+    """Outcome of applying a diff: the patched code, or None with the reason it did not apply"""
+
+    def __init__(self, code: Optional[str], hunks: int = 0, fuzzy: int = 0, error: str = ""):
+        self.code = code
+        self.hunks = hunks
+        self.fuzzy = fuzzy  # hunks located only with fuzz or loose comparison
+        self.error = error
+
+    @property
+    def applied(self) -> bool:
+        return self.code is not None
+
+
+def apply_unified_diff(code: str, diff: str, original_line: Optional[Callable[[int], int]] = None) -> PatchResult:
+    """Apply a model-written unified diff to ``code``, tolerating what models get wrong
+
+    Hunk line numbers are only a hint (``original_line`` translates them when
+    the model saw compacted code): each hunk is located by its context and
+    removed lines, exactly, then ignoring trailing or all whitespace
+    differences, then with up to PATCH_MAX_FUZZ context lines dropped at
+    each end, and finally by overall similarity. Context lines keep the
+    file's text; added lines are re-indented when the hunk's indentation is
+    off by a constant prefix. The patch applies only when every hunk is
+    located in order and code that parsed before still parses.
+    """
+    hunks = parse_unified_diff(diff)
+    if hunks is None:
+        return PatchResult(None, error="answer is not a unified diff")
+    lines = code.split("\n")
+    output: List[str] = []
+    cursor = fuzzy = 0
+    for number, hunk in enumerate(hunks, 1):
+        hint = None
+        if hunk.old_start:
+            hint = (original_line(hunk.old_start) if original_line else hunk.old_start) - 1
+        located = None
+        for fuzz in range(PATCH_MAX_FUZZ + 1):
+            candidate = hunk.trimmed(fuzz)
+            if not candidate.old:
+                # Pure insertion: only the line number says where
+                if fuzz or candidate.old_start is None:
+                    break
+                position = max(cursor, min(len(lines), hint + 1 if hint is not None else cursor))
+                located = (candidate, position, 0)
+                break
+            found = _find_block(lines, candidate.old, cursor, hint)
+            if found is not None:
+                located = (candidate, found[0], found[1] + fuzz)
+                break
+        if located is None:
+            return PatchResult(None, len(hunks), fuzzy, f"hunk {number} of {len(hunks)} does not match the code")
+
+        candidate, position, looseness = located
+        fuzzy += looseness > 0
+        output.extend(lines[cursor:position])
+        # Indentation the model lost or added, taken from the first non-blank matched line
+        shift = ""
+        old_lines = [(kind, text) for kind, text in candidate.lines if kind != "+"]
+        for offset, (_, text) in enumerate(old_lines):
+            if text.strip() and position + offset < len(lines):
+                file_indent, hunk_indent = _indent(lines[position + offset]), _indent(text)
+                if file_indent.startswith(hunk_indent):
+                    shift = file_indent[len(hunk_indent):]
+                break
+        for kind, text in candidate.lines:
+            if kind == "+":
+                output.append(shift + text if text.strip() else text)
+            else:
+                if kind == " ":
+                    output.append(lines[position])
+                position += 1
+        cursor = position
+    output.extend(lines[cursor:])
+
+    patched = "\n".join(output)
+    try:
+        ast.parse(code)
+    except SyntaxError:
+        return PatchResult(patched, len(hunks), fuzzy)
+    try:
+        ast.parse(patched)
+    except SyntaxError as e:
+        return PatchResult(None, len(hunks), fuzzy, f"patched code does not parse: {e.msg} (line {e.lineno})")
+    return PatchResult(patched, len(hunks), fuzzy)
+
+
+def make_unified_diff(original: str, patched: str, path: str = "code.py") -> str:
+    """Canonical unified diff between two versions (what clients get, whatever the model wrote)"""
+    return "".join(difflib.unified_diff(original.splitlines(keepends=True), patched.splitlines(keepends=True),
+                                        fromfile=f"a/{path}", tofile=f"b/{path}"))
+
+
+class DiffStats:
+    """Diff-mode optimizations since startup: patches applied, fuzzy, fallen back, and output tokens
+    written as diffs against the size of the files they patched"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "applied": 0, "fuzzy": 0, "fallbacks": 0,
+                       "diff_completion_tokens": 0, "patched_file_tokens": 0}
+
+    def record(self, result: PatchResult, completion_tokens: int, file_tokens: int) -> None:
+        with self._lock:
+            self._stats["calls"] += 1
+            if result.applied:
+                self._stats["applied"] += 1
+                self._stats["fuzzy"] += int(result.fuzzy > 0)
+                self._stats["diff_completion_tokens"] += completion_tokens
+                self._stats["patched_file_tokens"] += file_tokens
+            else:
+                self._stats["fallbacks"] += 1
+        if not result.applied:
+            logging.info(f"Diff did not apply, falling back to a full rewrite: {result.error}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["output_saved_pct"] = (round(100 * (1 - stats["diff_completion_tokens"] / stats["patched_file_tokens"]), 1)
+                                     if stats["patched_file_tokens"] else None)
+        return stats
+
+
+diff_stats = DiffStats()
@@ -0,0 +1,163 @@
+import ast
+import os
+import re
+import textwrap
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.chains.repair_chains import get_repair_chain
+from core.llm_scheduler import create_llm, track_usage, PRIORITY_ANALYSIS
+from core.src.logger import logging
+
+# Repair policy (overridable through environment)
+SYNTAX_REPAIR_ATTEMPTS = int(os.getenv("SYNTAX_REPAIR_ATTEMPTS", "2"))  # repair calls per broken code block
+SYNTAX_REPAIR_CONTEXT = int(os.getenv("SYNTAX_REPAIR_CONTEXT", "6"))  # lines sent on each side of the error
+SYNTAX_REPAIR_MODEL = os.getenv("SYNTAX_REPAIR_MODEL", "")  # empty = the model that wrote the code
+
+_PYTHON_BLOCK = re.compile(r"```(?:python3?|py)[ \t]*\n(.*?)```", re.DOTALL)
+_ANY_BLOCK = re.compile(r"```[\w+-]*[ \t]*\n(.*?)```", re.DOTALL)
+_NUMBERED_LINE = re.compile(r"^\s*\d+\| ?")
+
+# Errors a snippet gets only because its enclosing function or loop was left out of the answer
+_FRAGMENT_ERRORS = ("outside function", "outside loop", "not properly in loop", "outside async function",
+                    "at module level")
+
+
+def syntax_error(code: str) -> Optional[SyntaxError]:
+    """Why the code does not compile (``ast.parse``, then ``compile``); None when it does"""
+    source = textwrap.dedent(code)
+    try:
+        tree = ast.parse(source)
+        compile(tree, "<generated>", "exec", dont_inherit=True)
+    except SyntaxError as e:
+        if isinstance(e.msg, str) and any(fragment in e.msg for fragment in _FRAGMENT_ERRORS):
+            return None
+        return e
+    except ValueError as e:  # null bytes
+        return SyntaxError(str(e))
+    return None
+
+
+def _region(error: SyntaxError, total_lines: int) -> Tuple[int, int]:
+    line = min(max(error.lineno or total_lines, 1), total_lines)
+    end_line = min(max(getattr(error, "end_lineno", None) or line, line), total_lines)
+    return max(1, line - SYNTAX_REPAIR_CONTEXT), min(total_lines, end_line + SYNTAX_REPAIR_CONTEXT)
+
+
+def _replacement(answer: str) -> Optional[List[str]]:
+    """Corrected lines of a repair answer (its code block, line numbers stripped if the model kept them)"""
+    match = _ANY_BLOCK.search(answer or "")
+    if match is None:
+        return None
+    lines = match.group(1).rstrip("\n").split("\n")
+    if all(_NUMBERED_LINE.match(line) for line in lines if line.strip()):
+        lines = [_NUMBERED_LINE.sub("", line, count=1) for line in lines]
+    return lines
+
+
+class RepairResult:
+    """Generated answer after validation: how many python blocks were checked, broken and repaired"""
+
+    def __init__(self, text: str, blocks: int = 0, invalid: int = 0, repaired: int = 0, repair_calls: int = 0,
+                 errors: Optional[List[str]] = None):
+        self.text = text
+        self.blocks = blocks
+        self.invalid = invalid
+        self.repaired = repaired
+        self.repair_calls = repair_calls
+        self.errors = errors or []  # errors left in blocks that could not be repaired
+
+    @property
+    def valid(self) -> bool:
+        return self.repaired == self.invalid
+
+
+async def _repair_block(chain, code: str, error: SyntaxError, result: RepairResult) -> Optional[str]:
+    """The block with its broken regions rewritten by the model, or None when it still does not compile"""
+    lines = code.split("\n")
+    for _ in range(SYNTAX_REPAIR_ATTEMPTS):
+        start, end = _region(error, len(lines))
+        region = "\n".join(f"{number}| {line}" for number, line in enumerate(lines[start - 1:end], start))
+        answer = await chain.ainvoke({"error": f"{error.msg} (line {error.lineno})", "start": start, "end": end,
+                                      "region": region})
+        result.repair_calls += 1
+        replacement = _replacement(answer)
+        if replacement is None or len(replacement) > 2 * (end - start + 1) + 2:
+            return None  # no code, or the whole block again instead of the region
+        # Later errors show up once the first is fixed; each attempt sends the region of the current one
+        lines = lines[:start - 1] + replacement + lines[end:]
+        error = syntax_error("\n".join(lines))
+        if error is None:
+            return "\n".join(lines)
+    return None
+
+
+async def repair_generated_code(text: str, model: str, priority: int = PRIORITY_ANALYSIS, **llm_kwargs) -> RepairResult:
+    """Check the ```python blocks of a generated answer and repair the ones that do not compile
+
+    Only a broken block's error and the lines around it go back to the model
+    (SYNTAX_REPAIR_CONTEXT on each side), and the corrected lines are spliced
+    in; a block still broken after SYNTAX_REPAIR_ATTEMPTS is left as written.
+    """
+    matches = list(_PYTHON_BLOCK.finditer(text or ""))
+    result = RepairResult(text, blocks=len(matches))
+    broken = [(match, error) for match, error in ((match, syntax_error(match.group(1))) for match in matches)
+              if error is not None]
+    if not broken:
+        return result
+
+    result.invalid = len(broken)
+    chain = get_repair_chain(create_llm(SYNTAX_REPAIR_MODEL or model, priority=priority, **llm_kwargs))
+    repaired_text = text
+    for match, error in reversed(broken):  # from the end, so earlier offsets stay valid
+        fixed = await _repair_block(chain, match.group(1), error, result)
+        if fixed is None:
+            result.errors.append(f"{error.msg} (line {error.lineno})")
+            continue
+        result.repaired += 1
+        trailing = "\n" if not fixed.endswith("\n") else ""
+        repaired_text = repaired_text[:match.start(1)] + fixed + trailing + repaired_text[match.end(1):]
+    result.text = repaired_text
+    logging.info(f"Syntax repair: {result.repaired}/{result.invalid} broken blocks fixed "
+                 f"with {result.repair_calls} repair calls")
+    return result
+
+
+class RepairStats:
+    """Outputs checked and repaired since startup, and what the avoided full regenerations would have cost"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"outputs": 0, "invalid_outputs": 0, "regenerations_avoided": 0, "unrepaired_outputs": 0,
+                       "repair_calls": 0, "repair_tokens": 0, "regeneration_tokens_avoided": 0}
+
+    def record(self, result: RepairResult, repair_tokens: int, regeneration_tokens: int) -> None:
+        """``regeneration_tokens``: prompt + completion tokens of the call that produced the answer"""
+        with self._lock:
+            self._stats["outputs"] += 1
+            if not result.invalid:
+                return
+            self._stats["invalid_outputs"] += 1
+            self._stats["repair_calls"] += result.repair_calls
+            self._stats["repair_tokens"] += repair_tokens
+            if result.valid:
+                self._stats["regenerations_avoided"] += 1
+                self._stats["regeneration_tokens_avoided"] += regeneration_tokens
+            else:
+                self._stats["unrepaired_outputs"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
+repair_stats = RepairStats()
+
+
+async def validate_generated_code(text: str, model: str, priority: int = PRIORITY_ANALYSIS,
+                                  regeneration_tokens: int = 0, **llm_kwargs) -> RepairResult:
+    """``repair_generated_code`` with its repair calls metered into ``repair_stats``"""
+    with track_usage() as meter:
+        result = await repair_generated_code(text, model, priority, **llm_kwargs)
+    repair_stats.record(result, meter.prompt_tokens + meter.completion_tokens, regeneration_tokens)
+    return result
@@ -0,0 +1,273 @@
+import ast
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.src.logger import logging
+
+# Slicing policy (overridable through environment)
+CHAT_SLICE_MIN_LINES = int(os.getenv("CHAT_SLICE_MIN_LINES", "120"))  # smaller files are sent whole
+CHAT_SLICE_MAX_UNITS = int(os.getenv("CHAT_SLICE_MAX_UNITS", "6"))
+CHAT_SLICE_MAX_FRACTION = float(os.getenv("CHAT_SLICE_MAX_FRACTION", "0.6"))  # above this, send the whole file
+CHAT_SLICE_CACHE_SIZE = int(os.getenv("CHAT_SLICE_CACHE_SIZE", "256"))
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+# Questions about the file as a whole need all of it
+_WHOLE_FILE_PHRASES = ("this file", "whole file", "entire file", "the file", "overall", "whole code",
+                       "entire code", "all the code", "architecture", "summarize", "summary", "structure",
+                       "every function", "all functions", "all classes")
+
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "to", "of", "in", "on", "for", "and", "or", "not",
+    "it", "its", "this", "that", "these", "those", "what", "why", "how", "when", "where", "which", "who",
+    "does", "do", "did", "can", "could", "should", "would", "will", "there", "here", "with", "from", "by",
+    "me", "my", "i", "you", "your", "we", "our", "about", "explain", "code", "function", "method", "class",
+    "python", "please", "line", "lines", "work", "works", "use", "used", "using", "if", "then", "else",
+    "return", "returns", "def", "self", "get", "set", "value", "values",
+}
+
+
+def _words(name: str) -> Set[str]:
+    """Lowercase word parts of an identifier (snake_case and camelCase)"""
+    parts = set()
+    for chunk in name.split("_"):
+        parts.update(piece.lower() for piece in _CAMEL_BOUNDARY.split(chunk) if len(piece) > 2)
+    return parts
+
+
+def question_terms(question: str) -> Tuple[Set[str], Set[str]]:
+    """Identifiers mentioned in the question and the keywords they and the prose contain"""
+    identifiers = {token for token in _IDENTIFIER.findall(question) if token.lower() not in _STOPWORDS}
+    keywords = set()
+    for token in identifiers:
+        keywords.update(word for word in _words(token) if word not in _STOPWORDS)
+    return identifiers, keywords
+
+
+class _Unit:
+    """A top-level function/class, or a method of a top-level class"""
+
+    def __init__(self, node, parent: Optional["_Unit"] = None):
+        self.node = node
+        self.name = node.name
+        self.parent = parent
+        decorators = [decorator.lineno for decorator in getattr(node, "decorator_list", [])]
+        self.start = min([node.lineno] + decorators)
+        self.end = node.end_lineno
+        self.used_names: Set[str] = set()
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name):
+                self.used_names.add(child.id)
+            elif isinstance(child, ast.Attribute):
+                self.used_names.add(child.attr)
+        self.docstring = ast.get_docstring(node) or ""
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.parent.name}.{self.name}" if self.parent else self.name
+
+
+class _ParsedFile:
+    """Units, imports and module-level assignments of one file"""
+
+    def __init__(self, code: str):
+        self.lines = code.splitlines()
+        tree = ast.parse(code)
+        self.units: List[_Unit] = []
+        self.top_level: Dict[str, _Unit] = {}
+        self.imports: List[Tuple[int, int, Set[str]]] = []
+        self.assignments: Dict[str, Tuple[int, int]] = {}
+
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                unit = _Unit(node)
+                self.units.append(unit)
+                self.top_level[unit.name] = unit
+                if isinstance(node, ast.ClassDef):
+                    for item in node.body:
+                        if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                            self.units.append(_Unit(item, parent=unit))
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                bound = {(alias.asname or alias.name).split(".")[0] for alias in node.names}
+                self.imports.append((node.lineno, node.end_lineno, bound))
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        self.assignments[target.id] = (node.lineno, node.end_lineno)
+
+
+# Parsed files keyed by content hash (chat turns on the same file reuse the parse)
+_parse_cache: "OrderedDict[str, Optional[_ParsedFile]]" = OrderedDict()
+
+
+def _parse(code: str) -> Optional[_ParsedFile]:
+    key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    if key in _parse_cache:
+        _parse_cache.move_to_end(key)
+        return _parse_cache[key]
+    try:
+        parsed = _ParsedFile(code)
+    except (SyntaxError, ValueError, RecursionError):
+        parsed = None
+    _parse_cache[key] = parsed
+    while len(_parse_cache) > CHAT_SLICE_CACHE_SIZE:
+        _parse_cache.popitem(last=False)
+    return parsed
+
+
+def _score(unit: _Unit, identifiers: Set[str], keywords: Set[str]) -> float:
+    score = 0.0
+    if unit.name in identifiers or unit.qualified_name in identifiers:
+        score += 10
+    elif unit.name.lower() in {identifier.lower() for identifier in identifiers}:
+        score += 8
+    score += 3 * len(_words(unit.name) & keywords)
+    score += 0.5 * min(len(unit.used_names & identifiers), 6)
+    if unit.docstring:
+        score += 0.5 * min(len(_words(" ".join(_IDENTIFIER.findall(unit.docstring))) & keywords), 4)
+    return score
+
+
+def _assemble(parsed: _ParsedFile, selected: List[_Unit],
+              extra_ranges: Optional[List[Tuple[int, int]]] = None) -> Tuple[str, int, List[int]]:
+    """Selected units plus what they need (direct dependencies, class headers, imports,
+    module-level assignments) with omitted regions marked; ``selected`` is extended in place
+
+    Returns:
+        (sliced code, number of original lines kept, original line of each sliced line (0 for markers))
+    """
+    # Direct dependencies: module-level functions/classes/constants the selection uses
+    selected_names = {unit.qualified_name for unit in selected}
+    used_names: Set[str] = set()
+    for unit in selected:
+        used_names |= unit.used_names
+    for name in sorted(used_names):
+        dependency = parsed.top_level.get(name)
+        if dependency is not None and dependency.name not in selected_names and all(
+                unit.parent is not dependency for unit in selected):
+            selected.append(dependency)
+            selected_names.add(dependency.name)
+            used_names |= dependency.used_names
+
+    ranges: List[Tuple[int, int]] = list(extra_ranges or [])
+    for unit in selected:
+        if unit.parent is not None and unit.parent not in selected:
+            # Method without its class: keep the class header (and docstring) and a short __init__
+            header_end = unit.parent.node.body[0].end_lineno if unit.parent.docstring else unit.parent.node.lineno
+            ranges.append((unit.parent.start, header_end))
+            init = next((other for other in parsed.units
+                         if other.parent is unit.parent and other.name == "__init__"), None)
+            if init is not None and init.end - init.start < 40:
+                ranges.append((init.start, init.end))
+        ranges.append((unit.start, unit.end))
+    for start, end, bound in parsed.imports:
+        if bound & used_names:
+            ranges.append((start, end))
+    for name, (start, end) in parsed.assignments.items():
+        if name in used_names:
+            ranges.append((start, end))
+
+    # Merge overlapping/adjacent ranges
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    output: List[str] = []
+    line_map: List[int] = []
+    previous_end = 0
+    for start, end in merged:
+        if start > previous_end + 1:
+            output.append(f"# ... (lines {previous_end + 1}-{start - 1} omitted)")
+            line_map.append(0)
+        output.extend(parsed.lines[start - 1:end])
+        line_map.extend(range(start, end + 1))
+        previous_end = end
+    if previous_end < len(parsed.lines):
+        output.append(f"# ... (lines {previous_end + 1}-{len(parsed.lines)} omitted)")
+        line_map.append(0)
+    return "\n".join(output), sum(end - start + 1 for start, end in merged), line_map
+
+
+def slice_code_for_question(code: str, question: str) -> Tuple[str, Dict[str, Any]]:
+    """Relevant part of a file for a chat question
+
+    Picks the functions, classes and methods the question refers to (by
+    identifier or keyword), adds the module-level definitions they use
+    directly and the imports they need, and marks omitted regions. The whole
+    file is returned when it is small, cannot be parsed, the question is about
+    the file as a whole, nothing matches, or the slice would not be much smaller.
+
+    Returns:
+        (code to send, info dict with ``sliced``, ``units``, ``original_lines``, ``slice_lines``)
+    """
+    total_lines = code.count("\n") + 1
+    info: Dict[str, Any] = {"sliced": False, "units": [], "original_lines": total_lines, "slice_lines": total_lines}
+
+    if total_lines < CHAT_SLICE_MIN_LINES:
+        return code, info
+    question_lower = question.lower()
+    if any(phrase in question_lower for phrase in _WHOLE_FILE_PHRASES):
+        return code, info
+    parsed = _parse(code)
+    if parsed is None or not parsed.units:
+        return code, info
+
+    identifiers, keywords = question_terms(question)
+    scored = sorted(((_score(unit, identifiers, keywords), unit) for unit in parsed.units),
+                    key=lambda pair: -pair[0])
+    if not scored or scored[0][0] < 3:
+        return code, info
+
+    cutoff = scored[0][0] * 0.3
+    selected = [unit for score, unit in scored[:CHAT_SLICE_MAX_UNITS] if score >= cutoff]
+    text, slice_lines, _ = _assemble(parsed, selected)
+    if slice_lines > total_lines * CHAT_SLICE_MAX_FRACTION:
+        return code, info
+
+    info.update({
+        "sliced": True,
+        "units": [unit.qualified_name for unit in selected],
+        "slice_lines": slice_lines,
+    })
+    logging.info(f"Chat slice: {slice_lines}/{total_lines} lines ({', '.join(info['units'])})")
+    return text, info
+
+
+def slice_code_for_lines(code: str, regions: List[Tuple[int, int]]) -> Tuple[str, Dict[str, Any]]:
+    """Part of a file covering the given (start, end) line regions, widened to whole units
+
+    Each region pulls in the innermost function, method or class overlapping it
+    (module-level lines are kept as they are), plus what those units need, as
+    in ``slice_code_for_question``. The whole file is returned when it cannot
+    be parsed or the slice would not be much smaller.
+    """
+    total_lines = code.count("\n") + 1
+    info: Dict[str, Any] = {"sliced": False, "units": [], "original_lines": total_lines, "slice_lines": total_lines}
+    parsed = _parse(code)
+    if parsed is None or not regions:
+        return code, info
+
+    selected: List[_Unit] = []
+    extra_ranges: List[Tuple[int, int]] = []
+    for start, end in regions:
+        overlapping = [unit for unit in parsed.units if unit.start <= end and unit.end >= start]
+        innermost = [unit for unit in overlapping if not any(other.parent is unit for other in overlapping)]
+        if innermost:
+            selected.extend(unit for unit in innermost if unit not in selected)
+        else:
+            extra_ranges.append((max(1, start), min(total_lines, end)))
+
+    text, slice_lines, line_map = _assemble(parsed, selected, extra_ranges)
+    if slice_lines > total_lines * CHAT_SLICE_MAX_FRACTION:
+        return code, info
+    info.update({"sliced": True, "units": [unit.qualified_name for unit in selected], "slice_lines": slice_lines,
+                 "line_map": line_map})
+    return text, info
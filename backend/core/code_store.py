@@ -0,0 +1,102 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from core.src.logger import logging
+
+# Registered code and derived per-hash artifacts (overridable through environment)
+CODE_STORE_MAX_BYTES = int(os.getenv("CODE_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+CODE_TEMPLATE_CACHE_SIZE = int(os.getenv("CODE_TEMPLATE_CACHE_SIZE", "2048"))
+
+
+def code_hash(code: str) -> str:
+    """Content hash clients use as ``code_ref`` (sha256 of the UTF-8 source)"""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+class CodeStore:
+    """Content-addressed store of registered code, evicted least recently used by total size"""
+
+    def __init__(self, max_bytes: int = CODE_STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def register(self, code: str) -> str:
+        ref = code_hash(code)
+        with self._lock:
+            if ref in self._entries:
+                self._entries.move_to_end(ref)
+                return ref
+            self._entries[ref] = code
+            self._size += len(code)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return ref
+
+    def get(self, ref: str) -> Optional[str]:
+        with self._lock:
+            code = self._entries.get(ref)
+            if code is not None:
+                self._entries.move_to_end(ref)
+            return code
+
+
+code_store = CodeStore()
+
+
+def resolve_code(code: Optional[str], code_ref: Optional[str]) -> str:
+    """Code of a request that sends either the source or a registered ``code_ref``
+
+    Raises:
+        KeyError: ``code_ref`` is unknown (never registered or evicted)
+        ValueError: neither ``code`` nor ``code_ref`` was given
+    """
+    if code is not None:
+        return code
+    if code_ref:
+        resolved = code_store.get(code_ref)
+        if resolved is None:
+            raise KeyError(code_ref)
+        return resolved
+    raise ValueError("Either 'code' or 'code_ref' is required")
+
+
+# (chain kind, code hash) -> prompt template selected for that code
+_template_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+_template_lock = threading.Lock()
+
+
+def cached_template(kind: str, code: str, build: Callable[[], Any]) -> Any:
+    """Prompt template selected for ``code`` by a dynamic chain, built once per content hash
+
+    Code classification (code type, complexity, risk scans) only depends on the
+    code, so repeated chat turns and analyses of the same code reuse the result.
+    """
+    key = (kind, code_hash(code))
+    with _template_lock:
+        template = _template_cache.get(key)
+        if template is not None:
+            _template_cache.move_to_end(key)
+            return template
+
+    template = build()
+    with _template_lock:
+        _template_cache[key] = template
+        while len(_template_cache) > CODE_TEMPLATE_CACHE_SIZE:
+            _template_cache.popitem(last=False)
+    logging.info(f"Selected {kind} template for code {key[1][:12]}")
+    return template
+
+
+def describe_code(code: str) -> Dict[str, Any]:
+    """Basic facts returned when code is registered"""
+    return {
+        "code_ref": code_hash(code),
+        "size": len(code),
+        "lines": code.count("\n") + 1,
+    }
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, SystemMessage, get_buffer_string
+from core.src.logger import logging
+from core.tokenizer import count_tokens
+
+# Memory policy (overridable through environment)
+CHAT_MEMORY_VERBATIM_TURNS = int(os.getenv("CHAT_MEMORY_VERBATIM_TURNS", "4"))
+CHAT_MEMORY_HISTORY_TOKENS = int(os.getenv("CHAT_MEMORY_HISTORY_TOKENS", "1500"))
+CHAT_MEMORY_SUMMARY_WORKERS = int(os.getenv("CHAT_MEMORY_SUMMARY_WORKERS", "2"))
+CHAT_MEMORY_CACHE_SESSIONS = int(os.getenv("CHAT_MEMORY_CACHE_SESSIONS", "1000"))
+
+# Summarization runs here, never on the request path
+_summary_executor = ThreadPoolExecutor(max_workers=CHAT_MEMORY_SUMMARY_WORKERS, thread_name_prefix="chat-summary")
+
+
+def _estimate_tokens(message: BaseMessage) -> int:
+    return count_tokens(str(message.content)) + 4
+
+
+def _fingerprint(message: BaseMessage) -> str:
+    return hashlib.sha256(f"{message.type}\0{message.content}".encode("utf-8")).hexdigest()
+
+
+class _SummaryState:
+    """Rolling summary of one session and the last message folded into it"""
+
+    def __init__(self):
+        self.summary = ""
+        self.last_folded: Optional[str] = None
+        self.folded_count = 0  # messages of the history up to the last folded one, when it was folded
+        self.history_length = 0  # messages in the history then
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+
+# session key -> summary state, shared by every request of the session (least recently used first)
+_summary_states: "OrderedDict[str, _SummaryState]" = OrderedDict()
+_states_lock = threading.Lock()
+
+
+def _get_state(key: str) -> _SummaryState:
+    with _states_lock:
+        state = _summary_states.get(key)
+        if state is None:
+            state = _summary_states[key] = _SummaryState()
+            while len(_summary_states) > CHAT_MEMORY_CACHE_SESSIONS:
+                _summary_states.popitem(last=False)
+        else:
+            _summary_states.move_to_end(key)
+        return state
+
+
+class SummarizingChatMessageHistory(BaseChatMessageHistory):
+    """Token-budgeted view over a chat history.
+
+    The last ``verbatim_turns`` turns are returned as-is; older turns are
+    folded into a rolling summary that a background worker refreshes after
+    the turn that made them overflow. Until the summary catches up, the
+    not-yet-summarized turns are kept verbatim within ``history_tokens``.
+    Writes go straight to the wrapped history.
+    """
+
+    def __init__(self, history: BaseChatMessageHistory, summary_chain,
+                 verbatim_turns: int = CHAT_MEMORY_VERBATIM_TURNS,
+                 history_tokens: int = CHAT_MEMORY_HISTORY_TOKENS):
+        self.history = history
+        self.summary_chain = summary_chain
+        self.verbatim_turns = verbatim_turns
+        self.history_tokens = history_tokens
+        self.session_key = getattr(history, "session_id", None) or str(id(history))
+
+    def _unsummarized(self, older: List[BaseMessage], last_folded: Optional[str], folded_count: int,
+                      grown: bool) -> List[BaseMessage]:
+        if last_folded is None:
+            return older
+        for position in range(len(older) - 1, -1, -1):
+            if _fingerprint(older[position]) == last_folded:
+                return older[position + 1:]
+        # The folded message no longer matches (e.g. reloaded from the store): if the history only grew
+        # since, the messages past the folded count are the new ones; if the window moved past it, all are
+        if grown:
+            return older[folded_count:]
+        return older
+
+    def _schedule_refresh(self, state: _SummaryState, pending: List[BaseMessage], history_length: int) -> None:
+        with state.lock:
+            if state.refreshing:
+                return
+            state.refreshing = True
+        _summary_executor.submit(self._refresh, state, list(pending), history_length)
+
+    def _refresh(self, state: _SummaryState, pending: List[BaseMessage], history_length: int) -> None:
+        try:
+            summary = self.summary_chain.invoke({
+                "summary": state.summary or "(none)",
+                "new_lines": get_buffer_string(pending),
+            })
+            with state.lock:
+                state.summary = summary.strip()
+                state.last_folded = _fingerprint(pending[-1])
+                # Pending always ends where the older messages end, right before the verbatim turns
+                state.folded_count = history_length - self.verbatim_turns * 2
+                state.history_length = history_length
+            logging.info(f"Folded {len(pending)} messages into summary of session {self.session_key}")
+        except Exception as e:
+            logging.error(f"Chat summary refresh failed for {self.session_key}: {str(e)}")
+        finally:
+            with state.lock:
+                state.refreshing = False
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        messages = self.history.messages
+        cut = max(len(messages) - self.verbatim_turns * 2, 0)
+        older, recent = messages[:cut], messages[cut:]
+        if not older:
+            return list(recent)
+
+        state = _get_state(self.session_key)
+        with state.lock:
+            summary, last_folded, folded_count = state.summary, state.last_folded, state.folded_count
+            grown = len(messages) > state.history_length
+        pending = self._unsummarized(older, last_folded, folded_count, grown)
+        if pending:
+            self._schedule_refresh(state, pending, len(messages))
+
+        # Turns the summary does not cover yet, newest first, within the token budget
+        budget = self.history_tokens - sum(_estimate_tokens(message) for message in recent)
+        carried: List[BaseMessage] = []
+        for message in reversed(pending):
+            budget -= _estimate_tokens(message)
+            if budget < 0:
+                break
+            carried.append(message)
+
+        result: List[BaseMessage] = []
+        if summary:
+            result.append(SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+        return result + carried[::-1] + list(recent)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.history.add_messages(messages)
+
+    def clear(self) -> None:
+        self.history.clear()
+        with _states_lock:
+            _summary_states.pop(self.session_key, None)
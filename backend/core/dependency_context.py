@@ -0,0 +1,141 @@
+import ast
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage
+
+from core.src.logger import logging
+from core.tokenizer import count_tokens
+
+# Token budget for the imported-module summaries attached to one analysis
+DEPENDENCY_CONTEXT_TOKENS = int(os.getenv("DEPENDENCY_CONTEXT_TOKENS", "800"))
+DEPENDENCY_SUMMARY_CACHE_SIZE = int(os.getenv("DEPENDENCY_SUMMARY_CACHE_SIZE", "2048"))
+
+# Summaries keyed by module content hash, shared by every project (least recently used evicted first)
+_summary_cache: "OrderedDict[str, str]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """Prompt tokens of a context section (cached tokenizer count)"""
+    return count_tokens(text)
+
+
+def _first_line(docstring: Optional[str]) -> str:
+    return docstring.strip().splitlines()[0] if docstring and docstring.strip() else ""
+
+
+def _signature(node) -> str:
+    args = [arg.arg for arg in node.args.posonlyargs + node.args.args]
+    if node.args.vararg:
+        args.append(f"*{node.args.vararg.arg}")
+    args.extend(arg.arg for arg in node.args.kwonlyargs)
+    if node.args.kwarg:
+        args.append(f"**{node.args.kwarg.arg}")
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns is not None else ""
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    return f"{prefix} {node.name}({', '.join(args)}){returns}"
+
+
+def summarize_module(code: str) -> str:
+    """Short structural summary of a module: public classes, functions and constants"""
+    content_hash = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    with _lock:
+        if content_hash in _summary_cache:
+            _summary_cache.move_to_end(content_hash)
+            return _summary_cache[content_hash]
+
+    summary = _summarize(code)
+    with _lock:
+        _summary_cache[content_hash] = summary
+        while len(_summary_cache) > DEPENDENCY_SUMMARY_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+    return summary
+
+
+def _summarize(code: str) -> str:
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return "(module could not be parsed)"
+
+    lines = []
+    module_doc = _first_line(ast.get_docstring(tree))
+    if module_doc:
+        lines.append(f'"""{module_doc}"""')
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and not node.name.startswith("_"):
+            doc = _first_line(ast.get_docstring(node))
+            lines.append(_signature(node) + (f"  # {doc}" if doc else ""))
+        elif isinstance(node, ast.ClassDef) and not node.name.startswith("_"):
+            bases = ", ".join(ast.unparse(base) for base in node.bases)
+            doc = _first_line(ast.get_docstring(node))
+            header = f"class {node.name}({bases}):" if bases else f"class {node.name}:"
+            lines.append(header + (f"  # {doc}" if doc else ""))
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and (
+                        not item.name.startswith("_") or item.name == "__init__"):
+                    method_doc = _first_line(ast.get_docstring(item))
+                    lines.append("    " + _signature(item) + (f"  # {method_doc}" if method_doc else ""))
+        elif isinstance(node, ast.Assign):
+            names = [target.id for target in node.targets if isinstance(target, ast.Name) and target.id.isupper() and not target.id.startswith("_")]
+            if names:
+                lines.append(f"{', '.join(names)} = ...")
+
+    return "\n".join(lines) if lines else "(no public definitions)"
+
+
+def build_dependency_context(project: Dict[str, Any], file_index: int,
+                             token_budget: int = DEPENDENCY_CONTEXT_TOKENS) -> str:
+    """Summaries of the project modules a file imports directly, within a token budget
+
+    Args:
+        project: Stored project record (needs ``symbol_index`` and ``python_files``)
+        file_index: File being analyzed
+        token_budget: Maximum estimated tokens for the whole context block
+
+    Returns:
+        One section per module, or an empty string when there is nothing to add
+    """
+    symbol_index = project.get("symbol_index")
+    if symbol_index is None:
+        return ""
+
+    sections: List[str] = []
+    used_tokens = 0
+    for target in symbol_index.local_imports(file_index):
+        file_info = project["python_files"][target]
+        try:
+            with open(file_info["full_path"], "r", encoding="utf-8", errors="ignore") as f:
+                summary = summarize_module(f.read())
+        except OSError:
+            continue
+
+        section = f"--- {file_info['path']} ---\n{summary}"
+        section_tokens = estimate_tokens(section)
+        if used_tokens + section_tokens > token_budget:
+            logging.info(f"Dependency context budget reached after {len(sections)} modules")
+            break
+        sections.append(section)
+        used_tokens += section_tokens
+
+    return "\n\n".join(sections)
+
+
+def dependency_messages(context: str) -> List[HumanMessage]:
+    """The ``dependencies`` input of an analysis prompt (see ``core.prompt_layout``)
+
+    The summaries go in their own message after the code, fenced off, so
+    they are never read as lines of the analyzed file.
+    """
+    if not context:
+        return []
+    return [HumanMessage(content=(
+        "Summaries of the project modules the code above imports. They are context only: "
+        "report nothing about them, and do not count their lines.\n"
+        f"<imported_modules>\n{context}\n</imported_modules>"
+    ))]
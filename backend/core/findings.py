@@ -0,0 +1,148 @@
+import json
+import re
+from typing import Any, Callable, Iterable, List, Optional
+
+# Wire format: one row per finding, fields in this order (field names are sent once, not per finding)
+FINDING_FIELDS = ["severity", "start_line", "end_line", "category", "message", "fix"]
+SEVERITIES = ("critical", "high", "medium", "low")
+MERGE_SIMILARITY = 0.5  # word overlap above which two findings on overlapping lines are the same
+
+_SEVERITY_RANK = {severity: rank for rank, severity in enumerate(SEVERITIES)}
+_SEVERITY_ALIASES = {"error": "high", "major": "high", "warning": "medium", "moderate": "medium",
+                     "minor": "low", "info": "low", "note": "low"}
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+_WORD = re.compile(r"[a-z0-9_]+")
+
+
+class Finding:
+    """One issue reported by a bug or edge-case analysis"""
+
+    __slots__ = ("severity", "start_line", "end_line", "category", "message", "fix")
+
+    def __init__(self, severity: str, start_line: int, end_line: int, category: str, message: str, fix: str = ""):
+        self.severity = severity
+        self.start_line = start_line
+        self.end_line = end_line
+        self.category = category
+        self.message = message
+        self.fix = fix
+
+    @classmethod
+    def from_raw(cls, raw: Any) -> Optional["Finding"]:
+        """Finding from a wire row or an object with the field names; None when unusable"""
+        if isinstance(raw, (list, tuple)):
+            raw = dict(zip(FINDING_FIELDS, raw))
+        if not isinstance(raw, dict):
+            return None
+        message = str(raw.get("message") or raw.get("description") or "").strip()
+        if not message:
+            return None
+        severity = str(raw.get("severity") or "medium").strip().lower()
+        severity = severity if severity in _SEVERITY_RANK else _SEVERITY_ALIASES.get(severity, "medium")
+        try:
+            start = int(raw.get("start_line") or raw.get("line") or 0)
+            end = int(raw.get("end_line") or start)
+        except (TypeError, ValueError):
+            start = end = 0
+        start, end = max(0, min(start, end)), max(0, start, end)
+        category = str(raw.get("category") or "general").strip().lower().replace(" ", "_")
+        return cls(severity, start, end, category, message, str(raw.get("fix") or "").strip())
+
+    def as_row(self) -> List[Any]:
+        return [getattr(self, field) for field in FINDING_FIELDS]
+
+    def sort_key(self):
+        return (self.start_line, self.end_line, _SEVERITY_RANK[self.severity], self.category, self.message)
+
+    def remap_lines(self, original_line: Callable[[int], int]) -> "Finding":
+        """Same finding with line numbers translated (e.g. from compacted or sliced code)"""
+        if not self.start_line:
+            return self
+        return Finding(self.severity, original_line(self.start_line), original_line(self.end_line),
+                       self.category, self.message, self.fix)
+
+
+def parse_findings(text: str) -> Optional[List[Finding]]:
+    """Findings of a structured answer ({"findings": [...]}, rows or objects); None when it is not JSON"""
+    match = _JSON_OBJECT.search(text or "")
+    try:
+        data = json.loads(match.group(0)) if match else None
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("findings"), list):
+        return None
+    findings = (Finding.from_raw(raw) for raw in data["findings"])
+    return [finding for finding in findings if finding is not None]
+
+
+def _words(text: str) -> set:
+    return set(_WORD.findall(text.lower()))
+
+
+def _same_issue(a: Finding, b: Finding) -> bool:
+    if a.category != b.category:
+        return False
+    if a.start_line and b.start_line and (a.start_line > b.end_line or b.start_line > a.end_line):
+        return False
+    words_a, words_b = _words(a.message), _words(b.message)
+    return len(words_a & words_b) / max(1, len(words_a | words_b)) >= MERGE_SIMILARITY
+
+
+def merge_findings(groups: Iterable[Iterable[Finding]]) -> List[Finding]:
+    """One sorted, de-duplicated list from several analyses (chunks, packed files, reruns)
+
+    Findings of the same category on overlapping lines with similar messages
+    are one issue: the merged entry spans both ranges and keeps the more
+    severe wording. The result depends only on the findings, not on the
+    order the groups arrive in.
+    """
+    candidates = sorted((finding for group in groups for finding in group), key=Finding.sort_key)
+    merged: List[Finding] = []
+    for finding in candidates:
+        same = next((kept for kept in merged if _same_issue(kept, finding)), None)
+        if same is None:
+            merged.append(Finding(*finding.as_row()))
+            continue
+        if _SEVERITY_RANK[finding.severity] < _SEVERITY_RANK[same.severity]:
+            same.severity, same.message, same.fix = finding.severity, finding.message, finding.fix or same.fix
+        same.fix = same.fix or finding.fix
+        if finding.start_line:
+            same.start_line = min(same.start_line or finding.start_line, finding.start_line)
+            same.end_line = max(same.end_line, finding.end_line)
+    return sorted(merged, key=Finding.sort_key)
+
+
+def findings_to_wire(findings: List[Finding]) -> List[List[Any]]:
+    return [finding.as_row() for finding in findings]
+
+
+def findings_from_wire(rows: List[List[Any]]) -> List[Finding]:
+    return [finding for finding in (Finding.from_raw(row) for row in rows) if finding is not None]
+
+
+def read_findings(text: str, original_line: Optional[Callable[[int], int]] = None) -> Optional[List[Finding]]:
+    """Findings of a structured answer, translated to original line numbers and de-duplicated;
+    None when the answer is not in the structured format"""
+    findings = parse_findings(text)
+    if findings is None:
+        return None
+    if original_line is not None:
+        findings = [finding.remap_lines(original_line) for finding in findings]
+    return merge_findings([findings])
+
+
+def render_findings(findings: List[Finding], empty: str = "No issues found.") -> str:
+    """Markdown list for clients that show the text result"""
+    if not findings:
+        return empty
+    lines = []
+    for finding in sorted(findings, key=lambda f: (_SEVERITY_RANK[f.severity], f.start_line)):
+        where = ""
+        if finding.start_line:
+            where = f" (line {finding.start_line})" if finding.start_line == finding.end_line else \
+                f" (lines {finding.start_line}-{finding.end_line})"
+        lines.append(f"- **{finding.severity.upper()}** [{finding.category}]{where}: {finding.message}")
+        if finding.fix:
+            lines.append(f"  - Fix: {finding.fix}")
+    return "\n".join(lines)
+
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from core.src.logger import logging
+
+# Resilience configuration (overridable through environment)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "20"))
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "120"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_PRIORITIES = {int(p) for p in os.getenv("LLM_HEDGE_PRIORITIES", "0").split(",") if p.strip()}
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "15"))
+
+_TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_TRANSIENT_TYPES = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+                    "ServiceUnavailableError", "TimeoutError", "ConnectError", "ReadTimeout"}
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Errors worth retrying: rate limits, timeouts, connection failures and 5xx"""
+    return (getattr(error, "status_code", None) in _TRANSIENT_STATUS
+            or type(error).__name__ in _TRANSIENT_TYPES
+            or isinstance(error, (TimeoutError, ConnectionError)))
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, error: Optional[BaseException] = None) -> float:
+    """Exponential backoff with full jitter, never shorter than the server's retry-after"""
+    delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+    hinted = retry_after(error) if error is not None else None
+    return max(delay, hinted or 0.0)
+
+
+class LatencyTracker:
+    """Recent successful call latencies per model, used to time hedged requests"""
+
+    def __init__(self, size: int = 200):
+        self._samples: Dict[str, deque] = defaultdict(lambda: deque(maxlen=size))
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    def record(self, model: str, latency: float) -> None:
+        with self._lock:
+            self._samples[model].append(latency)
+
+    def hedge_delay(self, model: str) -> float:
+        with self._lock:
+            samples = sorted(self._samples[model])
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return samples[min(len(samples) - 1, int(len(samples) * LLM_HEDGE_QUANTILE))]
+
+    def median(self, model: str) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples[model])
+        return samples[len(samples) // 2] if samples else None
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"counters": dict(self.counters),
+                    "p95": {model: self._quantile(model) for model in self._samples}}
+
+    def _quantile(self, model: str) -> Optional[float]:
+        samples = sorted(self._samples[model])
+        return round(samples[min(len(samples) - 1, int(len(samples) * LLM_HEDGE_QUANTILE))], 3) if samples else None
+
+
+latency_tracker = LatencyTracker()
+
+
+class _Admission:
+    """Passed to each call; the call invokes it once the request holds its scheduler slot, so queue
+    time counts neither toward the hedge delay nor toward the recorded latency"""
+
+    def __init__(self, event: Optional[asyncio.Event] = None):
+        self.start = time.monotonic()
+        self.event = event
+
+    def __call__(self) -> None:
+        self.start = time.monotonic()
+        if self.event is not None:
+            self.event.set()
+
+    def latency(self) -> float:
+        return time.monotonic() - self.start
+
+
+def call_with_retries(call: Callable[[Callable[[], None]], Any], model: str) -> Any:
+    """Run a blocking call, retrying transient errors with jittered backoff
+
+    ``call`` receives a callback to invoke when the request is admitted
+    (holds its scheduler slot); latency is recorded from there.
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        admission = _Admission()
+        try:
+            result = call(admission)
+            latency_tracker.record(model, admission.latency())
+            return result
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not is_transient_error(e):
+                raise
+            delay = backoff_delay(attempt, e)
+            latency_tracker.count("retries")
+            logging.info(f"{model} call failed ({type(e).__name__}); retry {attempt + 1} in {delay:.2f}s")
+            time.sleep(delay)
+
+
+async def _hedged(call: Callable[[Callable[[], None]], Awaitable[Any]], model: str) -> Tuple[Any, _Admission]:
+    """Send a duplicate request if the first one, once admitted, is slower than the model's p95;
+    first success wins. Returns the result and the admission of the call that produced it."""
+    admissions: Dict[asyncio.Future, _Admission] = {}
+
+    def _send() -> asyncio.Future:
+        admission = _Admission(asyncio.Event())
+        task = asyncio.ensure_future(call(admission))
+        admissions[task] = admission
+        return task
+
+    primary = _send()
+    pending = {primary}
+    hedge = None
+    error: Optional[BaseException] = None
+    try:
+        # The hedge timer starts when the primary gets its slot, not while it is queued
+        admitted = asyncio.ensure_future(admissions[primary].event.wait())
+        try:
+            await asyncio.wait({primary, admitted}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            admitted.cancel()
+        if not primary.done():
+            await asyncio.wait({primary}, timeout=latency_tracker.hedge_delay(model))
+        if primary.done():
+            return primary.result(), admissions[primary]
+
+        latency_tracker.count("hedges_sent")
+        hedge = _send()
+        pending.add(hedge)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        latency_tracker.count("hedges_won")
+                    return task.result(), admissions[task]
+                error = task.exception()
+        raise error
+    finally:
+        # Also reached when the caller is cancelled while waiting
+        for task in pending:
+            task.cancel()
+
+
+async def acall_with_retries(call: Callable[[Callable[[], None]], Awaitable[Any]], model: str,
+                             hedge: bool = False) -> Any:
+    """Async ``call_with_retries``; optionally hedges each attempt (only for idempotent calls)"""
+    hedge = hedge and LLM_HEDGE_ENABLED
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            if hedge:
+                result, admission = await _hedged(call, model)
+            else:
+                admission = _Admission()
+                result = await call(admission)
+            latency_tracker.record(model, admission.latency())
+            return result
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not is_transient_error(e):
+                raise
+            delay = backoff_delay(attempt, e)
+            latency_tracker.count("retries")
+            logging.info(f"{model} call failed ({type(e).__name__}); retry {attempt + 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,492 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from langchain_openai import ChatOpenAI
+from core.llm_resilience import (
+    LLM_HEDGE_PRIORITIES,
+    LLM_MAX_RETRIES,
+    LLM_REQUEST_TIMEOUT_SECONDS,
+    acall_with_retries,
+    backoff_delay,
+    call_with_retries,
+    is_rate_limit_error,
+    is_transient_error,
+    retry_after,
+)
+from core.src.logger import logging
+from core.tokenizer import count_tokens
+
+# Priority classes (lower is served first)
+PRIORITY_INTERACTIVE = 0   # chat turns
+PRIORITY_ANALYSIS = 1      # single-file analysis requests
+PRIORITY_BULK = 2          # project jobs (multi-file analysis, project explanation)
+
+# Scheduler configuration (overridable through environment)
+LLM_DEFAULT_RPM = int(os.getenv("LLM_DEFAULT_RPM", "500"))
+LLM_DEFAULT_TPM = int(os.getenv("LLM_DEFAULT_TPM", "30000"))
+LLM_RPM_LIMITS = os.getenv("LLM_RPM_LIMITS", "gpt-4o=500,gpt-3.5-turbo=3500,o3-mini=500")
+LLM_TPM_LIMITS = os.getenv("LLM_TPM_LIMITS", "gpt-4o=30000,gpt-3.5-turbo=200000,o3-mini=200000")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_LATENCY_TARGET_SECONDS = float(os.getenv("LLM_LATENCY_TARGET_SECONDS", "20"))
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "500"))
+LLM_RATE_LIMIT_COOLDOWN_SECONDS = float(os.getenv("LLM_RATE_LIMIT_COOLDOWN_SECONDS", "5"))
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    limits = {}
+    for item in spec.split(","):
+        if "=" in item:
+            model, value = item.split("=", 1)
+            limits[model.strip()] = int(value)
+    return limits
+
+
+def estimate_prompt_tokens(messages: List[BaseMessage], model: Optional[str] = None) -> int:
+    """Prompt size from the cached tokenizer (plus a few tokens of per-message framing)"""
+    return sum(count_tokens(str(message.content), model) + 4 for message in messages)
+
+
+class _Waiter:
+    """A queued call; granted by setting an event (threads) or resolving a future (asyncio)"""
+
+    def __init__(self, tokens: int, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.tokens = tokens
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+        self.cancelled = False
+
+    def grant(self) -> None:
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(True))
+
+
+class _ModelLimiter:
+    """Token buckets for requests and tokens per minute plus an AIMD concurrency window"""
+
+    def __init__(self, model: str, rpm: int, tpm: int, max_concurrency: int):
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.request_bucket = float(rpm)
+        self.token_bucket = float(tpm)
+        self.window = float(max_concurrency)
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.updated = time.monotonic()
+        self.waiters: list = []
+        self.rate_limited = 0
+        self.completed = 0
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        self.updated = now
+        self.request_bucket = min(self.rpm, self.request_bucket + elapsed * self.rpm / 60.0)
+        self.token_bucket = min(self.tpm, self.token_bucket + elapsed * self.tpm / 60.0)
+
+    def on_success(self, latency: float) -> None:
+        self.completed += 1
+        if latency > LLM_LATENCY_TARGET_SECONDS:
+            self.window = max(1.0, self.window * 0.8)
+        else:
+            self.window = min(self.max_concurrency, self.window + 1.0 / self.window)
+
+    def on_rate_limited(self, retry_after: Optional[float]) -> None:
+        self.rate_limited += 1
+        self.window = max(1.0, self.window / 2)
+        self.request_bucket = 0.0
+        self.cooldown_until = max(self.cooldown_until,
+                                  time.monotonic() + (retry_after or LLM_RATE_LIMIT_COOLDOWN_SECONDS))
+
+
+class LLMScheduler:
+    """Central admission control for outbound LLM calls.
+
+    Each model has request and token buckets (RPM/TPM, charged with the
+    estimated prompt plus completion tokens) and a concurrency window that
+    grows additively on fast successes and halves on 429s or slow responses.
+    Waiting calls are granted strictly by priority class, FIFO within a class,
+    so interactive chat is never queued behind bulk project jobs.
+    """
+
+    def __init__(self):
+        self._rpm_limits = _parse_limits(LLM_RPM_LIMITS)
+        self._tpm_limits = _parse_limits(LLM_TPM_LIMITS)
+        self._limiters: Dict[str, _ModelLimiter] = {}
+        self._lock = threading.Condition()
+        self._sequence = itertools.count()
+        self._next_wakeup: Optional[float] = None
+        self._timer = None
+
+    def _limiter(self, model: str) -> _ModelLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limiter = self._limiters[model] = _ModelLimiter(
+                model,
+                self._rpm_limits.get(model, LLM_DEFAULT_RPM),
+                self._tpm_limits.get(model, LLM_DEFAULT_TPM),
+                LLM_MAX_CONCURRENCY,
+            )
+        return limiter
+
+    def _dispatch(self, limiter: _ModelLimiter) -> None:
+        """Grant queued calls that fit; schedule a wakeup when waiting on a refill (lock held)"""
+        now = time.monotonic()
+        limiter.refill(now)
+        while limiter.waiters:
+            _, _, waiter = limiter.waiters[0]
+            if waiter.cancelled:
+                heapq.heappop(limiter.waiters)
+                continue
+            if now < limiter.cooldown_until:
+                self._wake_at(limiter.cooldown_until)
+                return
+            if limiter.in_flight >= int(limiter.window):
+                return  # a release will dispatch again
+            tokens = min(waiter.tokens, limiter.tpm)
+            if limiter.request_bucket < 1 or limiter.token_bucket < tokens:
+                wait = max((1 - limiter.request_bucket) * 60.0 / limiter.rpm,
+                           (tokens - limiter.token_bucket) * 60.0 / limiter.tpm)
+                self._wake_at(now + max(wait, 0.01))
+                return
+            limiter.request_bucket -= 1
+            limiter.token_bucket -= tokens
+            limiter.in_flight += 1
+            heapq.heappop(limiter.waiters)
+            waiter.grant()
+
+    def _wake_at(self, when: float) -> None:
+        if self._next_wakeup is None or when < self._next_wakeup:
+            self._next_wakeup = when
+            if self._timer is None:
+                self._timer = threading.Thread(target=self._run_timer, name="llm-scheduler", daemon=True)
+                self._timer.start()
+            self._lock.notify_all()
+
+    def _run_timer(self) -> None:
+        with self._lock:
+            while True:
+                if self._next_wakeup is None:
+                    self._lock.wait()
+                    continue
+                delay = self._next_wakeup - time.monotonic()
+                if delay > 0:
+                    self._lock.wait(delay)
+                    continue
+                self._next_wakeup = None
+                for limiter in self._limiters.values():
+                    self._dispatch(limiter)
+
+    def _enqueue(self, model: str, tokens: int, priority: int, waiter: _Waiter) -> _ModelLimiter:
+        with self._lock:
+            limiter = self._limiter(model)
+            heapq.heappush(limiter.waiters, (priority, next(self._sequence), waiter))
+            self._dispatch(limiter)
+            return limiter
+
+    def _release(self, limiter: _ModelLimiter, latency: float, error: Optional[BaseException]) -> None:
+        with self._lock:
+            limiter.in_flight -= 1
+            if error is not None and is_rate_limit_error(error):
+                limiter.on_rate_limited(retry_after(error))
+                logging.info(f"{limiter.model} rate limited; concurrency window {limiter.window:.1f}")
+            elif error is None:
+                limiter.on_success(latency)
+            self._dispatch(limiter)
+
+    def _abandon(self, limiter: _ModelLimiter, waiter: _Waiter) -> None:
+        """Waiting call gave up (cancelled); hand back its slot if it was already granted"""
+        with self._lock:
+            waiter.cancelled = True
+            if waiter.granted:
+                limiter.in_flight -= 1
+                self._dispatch(limiter)
+
+    @contextmanager
+    def slot(self, model: str, tokens: int, priority: int = PRIORITY_ANALYSIS):
+        """Block until the call may be sent; records its outcome for AIMD"""
+        waiter = _Waiter(tokens)
+        limiter = self._enqueue(model, tokens, priority, waiter)
+        waiter.event.wait()
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            self._release(limiter, time.monotonic() - start, e)
+            raise
+        self._release(limiter, time.monotonic() - start, None)
+
+    @asynccontextmanager
+    async def aslot(self, model: str, tokens: int, priority: int = PRIORITY_ANALYSIS):
+        """Async variant of ``slot``; waiting does not block the event loop"""
+        waiter = _Waiter(tokens, asyncio.get_running_loop())
+        limiter = self._enqueue(model, tokens, priority, waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            self._abandon(limiter, waiter)
+            raise
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            self._release(limiter, time.monotonic() - start, e)
+            raise
+        self._release(limiter, time.monotonic() - start, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                model: {
+                    "in_flight": limiter.in_flight,
+                    "queued": sum(1 for _, _, waiter in limiter.waiters if not waiter.cancelled),
+                    "concurrency_window": round(limiter.window, 2),
+                    "completed": limiter.completed,
+                    "rate_limited": limiter.rate_limited,
+                }
+                for model, limiter in self._limiters.items()
+            }
+
+
+llm_scheduler = LLMScheduler()
+
+# Set while the provider code of an admitted call runs, so ChatOpenAI's internal _generate -> _stream
+# is admitted once. Never set while a stream hands chunks to its consumer: calls the consumer makes
+# mid-stream are scheduled like any other.
+_holding_slot = contextvars.ContextVar("holding_llm_slot", default=False)
+
+
+def _admitted(call):
+    """``call()`` with the slot flag set, restored afterwards even when it raises"""
+    token = _holding_slot.set(True)
+    try:
+        return call()
+    finally:
+        _holding_slot.reset(token)
+
+
+async def _aadmitted(call):
+    """Async variant of ``_admitted``: awaits ``call()``"""
+    token = _holding_slot.set(True)
+    try:
+        return await call()
+    finally:
+        _holding_slot.reset(token)
+
+
+class UsageMeter:
+    """Prompt/completion tokens of the LLM calls made while it is active (see ``track_usage``)
+
+    Meters nest: a call is counted by the innermost meter and every enclosing one.
+    """
+
+    def __init__(self, parent: Optional["UsageMeter"] = None):
+        self.parent = parent
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0  # prompt tokens the provider served from its prefix cache
+        self._lock = threading.Lock()
+
+    def record(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> None:
+        meter = self
+        while meter is not None:
+            with meter._lock:
+                meter.calls += 1
+                meter.prompt_tokens += prompt_tokens
+                meter.completion_tokens += completion_tokens
+                meter.cached_tokens += cached_tokens
+            meter = meter.parent
+
+    @property
+    def cache_ratio(self) -> Optional[float]:
+        """Share of prompt tokens read from the provider's prefix cache"""
+        return round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens,
+                "cached_tokens": self.cached_tokens, "cache_ratio": self.cache_ratio}
+
+
+_usage_meter = contextvars.ContextVar("llm_usage_meter", default=None)
+
+# Process-wide usage per model, whether or not a request meter is active
+_model_usage: Dict[str, UsageMeter] = {}
+_model_usage_lock = threading.Lock()
+
+
+def usage_stats() -> Dict[str, Dict[str, Any]]:
+    """Token usage and prefix-cache hit ratio per model since startup"""
+    with _model_usage_lock:
+        return {model: meter.as_dict() for model, meter in _model_usage.items()}
+
+
+def _cached_tokens(usage: Dict[str, Any]) -> int:
+    """Cached prompt tokens from LangChain usage metadata or the raw OpenAI usage block"""
+    details = usage.get("input_token_details") or usage.get("prompt_tokens_details") or {}
+    return details.get("cache_read", details.get("cached_tokens")) or 0
+
+
+@contextmanager
+def track_usage():
+    """Meter the token usage of the LLM calls made in this block (including tasks it starts)"""
+    meter = UsageMeter(_usage_meter.get())
+    token = _usage_meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _usage_meter.reset(token)
+
+
+class ScheduledChatOpenAI(ChatOpenAI):
+    """ChatOpenAI whose calls are admitted by the central scheduler.
+
+    Every attempt takes its own scheduler slot, so 429s feed the AIMD window.
+    Transient failures are retried with jittered backoff; non-streaming calls
+    in a hedged priority class also get a duplicate request after the model's
+    p95 latency. Model calls have no side effects (history is written by the
+    caller after the chain returns), so retries and hedges are safe.
+    """
+
+    priority: int = PRIORITY_ANALYSIS
+
+    def _tokens(self, messages: List[BaseMessage]) -> int:
+        return estimate_prompt_tokens(messages, self.model_name) + (self.max_tokens or LLM_COMPLETION_TOKEN_ESTIMATE)
+
+    def _record_usage(self, messages: List[BaseMessage], text: str, usage: Optional[Dict[str, Any]]) -> None:
+        """Provider-reported usage for the active meter and the model totals, or tokenizer counts
+        when the provider sent none"""
+        usage = usage or {}
+        prompt_tokens = usage.get("prompt_tokens", usage.get("input_tokens"))
+        completion_tokens = usage.get("completion_tokens", usage.get("output_tokens"))
+        if prompt_tokens is None:
+            prompt_tokens = estimate_prompt_tokens(messages, self.model_name)
+        if completion_tokens is None:
+            completion_tokens = count_tokens(text, self.model_name)
+        cached_tokens = _cached_tokens(usage)
+
+        with _model_usage_lock:
+            model_meter = _model_usage.setdefault(self.model_name, UsageMeter())
+        model_meter.record(prompt_tokens, completion_tokens, cached_tokens)
+        meter = _usage_meter.get()
+        if meter is not None:
+            meter.record(prompt_tokens, completion_tokens, cached_tokens)
+
+    def _record_result(self, messages: List[BaseMessage], result: ChatResult) -> ChatResult:
+        self._record_usage(messages, "".join(generation.text for generation in result.generations),
+                           (result.llm_output or {}).get("token_usage"))
+        return result
+
+    def _scheduled_generate(self, admitted, messages, stop, run_manager, **kwargs):
+        with llm_scheduler.slot(self.model_name, self._tokens(messages), self.priority):
+            admitted()
+            generate = super()._generate
+            return _admitted(lambda: generate(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    async def _scheduled_agenerate(self, admitted, messages, stop, run_manager, **kwargs):
+        async with llm_scheduler.aslot(self.model_name, self._tokens(messages), self.priority):
+            admitted()
+            agenerate = super()._agenerate
+            return await _aadmitted(lambda: agenerate(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if _holding_slot.get():
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        return self._record_result(messages, call_with_retries(
+            lambda admitted: self._scheduled_generate(admitted, messages, stop, run_manager, **kwargs), self.model_name
+        ))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if _holding_slot.get():
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        return self._record_result(messages, await acall_with_retries(
+            lambda admitted: self._scheduled_agenerate(admitted, messages, stop, run_manager, **kwargs),
+            self.model_name,
+            hedge=self.priority in LLM_HEDGE_PRIORITIES and not self.streaming,
+        ))
+
+    def _stream(self, messages, *args, **kwargs):
+        if _holding_slot.get():
+            yield from super()._stream(messages, *args, **kwargs)
+            return
+        # Retried only until the first chunk has been delivered
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            started = False
+            text, usage = [], None
+            try:
+                with llm_scheduler.slot(self.model_name, self._tokens(messages), self.priority):
+                    chunks = super()._stream(messages, *args, **kwargs)
+                    try:
+                        while True:
+                            try:
+                                chunk = _admitted(lambda: next(chunks))
+                            except StopIteration:
+                                break
+                            started = True
+                            text.append(chunk.text)
+                            usage = getattr(chunk.message, "usage_metadata", None) or usage
+                            yield chunk
+                    finally:
+                        chunks.close()
+                self._record_usage(messages, "".join(text), usage)
+                return
+            except Exception as e:
+                if started or attempt >= LLM_MAX_RETRIES or not is_transient_error(e):
+                    raise
+                time.sleep(backoff_delay(attempt, e))
+
+    async def _astream(self, messages, *args, **kwargs):
+        if _holding_slot.get():
+            async for chunk in super()._astream(messages, *args, **kwargs):
+                yield chunk
+            return
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            started = False
+            text, usage = [], None
+            try:
+                async with llm_scheduler.aslot(self.model_name, self._tokens(messages), self.priority):
+                    chunks = super()._astream(messages, *args, **kwargs)
+                    try:
+                        while True:
+                            try:
+                                chunk = await _aadmitted(chunks.__anext__)
+                            except StopAsyncIteration:
+                                break
+                            started = True
+                            text.append(chunk.text)
+                            usage = getattr(chunk.message, "usage_metadata", None) or usage
+                            yield chunk
+                    finally:
+                        await chunks.aclose()
+                self._record_usage(messages, "".join(text), usage)
+                return
+            except Exception as e:
+                if started or attempt >= LLM_MAX_RETRIES or not is_transient_error(e):
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, e))
+
+
+def create_llm(model: Optional[str] = None, priority: int = PRIORITY_ANALYSIS, **kwargs) -> ScheduledChatOpenAI:
+    """ChatOpenAI instance routed through the scheduler (temperature 0, API key from the environment)"""
+    kwargs.setdefault("temperature", 0)
+    kwargs.setdefault("openai_api_key", os.getenv("OPENAI_API_KEY"))
+    kwargs.setdefault("timeout", LLM_REQUEST_TIMEOUT_SECONDS)
+    kwargs.setdefault("max_retries", 0)  # retries are handled here, one scheduler slot per attempt
+    kwargs.setdefault("stream_usage", True)  # usage for streamed answers too (see track_usage)
+    if model:
+        kwargs["model"] = model
+    return ScheduledChatOpenAI(priority=priority, **kwargs)
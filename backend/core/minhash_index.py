@@ -0,0 +1,181 @@
+import hashlib
+import io
+import os
+import threading
+import tokenize
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.code_store import code_hash
+from core.src.logger import logging
+
+# Index configuration (overridable through environment)
+NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))
+NUM_BANDS = int(os.getenv("DEDUP_NUM_BANDS", "32"))
+SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))
+SIMILARITY_THRESHOLD = float(os.getenv("DEDUP_SIMILARITY_THRESHOLD", "0.9"))
+MIN_UNIT_TOKENS = int(os.getenv("DEDUP_MIN_UNIT_TOKENS", "20"))
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_SKIPPED_TOKENS = {tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT,
+                   tokenize.DEDENT, tokenize.ENCODING, tokenize.ENDMARKER}
+
+
+def code_tokens(code: str) -> List[str]:
+    """Tokenize code, dropping comments and layout so formatting changes do not matter"""
+    tokens = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type in _SKIPPED_TOKENS:
+                continue
+            tokens.append(tok.string)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        # Fall back to whitespace splitting for code that does not tokenize
+        tokens = code.split()
+    return tokens
+
+
+def shingle_hashes(tokens: List[str], k: int = SHINGLE_SIZE) -> np.ndarray:
+    """Hash every k-token shingle into a 32-bit integer"""
+    if len(tokens) < k:
+        k = max(1, len(tokens))
+    shingles = {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+    values = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+              for s in shingles]
+    return np.array(values, dtype=np.uint64)
+
+
+class MinHashLSHIndex:
+    """MinHash signatures over token shingles with banded LSH buckets.
+
+    Inserts are incremental; a query hashes the signature into NUM_BANDS
+    bucket keys and only verifies the (usually tiny) candidate set, so lookup
+    cost does not grow with the number of stored shingles.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, num_bands: int = NUM_BANDS, seed: int = 1):
+        if num_perm % num_bands != 0:
+            raise ValueError("num_perm must be divisible by num_bands")
+        self.num_perm = num_perm
+        self.num_bands = num_bands
+        self.rows = num_perm // num_bands
+
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+        self._buckets: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(num_bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._payloads: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        """Compute the MinHash signature of a set of shingle hashes"""
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        # (a * x + b) mod p for every permutation/shingle pair, then column-wise min
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return np.bitwise_and(permuted, _MAX_HASH).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.num_bands)]
+
+    def insert(self, key: str, signature: np.ndarray, payload: Optional[Dict[str, Any]] = None) -> None:
+        """Insert (or update the payload of) a signature"""
+        with self._lock:
+            if key in self._signatures:
+                self._payloads[key].update(payload or {})
+                return
+            self._signatures[key] = signature
+            self._payloads[key] = dict(payload or {})
+            for band, band_key in enumerate(self._band_keys(signature)):
+                self._buckets[band][band_key].append(key)
+
+    def query(self, signature: np.ndarray, threshold: float = SIMILARITY_THRESHOLD) -> List[Tuple[str, float]]:
+        """Return (key, estimated Jaccard similarity) pairs above threshold, best first"""
+        candidates = set()
+        with self._lock:
+            for band, band_key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(band_key, ()))
+            scored = [(key, float(np.mean(self._signatures[key] == signature))) for key in candidates]
+        matches = [(key, score) for key, score in scored if score >= threshold]
+        return sorted(matches, key=lambda item: item[1], reverse=True)
+
+    def payload(self, key: str) -> Dict[str, Any]:
+        return self._payloads.get(key, {})
+
+
+class AnalysisDedupIndex:
+    """Cross-project index of analyzed code units and their stored findings"""
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.index = MinHashLSHIndex()
+
+    def _unit_signature(self, code: str) -> Optional[Tuple[str, np.ndarray]]:
+        """(hash of the exact source, MinHash signature of its tokens); None for tiny snippets
+
+        The key is the raw source, so only byte-identical code shares it: the
+        token stream ignores comments and layout, which move line numbers and
+        can change what a block contains. Tokens only drive the similarity.
+        """
+        tokens = code_tokens(code)
+        if len(tokens) < MIN_UNIT_TOKENS:
+            return None
+        return code_hash(code), self.index.signature(shingle_hashes(tokens))
+
+    def _stored(self, key: str, analysis_type: str, similarity: float, exact: bool) -> Optional[Dict[str, Any]]:
+        results = self.index.payload(key).get("results", {})
+        if analysis_type not in results:
+            return None
+        logging.info(f"Dedup hit for {analysis_type}: similarity={similarity:.2f}")
+        return {"result": results[analysis_type]["result"], "model_used": results[analysis_type]["model_used"],
+                "similarity": similarity, "exact": exact}
+
+    def lookup(self, code: str, analysis_type: str, exact_only: bool = False) -> Optional[Dict[str, Any]]:
+        """Find stored findings for this code or a near-duplicate of it, if any
+
+        Args:
+            code: Code about to be analyzed
+            analysis_type: Analysis whose stored result may be reused
+            exact_only: Only reuse results for byte-identical code (for outputs that embed the code itself
+                or point at its lines; a one-token fix still scores ~0.98 and must not get the stale findings back)
+
+        Returns:
+            ``{"result", "model_used", "similarity", "exact"}``, or None
+        """
+        unit = self._unit_signature(code)
+        if unit is None:
+            return None
+
+        key, signature = unit
+        exact = self._stored(key, analysis_type, 1.0, True)
+        if exact is not None or exact_only:
+            return exact
+        for match_key, similarity in self.index.query(signature, self.threshold):
+            found = self._stored(match_key, analysis_type, similarity, False)
+            if found is not None:
+                return found
+        return None
+
+    def record(self, code: str, analysis_type: str, result: Any, model_used: str, source: str = "") -> None:
+        """Store findings for the code, with the model that produced them"""
+        unit = self._unit_signature(code)
+        if unit is None:
+            return
+        key, signature = unit
+        self.index.insert(key, signature, {"source": source})
+        self.index.payload(key).setdefault("results", {})[analysis_type] = {"result": result,
+                                                                             "model_used": model_used}
+
+
+# Shared index for all modules
+analysis_index = AnalysisDedupIndex()
@@ -0,0 +1,169 @@
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from core.findings import parse_findings
+from core.src.logger import logging
+from core.tokenizer import complexity_level, count_tokens
+
+# Routing policy for model_choice="auto" (overridable through environment)
+ROUTER_FAST_MODEL = os.getenv("ROUTER_FAST_MODEL", "gpt-4o-mini")
+ROUTER_STANDARD_MODEL = os.getenv("ROUTER_STANDARD_MODEL", "gpt-4o")
+ROUTER_STRONG_MODEL = os.getenv("ROUTER_STRONG_MODEL", "gpt-4o")
+ROUTER_FAST_MAX_TOKENS = int(os.getenv("ROUTER_FAST_MAX_TOKENS", "1500"))
+ROUTER_STRONG_MIN_TOKENS = int(os.getenv("ROUTER_STRONG_MIN_TOKENS", "6000"))
+ROUTER_ESCALATE_MIN_CHARS = int(os.getenv("ROUTER_ESCALATE_MIN_CHARS", "200"))
+
+# USD per million (input/output) tokens, "model:input/output,..."; used for cost estimates only
+LLM_PRICES_PER_MTOK = {
+    model.strip(): tuple(float(price) for price in prices.split("/"))
+    for model, prices in (entry.split(":") for entry in os.getenv(
+        "LLM_PRICES_PER_MTOK", "gpt-4o:2.5/10,gpt-4o-mini:0.15/0.6,gpt-3.5-turbo:0.5/1.5,o3-mini:1.1/4.4"
+    ).split(",") if entry.strip())
+}
+
+AUTO_MODEL = "auto"
+
+# Analysis types a fast model handles well when the code is small, and at which complexity
+_FAST_COMPLEXITY = {
+    "explain": {"simple", "medium"},
+    "chat": {"simple", "medium"},
+    "bugs": {"simple"},
+    "edge-cases": {"simple"},
+    "tests": {"simple"},
+    "optimize": set(),  # rewrites need the larger model
+}
+
+# First-pass answers that warrant a second look by a larger model
+_UNCERTAIN = re.compile(r"\b(not sure|unsure|cannot determine|can't determine|unable to|hard to say|"
+                        r"without more context|it depends|unclear)\b", re.IGNORECASE)
+_SEVERE = re.compile(r"\b(critical|severity:\s*high|high severity|security vulnerability|injection|"
+                     r"remote code execution|data loss)\b", re.IGNORECASE)
+_SEVERE_FINDINGS = {"critical", "high"}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of a call (0 for models without a configured price)"""
+    input_price, output_price = LLM_PRICES_PER_MTOK.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class RouteDecision:
+    """Model picked for one request and why"""
+
+    def __init__(self, analysis_type: str, model: str, route: str, reason: str,
+                 complexity: Optional[str] = None, tokens: int = 0, escalate_to: Optional[str] = None):
+        self.analysis_type = analysis_type
+        self.model = model
+        self.route = route
+        self.reason = reason
+        self.complexity = complexity
+        self.tokens = tokens
+        self.escalate_to = escalate_to
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"analysis_type": self.analysis_type, "model": self.model, "route": self.route,
+                "reason": self.reason, "complexity": self.complexity, "tokens": self.tokens}
+
+
+def route_model(code: str, analysis_type: str, model_choice: str) -> RouteDecision:
+    """Model for a request; only ``model_choice="auto"`` is routed, anything else is used as given
+
+    Code is sized with the tokenizer and rated by its AST complexity score.
+    Small, simple code (and small snippets for explanation/chat) goes to the
+    fast model, large or complex code to the strong model, the rest to the
+    standard model. Fast-model analyses that look for problems may be
+    escalated after the first pass (see ``needs_escalation``).
+    """
+    if model_choice != AUTO_MODEL:
+        return RouteDecision(analysis_type, model_choice, "fixed", "requested")
+
+    tokens = count_tokens(code)
+    complexity = complexity_level(code)
+    if tokens >= ROUTER_STRONG_MIN_TOKENS or (complexity == "complex" and analysis_type != "explain"):
+        decision = RouteDecision(analysis_type, ROUTER_STRONG_MODEL, "strong",
+                                 f"{complexity}, ~{tokens} tokens", complexity, tokens)
+    elif tokens <= ROUTER_FAST_MAX_TOKENS and complexity in _FAST_COMPLEXITY.get(analysis_type, set()):
+        escalate_to = ROUTER_STANDARD_MODEL if analysis_type in ("bugs", "edge-cases", "tests") else None
+        decision = RouteDecision(analysis_type, ROUTER_FAST_MODEL, "fast",
+                                 f"{complexity}, ~{tokens} tokens", complexity, tokens, escalate_to)
+    else:
+        decision = RouteDecision(analysis_type, ROUTER_STANDARD_MODEL, "standard",
+                                 f"{complexity}, ~{tokens} tokens", complexity, tokens)
+    logging.info(f"Model route {analysis_type}: {decision.model} ({decision.route}; {decision.reason})")
+    return decision
+
+
+def needs_escalation(result: Any) -> bool:
+    """A fast-model answer that is too short, unsure, or reports something severe enough to confirm
+
+    Structured answers ({"findings": [...]}) are judged on their findings:
+    an empty list is a valid clean result, and only critical or high
+    severity findings are confirmed. A JSON answer that does not parse is
+    escalated.
+    """
+    text = result if isinstance(result, str) else str(result)
+    if text.lstrip().startswith("{"):
+        findings = parse_findings(text)
+        return findings is None or any(finding.severity in _SEVERE_FINDINGS for finding in findings)
+    return len(text.strip()) < ROUTER_ESCALATE_MIN_CHARS or bool(_UNCERTAIN.search(text) or _SEVERE.search(text))
+
+
+class RouteStats:
+    """Calls, escalations and latency per (analysis type, route), for tuning the thresholds"""
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(
+            lambda: {"calls": 0, "escalations": 0, "total_latency": 0.0, "max_latency": 0.0})
+        self._lock = threading.Lock()
+
+    def record(self, decision: RouteDecision, latency: float, escalated: bool = False) -> None:
+        with self._lock:
+            entry = self._stats[(decision.analysis_type, decision.route)]
+            entry["calls"] += 1
+            entry["escalations"] += int(escalated)
+            entry["total_latency"] += latency
+            entry["max_latency"] = max(entry["max_latency"], latency)
+        logging.info(f"Model route {decision.analysis_type}/{decision.route} finished in {latency:.2f}s"
+                     + (f" (escalated to {decision.escalate_to})" if escalated else ""))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                f"{analysis_type}/{route}": {
+                    "calls": int(entry["calls"]),
+                    "escalations": int(entry["escalations"]),
+                    "avg_latency": round(entry["total_latency"] / entry["calls"], 3) if entry["calls"] else None,
+                    "max_latency": round(entry["max_latency"], 3),
+                }
+                for (analysis_type, route), entry in self._stats.items()
+            }
+
+
+route_stats = RouteStats()
+
+
+async def run_routed(analysis_type: str, code: str, model_choice: str, build_chain: Callable[[Any], Any],
+                     inputs: Dict[str, Any], priority: int, **llm_kwargs) -> Tuple[Any, str]:
+    """Route, run the chain, and re-run it on the larger model when the fast first pass needs it
+
+    Returns:
+        (result, model that produced it)
+    """
+    from core.llm_scheduler import create_llm
+
+    decision = route_model(code, analysis_type, model_choice)
+    start = time.monotonic()
+    result = await build_chain(create_llm(decision.model, priority=priority, **llm_kwargs)).ainvoke(inputs)
+    model = decision.model
+
+    escalated = decision.escalate_to is not None and needs_escalation(result)
+    if escalated:
+        model = decision.escalate_to
+        result = await build_chain(create_llm(model, priority=priority, **llm_kwargs)).ainvoke(inputs)
+
+    route_stats.record(decision, time.monotonic() - start, escalated)
+    return result, model
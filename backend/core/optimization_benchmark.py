@@ -0,0 +1,105 @@
+import ast
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from core.code_repair import syntax_error
+from core.sandbox import SandboxUnavailable, sandbox_pool
+from core.src.logger import logging
+
+# Benchmark policy (overridable through environment)
+BENCHMARK_REPEATS = int(os.getenv("BENCHMARK_REPEATS", "7"))  # timed batches per version and input
+BENCHMARK_MIN_BATCH_SECONDS = float(os.getenv("BENCHMARK_MIN_BATCH_SECONDS", "0.02"))  # calls per batch grow to this
+BENCHMARK_MAX_NUMBER = int(os.getenv("BENCHMARK_MAX_NUMBER", "100000"))  # calls per batch at most
+BENCHMARK_SIZES = [int(size) for size in os.getenv("BENCHMARK_SIZES", "10,100,1000").split(",")]  # generated inputs
+BENCHMARK_CALL_TIMEOUT = float(os.getenv("BENCHMARK_CALL_TIMEOUT", "2"))  # seconds a single call may take
+BENCHMARK_MAX_FUNCTIONS = int(os.getenv("BENCHMARK_MAX_FUNCTIONS", "3"))
+BENCHMARK_TIMEOUT = float(os.getenv("BENCHMARK_TIMEOUT", "60"))  # wall-clock seconds per benchmark job
+BENCHMARK_CPU_SECONDS = int(os.getenv("BENCHMARK_CPU_SECONDS", "50"))
+
+_PYTHON_BLOCK = re.compile(r"```(?:python3?|py)[ \t]*\n(.*?)```", re.DOTALL)
+
+
+def extract_optimized_code(answer: str) -> Optional[str]:
+    """The optimized module in an answer: the answer itself when it is code, else its longest compiling block"""
+    if not answer:
+        return None
+    if "```" not in answer and answer.strip() and syntax_error(answer) is None:
+        return answer
+    blocks = [block for block in _PYTHON_BLOCK.findall(answer) if syntax_error(block) is None]
+    return max(blocks, key=len) if blocks else None
+
+
+def _top_level_functions(code: str) -> List[str]:
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    # Coroutine functions are left out: their calls only create the coroutine
+    return [node.name for node in tree.body if isinstance(node, ast.FunctionDef)]
+
+
+def common_functions(original: str, optimized: str) -> List[str]:
+    """Top-level functions defined by both versions, public ones first, at most BENCHMARK_MAX_FUNCTIONS"""
+    optimized_names = set(_top_level_functions(optimized))
+    names = [name for name in _top_level_functions(original) if name in optimized_names]
+    names.sort(key=lambda name: name.startswith("_"))
+    return names[:BENCHMARK_MAX_FUNCTIONS]
+
+
+def _summary(functions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    inputs = [entry for function in functions for entry in function.get("inputs", [])]
+    checked = [entry for entry in inputs if "equivalent" in entry]
+    speedups = [entry["speedup"] for entry in inputs if entry.get("speedup")]
+    deltas = [entry["memory_delta"] for entry in inputs if "memory_delta" in entry]
+    return {
+        "status": "completed",
+        "equivalent": all(entry["equivalent"] for entry in checked) if checked else None,
+        "inputs_measured": len(speedups),
+        # Geometric mean: a 2x speedup and a 2x slowdown cancel out
+        "speedup": math.exp(sum(math.log(s) for s in speedups) / len(speedups)) if speedups else None,
+        "significant": all(entry["significant"] for entry in inputs if entry.get("speedup")) if speedups else None,
+        "max_memory_delta": max(deltas) if deltas else None,
+        "functions": functions,
+    }
+
+
+async def benchmark_optimization(original: str, optimized_answer: str, function: Optional[str] = None,
+                                 inputs: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """Run the original and optimized code side by side in the sandbox and measure the speedup
+
+    Each compared function (``function``, or the top-level functions both
+    versions define) is called on ``inputs`` (lists of positional arguments
+    or ``{"args": [...], "kwargs": {...}}`` objects) or, without them, on
+    inputs generated from its signature at BENCHMARK_SIZES. Returns whether
+    both versions agree on every input and, per input, timing statistics in
+    seconds per call (median, mean, stdev, cv, quartiles), the median
+    speedup and the peak memory of each version in bytes.
+    """
+    optimized = extract_optimized_code(optimized_answer)
+    if optimized is None:
+        return {"status": "no_code", "functions": []}
+    if syntax_error(original) is not None:
+        return {"status": "invalid_original", "functions": []}
+    functions = [function] if function else common_functions(original, optimized)
+    if not functions:
+        return {"status": "no_functions", "functions": []}
+    if not sandbox_pool.available:
+        return {"status": "unavailable", "functions": []}
+
+    options = {"functions": functions, "inputs": inputs, "sizes": BENCHMARK_SIZES, "repeats": BENCHMARK_REPEATS,
+               "min_batch_seconds": BENCHMARK_MIN_BATCH_SECONDS, "max_number": BENCHMARK_MAX_NUMBER,
+               "call_timeout": BENCHMARK_CALL_TIMEOUT, "budget_seconds": BENCHMARK_TIMEOUT * 0.8}
+    try:
+        reply = await sandbox_pool.arun("benchmark", {"original.py": original, "optimized.py": optimized},
+                                        ["original.py", "optimized.py"], timeout=BENCHMARK_TIMEOUT,
+                                        cpu_seconds=BENCHMARK_CPU_SECONDS, options=options)
+    except SandboxUnavailable as e:
+        logging.info(f"Optimization not benchmarked: {e}")
+        return {"status": "unavailable", "functions": []}
+    if reply.get("status") != "completed":
+        return {"status": reply.get("status"), "error": reply.get("error"), "functions": []}
+    result = _summary(reply["result"]["functions"])
+    result["wall_time"] = round(reply.get("wall_time", 0.0), 3)
+    return result
@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Tuple
+
+from core.chains.project_explanation_chains import (
+    get_file_summary_chain,
+    get_package_summary_chain,
+    get_project_overview_chain,
+)
+from core.src.logger import logging
+from core.tokenizer import truncate_to_tokens
+
+# Concurrency of the map step and fan-in of each reduce step
+EXPLAIN_MAX_CONCURRENCY = int(os.getenv("EXPLAIN_MAX_CONCURRENCY", "8"))
+EXPLAIN_REDUCE_FANOUT = int(os.getenv("EXPLAIN_REDUCE_FANOUT", "12"))
+EXPLAIN_MAX_FILE_TOKENS = int(os.getenv("EXPLAIN_MAX_FILE_TOKENS", "3000"))
+EXPLAIN_CACHE_SIZE = int(os.getenv("EXPLAIN_CACHE_SIZE", "4096"))
+
+# Summaries at every level keyed by content hash (+ model), shared across projects
+# (least recently used evicted first)
+_summary_cache: "OrderedDict[str, str]" = OrderedDict()
+
+
+def _hash(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _package_of(path: str) -> str:
+    package = os.path.dirname(path.replace("\\", "/"))
+    return package or "(root)"
+
+
+class ProjectExplainer:
+    """Hierarchical map-reduce explanation of a project.
+
+    Files are summarized concurrently (map), merged per package (reduce,
+    recursively when a package has many files) and finally merged into an
+    overview. Every node is cached by the hash of its inputs, so a repeated
+    call, or one after a few files changed, only recomputes affected branches.
+    """
+
+    def __init__(self, llm, model_name: str):
+        self.model_name = model_name
+        self.file_chain = get_file_summary_chain(llm)
+        self.package_chain = get_package_summary_chain(llm)
+        self.overview_chain = get_project_overview_chain(llm)
+        self.cache_hits = 0
+        self.llm_calls = 0
+        self._semaphore = asyncio.Semaphore(EXPLAIN_MAX_CONCURRENCY)
+
+    async def _cached(self, key: str, chain, inputs: Dict[str, str]) -> str:
+        if key in _summary_cache:
+            _summary_cache.move_to_end(key)
+            self.cache_hits += 1
+            return _summary_cache[key]
+        async with self._semaphore:
+            result = await chain.ainvoke(inputs)
+        self.llm_calls += 1
+        _summary_cache[key] = result
+        while len(_summary_cache) > EXPLAIN_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+        return result
+
+    async def summarize_file(self, path: str, code: str) -> Tuple[str, str]:
+        """Map step; returns (node hash, summary)"""
+        code = truncate_to_tokens(code, EXPLAIN_MAX_FILE_TOKENS, marker="\n# ... (file truncated)")
+        key = _hash("file", self.model_name, path, code)
+        summary = await self._cached(key, self.file_chain, {"path": path, "code": code})
+        return key, summary
+
+    async def reduce(self, label: str, children: List[Tuple[str, str, str]]) -> Tuple[str, str]:
+        """Reduce step over (name, node hash, summary) children; recurses above the fan-out"""
+        if len(children) > EXPLAIN_REDUCE_FANOUT:
+            groups = [children[i:i + EXPLAIN_REDUCE_FANOUT] for i in range(0, len(children), EXPLAIN_REDUCE_FANOUT)]
+            reduced = await asyncio.gather(*[
+                self.reduce(f"{label} (part {n + 1})", group) for n, group in enumerate(groups)
+            ])
+            children = [(f"{label} (part {n + 1})", key, summary) for n, (key, summary) in enumerate(reduced)]
+
+        key = _hash("package", self.model_name, label, *[child_key for _, child_key, _ in children])
+        summaries = "\n\n".join(f"### {name}\n{summary}" for name, _, summary in children)
+        summary = await self._cached(key, self.package_chain, {"package": label, "summaries": summaries})
+        return key, summary
+
+    async def explain(self, project: Dict[str, Any]) -> Dict[str, Any]:
+        files = []
+        for file_info in project["python_files"]:
+            try:
+                with open(file_info["full_path"], "r", encoding="utf-8", errors="ignore") as f:
+                    files.append((file_info["path"], f.read()))
+            except OSError:
+                continue
+
+        # Map: every file concurrently
+        file_nodes = await asyncio.gather(*[self.summarize_file(path, code) for path, code in files])
+
+        # Reduce: group by package directory
+        packages: Dict[str, List[Tuple[str, str, str]]] = defaultdict(list)
+        for (path, _), (key, summary) in zip(files, file_nodes):
+            packages[_package_of(path)].append((os.path.basename(path), key, summary))
+
+        package_names = sorted(packages)
+        package_nodes = await asyncio.gather(*[self.reduce(name, packages[name]) for name in package_names])
+
+        # Final: project overview from package summaries
+        overview_key = _hash("project", self.model_name, project["name"], *[key for key, _ in package_nodes])
+        overview_input = "\n\n".join(f"### {name}\n{summary}" for name, (_, summary) in zip(package_names, package_nodes))
+        overview = await self._cached(overview_key, self.overview_chain,
+                                      {"project": project["name"], "summaries": overview_input})
+
+        logging.info(f"Project explanation: {self.llm_calls} LLM calls, {self.cache_hits} cache hits")
+        return {
+            "overview": overview,
+            "packages": {name: summary for name, (_, summary) in zip(package_names, package_nodes)},
+            "files": {path: summary for (path, _), (_, summary) in zip(files, file_nodes)},
+        }
+
+
+async def explain_project(project: Dict[str, Any], llm, model_name: str) -> Dict[str, Any]:
+    """Explain a stored project; returns overview, package and file summaries plus cache stats"""
+    explainer = ProjectExplainer(llm, model_name)
+    result = await explainer.explain(project)
+    result["cache_hits"] = explainer.cache_hits
+    result["llm_calls"] = explainer.llm_calls
+    return result
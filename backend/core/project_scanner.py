@@ -0,0 +1,392 @@
+import asyncio
+import json
+import os
+import re
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.chains.packed_chains import get_packed_analysis_chain, get_packed_findings_chain, get_packed_triage_chain
+from core.chains.triage_chains import get_triage_chain
+from core.code_compactor import CompactedCode, compact_for_analysis, number_lines
+from core.code_slicer import slice_code_for_lines
+from core.code_store import code_hash
+from core.findings import Finding, findings_from_wire, findings_to_wire, merge_findings, read_findings, render_findings
+from core.llm_resilience import latency_tracker
+from core.llm_scheduler import create_llm, track_usage, LLM_COMPLETION_TOKEN_ESTIMATE, PRIORITY_BULK
+from core.minhash_index import analysis_index
+from core.model_router import ROUTER_FAST_MODEL, estimate_cost
+from core.prompt_layout import prompt_text
+from core.prompt_packing import PACK_MAX_FILE_TOKENS, pack_items, render_files, split_sections
+from core.src.logger import logging
+from core.tokenizer import count_prompt_tokens, count_tokens
+
+# Project scan configuration (overridable through environment)
+SCAN_MAX_CONCURRENCY = int(os.getenv("SCAN_MAX_CONCURRENCY", "8"))
+SCAN_TRIAGE_MODEL = os.getenv("SCAN_TRIAGE_MODEL", ROUTER_FAST_MODEL)
+SCAN_REGION_PADDING = int(os.getenv("SCAN_REGION_PADDING", "2"))
+SCAN_TRIAGE_CACHE_SIZE = int(os.getenv("SCAN_TRIAGE_CACHE_SIZE", "10000"))
+
+SCAN_TYPES = ("bugs", "edge-cases")
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+# (analysis type, triage model, code hash) -> (suspicious, regions), so rescans skip triage
+_triage_cache: "OrderedDict[tuple, Tuple[bool, List[Dict[str, Any]]]]" = OrderedDict()
+
+
+def _analysis_chain(analysis_type: str, llm, code: str, structured: bool = False):
+    if analysis_type == "bugs":
+        from core.chains.bug_chains import get_bugchains
+        return get_bugchains(llm, code, use_dynamic=True, structured=structured)
+    from core.chains.edgecases_chain import get_edge_case_chains
+    return get_edge_case_chains(llm, code, use_dynamic=True, structured=structured)
+
+
+def _prompt_tokens(chain, inputs: Dict[str, str]) -> int:
+    """Prompt size of a ``template | llm | parser`` chain for these inputs (without calling it)"""
+    return count_prompt_tokens(prompt_text(chain.first), inputs)
+
+
+def _load_json(text: str) -> Any:
+    match = _JSON_OBJECT.search(text)
+    try:
+        return json.loads(match.group(0)) if match else None
+    except json.JSONDecodeError:
+        return None
+
+
+def _verdict(data: Any, total_lines: int) -> Tuple[bool, List[Dict[str, Any]]]:
+    if not isinstance(data, dict):
+        return True, [{"start": 1, "end": total_lines, "reason": "triage answer unreadable"}]
+    if str(data.get("verdict", "")).lower() == "clean":
+        return False, []
+
+    regions = []
+    for region in data.get("regions") or []:
+        try:
+            start, end = int(region["start"]), int(region.get("end", region["start"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+        start, end = max(1, min(start, end)), min(total_lines, max(start, end))
+        if start <= total_lines:
+            regions.append({"start": start, "end": end, "reason": str(region.get("reason", ""))[:120]})
+    return True, regions or [{"start": 1, "end": total_lines, "reason": "no regions given"}]
+
+
+def parse_triage(text: str, total_lines: int) -> Tuple[bool, List[Dict[str, Any]]]:
+    """(suspicious, regions) from a triage answer; unreadable answers count as suspicious everywhere"""
+    return _verdict(_load_json(text), total_lines)
+
+
+def parse_packed_triage(text: str, total_lines: Dict[str, int]) -> Dict[str, Tuple[bool, List[Dict[str, Any]]]]:
+    """Verdicts of a packed triage answer by file id; files the answer does not cover are left out"""
+    data = _load_json(text)
+    if not isinstance(data, dict):
+        return {}
+    return {file_id: _verdict(data[file_id], lines) for file_id, lines in total_lines.items()
+            if isinstance(data.get(file_id), dict)}
+
+
+class _ScanFile:
+    """One file of a scan: its code (and the compacted form sent for whole-file passes),
+    single-file chain and result entry"""
+
+    def __init__(self, index: int, path: str, code: str, chain, compacted: CompactedCode, rank: int = 0):
+        self.index = index
+        self.rank = rank  # position in the project's file ranking (most important first)
+        self.file_id = f"f{index}"
+        self.path = path
+        self.code = code
+        self.compacted = compacted
+        self.chain = chain
+        self.tokens = compacted.compact_tokens
+        self.total_lines = code.count("\n") + 1
+        self.entry: Dict[str, Any] = {"file_index": index, "path": path, "status": None, "result": None,
+                                      "regions": [], "units": [], "packed": False, "findings": None}
+
+
+class ProjectScanner:
+    """Bug or edge-case scan of many project files, optionally as a two-model cascade.
+
+    In cascade mode a small model triages every file ("clean" or "suspicious"
+    plus line regions). Clean files stop there; suspicious ones are analyzed
+    by the requested model on just the flagged regions (widened to whole
+    functions, see ``slice_code_for_lines``). With packing, small files share
+    one prompt for the whole-file pass (triage, or the analysis itself when
+    not cascading) and the answer is split back per file; files a packed
+    answer misses are retried alone. Whole-file passes send compacted code
+    (``core.code_compactor``), numbered with or remapped to the original
+    lines. In structured mode every answer is JSON finding rows
+    (``core.findings``) in original line numbers, returned next to the
+    rendered text. Files (and packed groups, by their best file) are sent
+    in the order of the project's file ranking, so the most important files
+    get their results first. Provider-reported token usage is tracked
+    per model and compared with an estimate of the same scan run on the
+    requested model alone, file by file.
+    """
+
+    def __init__(self, analysis_type: str, model: str, triage_model: Optional[str] = None,
+                 cascade: bool = True, pack: bool = True, openai_api_key: Optional[str] = None,
+                 compact: Optional[bool] = None, structured: bool = False):
+        self.analysis_type = analysis_type
+        self.model = model
+        self.triage_model = triage_model or SCAN_TRIAGE_MODEL
+        self.cascade = cascade
+        self.pack = pack
+        self.compact = compact
+        self.structured = structured
+        self.llm = create_llm(model, priority=PRIORITY_BULK, openai_api_key=openai_api_key)
+        self.triage_llm = create_llm(self.triage_model, priority=PRIORITY_BULK, openai_api_key=openai_api_key)
+        self.usage: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "llm_seconds": 0.0})
+        self.baseline = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self.packed_prompts = 0
+        self.triage_cache_hits = 0
+        self._full_latencies: List[float] = []
+        self._full_completions: List[int] = []
+        self._semaphore = asyncio.Semaphore(SCAN_MAX_CONCURRENCY)
+
+    async def _call(self, model: str, chain, inputs: Dict[str, str], single_file: bool = True) -> str:
+        async with self._semaphore:
+            start = time.monotonic()
+            with track_usage() as meter:
+                result = await chain.ainvoke(inputs)
+            latency = time.monotonic() - start
+        usage = self.usage[model]
+        usage["calls"] += 1
+        usage["prompt_tokens"] += meter.prompt_tokens
+        usage["completion_tokens"] += meter.completion_tokens
+        usage["llm_seconds"] += latency
+        if model == self.model and single_file:
+            self._full_latencies.append(latency)
+            self._full_completions.append(meter.completion_tokens)
+        return result
+
+    def _settle(self, f: _ScanFile, text: str, findings: Optional[List[Finding]], record: bool = True, **entry) -> None:
+        """Fill the file's entry (findings rendered as text in structured mode) and store the result for reuse"""
+        if findings is not None:
+            entry.update(result=render_findings(findings), findings=findings_to_wire(findings))
+        else:
+            entry.update(result=text)
+        f.entry.update(entry)
+        if not record:
+            return
+        if findings is not None:
+            analysis_index.record(f.code, f"{self.analysis_type}:findings", entry["findings"], self.model,
+                                  source=f.path)
+        elif not self.structured:
+            analysis_index.record(f.code, self.analysis_type, text, self.model, source=f.path)
+
+    def _groups(self, files: List[_ScanFile]) -> List[List[_ScanFile]]:
+        """Call groups, most important first (a packed group ranks as its best file)"""
+        if not self.pack:
+            groups = [[f] for f in files]
+        else:
+            small = {f.file_id: f for f in files if f.tokens <= PACK_MAX_FILE_TOKENS}
+            groups = [sorted((small[file_id] for file_id in group), key=lambda f: f.rank)
+                      for group in pack_items([(file_id, f.tokens) for file_id, f in small.items()])]
+            groups += [[f] for f in files if f.file_id not in small]
+        return sorted(groups, key=lambda group: min(f.rank for f in group))
+
+    # Cascade: triage (packed where possible), then escalate suspicious regions
+
+    async def _triage_one(self, f: _ScanFile) -> Tuple[bool, List[Dict[str, Any]]]:
+        chain = get_triage_chain(self.triage_llm, self.analysis_type)
+        return parse_triage(await self._call(self.triage_model, chain, {"code": number_lines(f.compacted.text, f.compacted.line_map)}),
+                            f.total_lines)
+
+    async def _triage(self, group: List[_ScanFile]) -> Dict[str, Tuple[bool, List[Dict[str, Any]]]]:
+        verdicts = {}
+        keys = {f.file_id: (self.analysis_type, self.triage_model, code_hash(f.code)) for f in group}
+        for f in group:
+            if keys[f.file_id] in _triage_cache:
+                _triage_cache.move_to_end(keys[f.file_id])
+                verdicts[f.file_id] = _triage_cache[keys[f.file_id]]
+                self.triage_cache_hits += 1
+
+        todo = [f for f in group if f.file_id not in verdicts]
+        if len(todo) > 1:
+            chain = get_packed_triage_chain(self.triage_llm, self.analysis_type)
+            files = render_files([(f.file_id, f.path, number_lines(f.compacted.text, f.compacted.line_map))
+                                  for f in todo])
+            answer = await self._call(self.triage_model, chain, {"files": files}, single_file=False)
+            self.packed_prompts += 1
+            packed = parse_packed_triage(answer, {f.file_id: f.total_lines for f in todo})
+            for f in todo:
+                f.entry["packed"] = f.file_id in packed
+            verdicts.update(packed)
+
+        missing = [f for f in todo if f.file_id not in verdicts]
+        for f, verdict in zip(missing, await asyncio.gather(*[self._triage_one(f) for f in missing])):
+            verdicts[f.file_id] = verdict
+
+        for f in todo:
+            _triage_cache[keys[f.file_id]] = verdicts[f.file_id]
+        while len(_triage_cache) > SCAN_TRIAGE_CACHE_SIZE:
+            _triage_cache.popitem(last=False)
+        return verdicts
+
+    async def _escalate(self, f: _ScanFile, regions: List[Dict[str, Any]]) -> None:
+        narrowed, info = slice_code_for_lines(
+            f.code, [(r["start"] - SCAN_REGION_PADDING, r["end"] + SCAN_REGION_PADDING) for r in regions])
+        flagged = "\n".join(['# Lines are numbered as "<line>| <code>"; cite those line numbers.'] + [
+            f"# Triage flagged lines {r['start']}-{r['end']}: {r['reason']}" for r in regions])
+        # Numbered with the file's own lines (the slice skips some), which the notes and answer cite too
+        narrowed = number_lines(narrowed, info.get("line_map"))
+        result = await self._call(self.model, f.chain, {"code": f"{narrowed}\n\n{flagged}"})
+        findings = read_findings(result) if self.structured else None
+        self._settle(f, result, findings, record=not info["sliced"],
+                     status="escalated", regions=regions, units=info["units"])
+
+    # Single model: whole-file analysis (packed where possible)
+
+    async def _analyze_packed(self, group: List[_ScanFile]) -> Dict[str, Tuple[str, Optional[List[Finding]]]]:
+        if self.structured:
+            # Numbered with original lines, so the rows need no remapping
+            chain = get_packed_findings_chain(self.llm, self.analysis_type)
+            files = render_files([(f.file_id, f.path, number_lines(f.compacted.text, f.compacted.line_map))
+                                  for f in group])
+        else:
+            chain = get_packed_analysis_chain(self.llm, self.analysis_type)
+            files = render_files([(f.file_id, f.path, f.compacted.text) for f in group])
+        answer = await self._call(self.model, chain, {"files": files}, single_file=False)
+        self.packed_prompts += 1
+
+        if not self.structured:
+            sections = split_sections(answer, [f.file_id for f in group])
+            return {f.file_id: (f.compacted.remap(sections[f.file_id]), None) for f in group if f.file_id in sections}
+        data = _load_json(answer)
+        if not isinstance(data, dict):
+            return {}
+        return {f.file_id: ("", merge_findings([findings_from_wire(data[f.file_id])])) for f in group
+                if isinstance(data.get(f.file_id), list)}
+
+    async def _analyze(self, group: List[_ScanFile]) -> Dict[str, Tuple[str, Optional[List[Finding]]]]:
+        """(text result, findings in structured mode) per file id"""
+        results = {}
+        if len(group) > 1:
+            results = await self._analyze_packed(group)
+            for f in group:
+                f.entry["packed"] = f.file_id in results
+
+        # Structured answers cite the original line numbers they were shown; prose is remapped
+        missing = [f for f in group if f.file_id not in results]
+        codes = [f.compacted.numbered() if self.structured else f.compacted.text for f in missing]
+        answers = await asyncio.gather(*[self._call(self.model, f.chain, {"code": code})
+                                         for f, code in zip(missing, codes)])
+        for f, answer in zip(missing, answers):
+            findings = read_findings(answer) if self.structured else None
+            results[f.file_id] = (answer if self.structured else f.compacted.remap(answer), findings)
+        return results
+
+    async def _run_group(self, group: List[_ScanFile]) -> None:
+        if self.cascade:
+            verdicts = await self._triage(group)
+            suspicious = [(f, verdicts[f.file_id][1]) for f in group if verdicts[f.file_id][0]]
+            for f in group:
+                if not verdicts[f.file_id][0]:
+                    f.entry.update(status="clean", result="No issues found in triage.",
+                                   findings=[] if self.structured else None)
+            await asyncio.gather(*[self._escalate(f, regions) for f, regions in suspicious])
+            return
+
+        results = await self._analyze(group)
+        for f in group:
+            text, findings = results[f.file_id]
+            self._settle(f, text, findings, status="analyzed")
+
+    async def scan(self, files: List[Tuple[int, Dict[str, Any], str]],
+                   ranking: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """Per-file result entries, in the order of ``files``; ``ranking`` lists file indices most
+        important first (unranked files go last) and sets the order calls are sent in"""
+        rank = {index: position for position, index in enumerate(ranking or [])}
+        scan_files, entries = [], []
+        reuse_key = f"{self.analysis_type}:findings" if self.structured else self.analysis_type
+        for index, file_info, code in files:
+            reused = analysis_index.lookup(code, reuse_key, exact_only=True)
+            if reused:
+                findings = findings_from_wire(reused["result"]) if self.structured else None
+                entries.append({"file_index": index, "path": file_info["path"], "status": "reused",
+                                "result": render_findings(findings) if self.structured else reused["result"],
+                                "regions": [], "units": [], "packed": False,
+                                "findings": findings_to_wire(findings) if self.structured else None})
+                continue
+            f = _ScanFile(index, file_info["path"], code,
+                          _analysis_chain(self.analysis_type, self.llm, code, self.structured),
+                          compact_for_analysis(code, self.analysis_type, self.compact), rank.get(index, len(rank)))
+            self.baseline["calls"] += 1
+            self.baseline["prompt_tokens"] += _prompt_tokens(f.chain, {"code": code})
+            scan_files.append(f)
+            entries.append(f.entry)
+
+        # Groups start in ranking order, so the shared concurrency limit admits important files first
+        await asyncio.gather(*[self._run_group(group) for group in self._groups(scan_files)])
+        return entries
+
+    def report(self, wall_time: float) -> Dict[str, Any]:
+        """Cost and latency of this scan against the estimated single-model, one-call-per-file run"""
+        completion = (sum(self._full_completions) / len(self._full_completions)
+                      if self._full_completions else LLM_COMPLETION_TOKEN_ESTIMATE)
+        latency = (sum(self._full_latencies) / len(self._full_latencies)
+                   if self._full_latencies else latency_tracker.median(self.model))
+        self.baseline["completion_tokens"] = int(completion * self.baseline["calls"])
+
+        cost = sum(estimate_cost(model, int(u["prompt_tokens"]), int(u["completion_tokens"]))
+                   for model, u in self.usage.items())
+        baseline_cost = estimate_cost(self.model, self.baseline["prompt_tokens"], self.baseline["completion_tokens"])
+        llm_seconds = sum(u["llm_seconds"] for u in self.usage.values())
+        baseline_seconds = latency * self.baseline["calls"] if latency is not None else None
+
+        return {
+            "mode": "cascade" if self.cascade else "single",
+            "models": {"triage": self.triage_model if self.cascade else None, "analysis": self.model},
+            "usage": {model: {key: round(value, 3) if isinstance(value, float) else int(value)
+                              for key, value in u.items()} for model, u in self.usage.items()},
+            "round_trips": int(sum(u["calls"] for u in self.usage.values())),
+            "packed_prompts": self.packed_prompts,
+            "triage_cache_hits": self.triage_cache_hits,
+            "estimated_cost": round(cost, 6),
+            "llm_seconds": round(llm_seconds, 3),
+            "wall_time": round(wall_time, 3),
+            "baseline": {
+                **self.baseline,
+                "round_trips": self.baseline["calls"],
+                "estimated_cost": round(baseline_cost, 6),
+                "llm_seconds": round(baseline_seconds, 3) if baseline_seconds is not None else None,
+            },
+            "cost_savings_pct": round(100 * (1 - cost / baseline_cost), 1) if baseline_cost else None,
+            "latency_savings_pct": (round(100 * (1 - llm_seconds / baseline_seconds), 1)
+                                    if baseline_seconds else None),
+        }
+
+
+async def scan_project(project: Dict[str, Any], analysis_type: str, model: str,
+                       file_indices: Optional[List[int]] = None, cascade: bool = True, pack: bool = True,
+                       triage_model: Optional[str] = None, openai_api_key: Optional[str] = None,
+                       compact: Optional[bool] = None, structured: bool = False) -> Dict[str, Any]:
+    """Scan a stored project's files; returns per-file results and the savings report"""
+    start = time.monotonic()
+    scanner = ProjectScanner(analysis_type, model, triage_model, cascade, pack, openai_api_key, compact, structured)
+
+    files = []
+    indices = file_indices if file_indices is not None else range(len(project["python_files"]))
+    for index in indices:
+        file_info = project["python_files"][index]
+        try:
+            with open(file_info["full_path"], "r", encoding="utf-8", errors="ignore") as f:
+                files.append((index, file_info, f.read()))
+        except OSError:
+            continue
+
+    results = await scanner.scan(files, [entry["index"] for entry in project.get("file_ranking", [])])
+
+    report = scanner.report(time.monotonic() - start)
+    counts = defaultdict(int)
+    for entry in results:
+        counts[entry["status"]] += 1
+    report["files"] = dict(counts, total=len(results))
+    logging.info(f"Project scan ({analysis_type}, {report['mode']}): {report['files']}, "
+                 f"{report['round_trips']} LLM calls vs {report['baseline']['round_trips']}, "
+                 f"est. cost ${report['estimated_cost']} vs ${report['baseline']['estimated_cost']} single-model")
+    return {"results": results, "report": report}
@@ -0,0 +1,76 @@
+import re
+from typing import Dict, List, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+# Volatile template inputs, in the order they are sent after the stable instructions:
+# code is fixed for a session, history only grows, and the question changes every turn
+VOLATILE_INPUTS = ("code", "history", "question")
+
+# A line holding a volatile placeholder, with the label line right above it ("Code to analyze:")
+_VOLATILE_SEGMENT = re.compile(
+    r"^(?:[^\n{}]*:[ \t]*\n)?[^\n{}]*\{(" + "|".join(VOLATILE_INPUTS) + r")\}[^\n]*(?:\n|$)",
+    re.MULTILINE,
+)
+
+
+def escape_braces(text: str) -> str:
+    """Literal text for a prompt template (code fragments in analysis notes contain braces)"""
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def split_template(template_text: str) -> Tuple[str, Dict[str, str]]:
+    """Stable instructions of a template and its volatile segments by input name
+
+    The segments keep their labels ("User question: {question}"); the instructions
+    are everything else, in the original order, with blank runs collapsed.
+    """
+    segments: Dict[str, str] = {}
+
+    def _take(match: re.Match) -> str:
+        segments.setdefault(match.group(1), match.group(0).strip())
+        return ""
+
+    instructions = _VOLATILE_SEGMENT.sub(_take, template_text)
+    instructions = re.sub(r"\n[ \t]*(?:\n[ \t]*)+", "\n\n", instructions).strip()
+    return instructions, segments
+
+
+def layout_prompt(template_text: str, context: str = "") -> ChatPromptTemplate:
+    """Chat prompt that keeps a template's stable part ahead of everything that varies
+
+    Providers cache the longest previously seen prompt prefix, so the order is:
+    system instructions, then the per-code ``context`` (analysis notes) and the
+    code, then the conversation history as messages, then the question. The
+    first two depend only on the selected template and the code, so repeated
+    analyses and every turn of a chat session share that prefix. Analysis
+    prompts take an optional ``dependencies`` input after the code: messages
+    summarizing imported modules (``core.dependency_context``), kept apart
+    from the code so findings cannot point into them.
+    """
+    instructions, segments = split_template(template_text)
+    messages: List = [("system", instructions)]
+
+    code_part = "\n\n".join(part for part in (escape_braces(context.strip()), segments.get("code", "")) if part)
+    question = segments.get("question", "")
+    if "history" in segments:
+        if code_part:
+            messages.append(("human", code_part))
+        messages.append(MessagesPlaceholder("history", optional=True))
+        if question:
+            messages.append(("human", question))
+    else:
+        human = "\n\n".join(part for part in (code_part, question) if part)
+        if human:
+            messages.append(("human", human))
+        messages.append(MessagesPlaceholder("dependencies", optional=True))
+    return ChatPromptTemplate.from_messages(messages)
+
+
+def prompt_text(prompt) -> str:
+    """Template text of a prompt (every message of a chat prompt), for token budgeting"""
+    if isinstance(prompt, ChatPromptTemplate):
+        return "\n\n".join(
+            getattr(getattr(message, "prompt", None), "template", "") for message in prompt.messages
+        )
+    return getattr(prompt, "template", "")
@@ -0,0 +1,50 @@
+import os
+import re
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+# Packing limits for small files (overridable through environment)
+PACK_TOKEN_BUDGET = int(os.getenv("PACK_TOKEN_BUDGET", "6000"))  # code tokens per packed prompt
+PACK_MAX_FILE_TOKENS = int(os.getenv("PACK_MAX_FILE_TOKENS", "1200"))  # larger files get their own call
+PACK_MAX_FILES = int(os.getenv("PACK_MAX_FILES", "12"))
+
+_SECTION_HEADER = re.compile(r"^\s*#{2,4}\s*FILE\s+([A-Za-z0-9_]+)\b.*$", re.MULTILINE)
+
+
+def pack_items(items: Sequence[Tuple[Hashable, int]], budget: int = PACK_TOKEN_BUDGET,
+               max_items: int = PACK_MAX_FILES) -> List[List[Hashable]]:
+    """First-fit decreasing bin packing of (key, tokens) into groups under ``budget`` tokens
+
+    Items larger than the budget get a group of their own.
+    """
+    bins: List[Tuple[int, List[Hashable]]] = []
+    for key, tokens in sorted(items, key=lambda item: -item[1]):
+        for index, (used, keys) in enumerate(bins):
+            if used + tokens <= budget and len(keys) < max_items:
+                bins[index] = (used + tokens, keys + [key])
+                break
+        else:
+            bins.append((tokens, [key]))
+    return [keys for _, keys in bins]
+
+
+def render_files(files: Sequence[Tuple[str, str, str]]) -> str:
+    """Delimited block of (file id, path, code) entries for a packed prompt"""
+    return "\n\n".join(
+        f"===== FILE {file_id}: {path} =====\n{code}\n===== END FILE {file_id} ====="
+        for file_id, path, code in files
+    )
+
+
+def split_sections(text: str, file_ids: Sequence[str]) -> Dict[str, str]:
+    """Per-file answers of a packed response (``### FILE <id>`` headers); unknown ids are ignored,
+    missing or empty ones are left out so the caller can retry those files alone"""
+    wanted = set(file_ids)
+    sections: Dict[str, str] = {}
+    matches = list(_SECTION_HEADER.finditer(text))
+    for index, match in enumerate(matches):
+        file_id = match.group(1)
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+        body = text[match.end():end].strip()
+        if file_id in wanted and body and file_id not in sections:
+            sections[file_id] = body
+    return sections
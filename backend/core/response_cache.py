@@ -0,0 +1,216 @@
+import asyncio
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from typing import Any, Dict, Optional, Set
+
+from core.code_store import code_hash
+from core.src.logger import logging
+
+# Chat response cache configuration (overridable through environment)
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE_ENABLED", "true").lower() == "true"
+CHAT_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("CHAT_CACHE_SIMILARITY_THRESHOLD", "0.85"))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "5000"))
+CHAT_CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "86400"))
+CHAT_CACHE_MAX_BYPASS_SESSIONS = int(os.getenv("CHAT_CACHE_MAX_BYPASS_SESSIONS", "10000"))
+CHAT_CACHE_EMBEDDINGS = os.getenv("CHAT_CACHE_EMBEDDINGS", "none")  # "none" (lexical) or "openai"
+CHAT_CACHE_EMBEDDING_MODEL = os.getenv("CHAT_CACHE_EMBEDDING_MODEL", "text-embedding-3-small")
+
+_FILLER = re.compile(r"\b(please|kindly|can you|could you|would you|tell me|i want to know|i wonder)\b")
+_NON_WORD = re.compile(r"[^a-z0-9_ ]+")
+
+# Follow-ups that only make sense with the conversation so far are never served from cache
+_CONTEXT_DEPENDENT = re.compile(
+    r"\b(you said|you mentioned|previous|earlier|above|again|instead|that one|the first one|"
+    r"the second|the last one|what about|how about|and why|elaborate|more detail|go on|continue)\b"
+)
+
+
+# Words that do not change what is being asked about the code
+_NOISE_WORDS = {"a", "an", "the", "this", "that", "these", "code", "snippet", "file", "any", "some", "there",
+                "here", "me", "my", "in", "of", "is", "are", "does", "do", "it"}
+_CODE_NAME = re.compile(r"\b(?:[A-Za-z]+_\w*|_\w+|[a-z]+[A-Z]\w*|[A-Z]\w*[a-z][A-Z]\w*|\w+\(\))")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and filler phrases, collapse whitespace"""
+    text = _FILLER.sub(" ", question.lower())
+    text = _NON_WORD.sub(" ", text)
+    return " ".join(text.split())
+
+
+def is_context_dependent(question: str) -> bool:
+    return bool(_CONTEXT_DEPENDENT.search(question.lower()))
+
+
+def code_names(question: str) -> frozenset:
+    """Identifiers (snake_case, camelCase, calls) a question names; similar questions must name the same ones"""
+    return frozenset(name.rstrip("()") for name in _CODE_NAME.findall(question))
+
+
+def _lexical_vector(text: str) -> Dict[str, float]:
+    """Word unigrams/bigrams plus character trigrams, L2-normalized"""
+    words = [word for word in text.split() if word not in _NOISE_WORDS] or text.split()
+    text = " ".join(words)
+    features = Counter(words)
+    features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    padded = f" {text} "
+    features.update(f"#{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    norm = math.sqrt(sum(value * value for value in features.values())) or 1.0
+    return {feature: value / norm for feature, value in features.items()}
+
+
+def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(feature, 0.0) for feature, value in a.items())
+
+
+class _Entry:
+    def __init__(self, scope: str, question: str, answer: str, vector, created: float):
+        self.scope = scope
+        self.question = question
+        self.names = code_names(question)
+        self.answer = answer
+        self.vector = vector
+        self.created = created
+
+
+class ChatResponseCache:
+    """Answers to chat questions keyed by (code hash, model, normalized question).
+
+    Exact normalized matches are a dict lookup; otherwise the entries for the
+    same code are compared by cosine similarity over question embeddings (when
+    configured) or a local lexical vector. Entries expire after a TTL and are
+    evicted least recently used beyond ``max_entries``. Embedding calls block,
+    so async callers use ``alookup`` and ``astore``.
+    """
+
+    def __init__(self, threshold: float = CHAT_CACHE_SIMILARITY_THRESHOLD,
+                 max_entries: int = CHAT_CACHE_MAX_ENTRIES, ttl: float = CHAT_CACHE_TTL_SECONDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._by_scope: Dict[str, Set[tuple]] = defaultdict(set)
+        self._bypass_sessions: "OrderedDict[str, None]" = OrderedDict()
+        self._embeddings = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _embedder(self):
+        if self._embeddings is None and CHAT_CACHE_EMBEDDINGS == "openai":
+            from langchain_openai import OpenAIEmbeddings
+            self._embeddings = OpenAIEmbeddings(model=CHAT_CACHE_EMBEDDING_MODEL)
+        return self._embeddings
+
+    def _vector(self, normalized: str):
+        embedder = self._embedder()
+        if embedder is None:
+            return _lexical_vector(normalized)
+        values = embedder.embed_query(normalized)
+        norm = math.sqrt(sum(value * value for value in values)) or 1.0
+        return {index: value / norm for index, value in enumerate(values)}
+
+    @staticmethod
+    def scope_for(code: str, model: str) -> str:
+        return f"{code_hash(code)}:{model}"
+
+    def set_bypass(self, session_id: str, bypass: Optional[bool]) -> None:
+        """Turn the cache off (or back on) for one session; None keeps the current setting"""
+        if bypass is None:
+            return
+        with self._lock:
+            if bypass:
+                self._bypass_sessions[session_id] = None
+                self._bypass_sessions.move_to_end(session_id)
+                # Least recently set first; a session dropped here just has its cache back on
+                while len(self._bypass_sessions) > CHAT_CACHE_MAX_BYPASS_SESSIONS:
+                    self._bypass_sessions.popitem(last=False)
+            else:
+                self._bypass_sessions.pop(session_id, None)
+
+    def is_bypassed(self, session_id: str) -> bool:
+        return not CHAT_CACHE_ENABLED or session_id in self._bypass_sessions
+
+    def _remove(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._by_scope[entry.scope].discard(key)
+            if not self._by_scope[entry.scope]:
+                del self._by_scope[entry.scope]
+
+    def lookup(self, code: str, model: str, question: str, session_id: str) -> Optional[Dict[str, Any]]:
+        """Stored answer for the same or a similar question about the same code"""
+        if self.is_bypassed(session_id) or is_context_dependent(question):
+            return None
+        scope = self.scope_for(code, model)
+        normalized = normalize_question(question)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get((scope, normalized))
+            if entry is not None and now - entry.created <= self.ttl:
+                self._entries.move_to_end((scope, normalized))
+                self.hits += 1
+                return {"answer": entry.answer, "question": entry.question, "similarity": 1.0}
+            candidates = [self._entries[key] for key in self._by_scope.get(scope, ())]
+
+        if not candidates:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        vector = self._vector(normalized)
+        names = code_names(question)
+        best, best_score = None, 0.0
+        for candidate in candidates:
+            if now - candidate.created > self.ttl or candidate.names != names:
+                continue
+            score = _cosine(vector, candidate.vector)
+            if score > best_score:
+                best, best_score = candidate, score
+
+        with self._lock:
+            if best is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            best_key = (scope, normalize_question(best.question))
+            if best_key in self._entries:
+                self._entries.move_to_end(best_key)
+        logging.info(f"Chat cache hit (similarity {best_score:.2f}) for: {question[:60]}")
+        return {"answer": best.answer, "question": best.question, "similarity": round(best_score, 3)}
+
+    def store(self, code: str, model: str, question: str, answer: str, session_id: str) -> None:
+        if self.is_bypassed(session_id) or is_context_dependent(question):
+            return
+        scope = self.scope_for(code, model)
+        normalized = normalize_question(question)
+        entry = _Entry(scope, question, answer, self._vector(normalized), time.time())
+        key = (scope, normalized)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._by_scope[scope].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    async def alookup(self, code: str, model: str, question: str, session_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, lambda: self.lookup(code, model, question, session_id))
+
+    async def astore(self, code: str, model: str, question: str, answer: str, session_id: str) -> None:
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: self.store(code, model, question, answer, session_id))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+chat_response_cache = ChatResponseCache()
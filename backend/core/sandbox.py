@@ -0,0 +1,193 @@
+import asyncio
+import atexit
+import importlib.util
+import json
+import os
+import select
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from core.src.logger import logging
+
+# Sandbox limits and pool size (overridable through environment). Running generated code is opt-in:
+# enable it only where the server itself runs inside a real isolation boundary (see SandboxPool)
+SANDBOX_ENABLED = os.getenv("SANDBOX_ENABLED", "false").lower() == "true"
+SANDBOX_MAX_WORKERS = int(os.getenv("SANDBOX_MAX_WORKERS", str(os.cpu_count() or 2)))
+SANDBOX_WARM_WORKERS = int(os.getenv("SANDBOX_WARM_WORKERS", "2"))  # started ahead of the first job
+SANDBOX_TIMEOUT = float(os.getenv("SANDBOX_TIMEOUT", "20"))  # wall-clock seconds per job
+SANDBOX_CPU_SECONDS = int(os.getenv("SANDBOX_CPU_SECONDS", "10"))
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "512"))
+SANDBOX_FILE_MB = int(os.getenv("SANDBOX_FILE_MB", "16"))  # largest file a job may write
+
+_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+_START_TIMEOUT = 30.0
+_REPLY_MARGIN = 5.0  # beyond the job timeout, before a silent worker is given up on
+
+
+class SandboxUnavailable(RuntimeError):
+    """The sandbox cannot run here (disabled, not POSIX, or pytest missing)"""
+
+
+def _clean_env() -> Dict[str, str]:
+    """Environment of the workers: enough to run Python, none of the server's keys or credentials"""
+    return {"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "HOME": tempfile.gettempdir(), "LANG": "C.UTF-8",
+            "PYTHONDONTWRITEBYTECODE": "1", "PYTHONHASHSEED": "0"}
+
+
+class _Worker:
+    """One warm interpreter running ``core/sandbox_worker.py``"""
+
+    def __init__(self):
+        self.process = subprocess.Popen([sys.executable, "-I", _WORKER_SCRIPT], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=_clean_env(),
+                                        cwd=tempfile.gettempdir(), text=True, bufsize=1)
+        ready = self._read(_START_TIMEOUT)
+        if ready is None or ready.get("status") != "ready":
+            self.kill()
+            raise SandboxUnavailable("sandbox worker did not start")
+
+    def _read(self, timeout: float) -> Optional[Dict[str, Any]]:
+        readable, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not readable:
+            return None
+        line = self.process.stdout.readline()
+        return json.loads(line) if line else None
+
+    def request(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The worker's reply, or None when it died or went silent (it is then unusable)"""
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+            return self._read(job["timeout"] + _REPLY_MARGIN)
+        except (OSError, ValueError):
+            return None
+
+    def kill(self) -> None:
+        try:
+            self.process.kill()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+
+
+class SandboxPool:
+    """Warm interpreters that run untrusted generated code, one job at a time each.
+
+    Workers are started lazily (SANDBOX_WARM_WORKERS ahead of time by
+    ``warm``) up to SANDBOX_MAX_WORKERS, so jobs of one request run in
+    parallel across cores. Each job runs in a forked child of a worker with
+    CPU, memory, file size and wall-clock limits, in a temporary directory,
+    without the server's environment. This contains runaway and crashing
+    code; it is not a boundary against hostile code (there is no network or
+    filesystem namespace isolation), and the code it runs comes from
+    unauthenticated requests. It is therefore off unless SANDBOX_ENABLED is
+    set, which should only be done where the workers run under a real
+    boundary: an unprivileged uid, their own network and mount namespaces
+    (or a container without network access or host mounts), and a seccomp
+    profile.
+    """
+
+    def __init__(self, max_workers: int = SANDBOX_MAX_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self._idle: List[_Worker] = []
+        self._started = 0
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sandbox")
+        self.jobs = 0
+        self.worker_restarts = 0
+
+    @property
+    def available(self) -> bool:
+        return (SANDBOX_ENABLED and os.name == "posix" and hasattr(os, "fork")
+                and importlib.util.find_spec("pytest") is not None)
+
+    def _acquire(self) -> _Worker:
+        with self._condition:
+            while not self._idle and self._started >= self.max_workers:
+                self._condition.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        try:
+            return _Worker()
+        except Exception:
+            with self._condition:
+                self._started -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, worker: _Worker, healthy: bool) -> None:
+        if not healthy:
+            worker.kill()
+        with self._condition:
+            if healthy:
+                self._idle.append(worker)
+            else:
+                self._started -= 1
+                self.worker_restarts += 1
+            self._condition.notify()
+
+    def run(self, mode: str, files: Dict[str, str], targets: List[str], timeout: float = SANDBOX_TIMEOUT,
+            output_chars: int = 0, cpu_seconds: int = SANDBOX_CPU_SECONDS,
+            options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run one job (blocking): ``files`` are written to a fresh directory and ``targets`` run in ``mode``
+
+        ``options`` are passed through to the mode's runner in the worker.
+        """
+        if not self.available:
+            raise SandboxUnavailable("sandbox is disabled or not supported on this platform")
+        job = {"mode": mode, "files": files, "targets": targets, "timeout": timeout,
+               "cpu_seconds": cpu_seconds, "memory_mb": SANDBOX_MEMORY_MB, "file_mb": SANDBOX_FILE_MB,
+               "output": output_chars, "options": options or {}}
+        worker = self._acquire()
+        reply = worker.request(job)
+        self._release(worker, reply is not None)
+        self.jobs += 1
+        if reply is None:
+            logging.info("Sandbox worker died or went silent; replaced")
+            return {"status": "worker_lost", "wall_time": timeout}
+        return reply
+
+    async def arun(self, mode: str, files: Dict[str, str], targets: List[str], timeout: float = SANDBOX_TIMEOUT,
+                   output_chars: int = 0, cpu_seconds: int = SANDBOX_CPU_SECONDS,
+                   options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, lambda: self.run(mode, files, targets, timeout, output_chars, cpu_seconds, options))
+
+    def warm(self, count: int = SANDBOX_WARM_WORKERS) -> None:
+        """Start workers in the background so the first jobs skip interpreter startup"""
+        if not self.available:
+            return
+
+        def _start():
+            started = []
+            try:
+                with self._condition:
+                    missing = min(count, self.max_workers) - self._started
+                for _ in range(max(0, missing)):
+                    started.append(self._acquire())
+            except Exception as e:
+                logging.info(f"Sandbox warm-up failed: {e}")
+            for worker in started:
+                self._release(worker, True)
+
+        threading.Thread(target=_start, name="sandbox-warm", daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {"available": self.available, "workers": self._started, "idle": len(self._idle),
+                    "max_workers": self.max_workers, "jobs": self.jobs, "worker_restarts": self.worker_restarts}
+
+    def close(self) -> None:
+        with self._condition:
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.kill()
+
+
+sandbox_pool = SandboxPool()
+atexit.register(sandbox_pool.close)
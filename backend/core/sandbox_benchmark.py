@@ -0,0 +1,245 @@
+"""Side-by-side benchmark of an original and an optimized module, run inside the sandbox
+
+Imported by ``core/sandbox_worker.py`` (standard library only). The job
+directory holds ``original.py`` and ``optimized.py``; for each function
+compared, every input is first run once through both versions to check
+that they return the same value, raise the same exception type and leave
+their arguments in the same state, then timed in interleaved batches
+(``timeit``-style: a calibrated number of calls per batch, several
+batches) and measured once more under ``tracemalloc`` for peak memory.
+"""
+import collections.abc
+import copy
+import importlib
+import inspect
+import math
+import random
+import signal
+import statistics
+import time
+import tracemalloc
+import typing
+
+_SEQUENCE_NAMES = {"items", "arr", "array", "nums", "numbers", "values", "lst", "list", "data", "seq", "sequence",
+                   "elements", "xs", "ys", "a", "b", "l", "iterable", "collection", "scores", "prices"}
+_STRING_NAMES = {"s", "text", "string", "word", "words", "name", "line", "sentence", "pattern", "prefix", "suffix",
+                 "t", "source", "content", "message"}
+_MAPPING_NAMES = {"d", "mapping", "dict", "dictionary", "counts", "table", "index", "config", "options"}
+_FLOAT_NAMES = {"x", "y", "z", "rate", "ratio", "value", "amount", "price", "weight", "alpha", "threshold"}
+
+
+class _CallTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _CallTimeout()
+
+
+def _value(kind, size: int, rng: random.Random):
+    origin = typing.get_origin(kind) or kind
+    args = typing.get_args(kind)
+    if kind is bool:
+        return True
+    if kind is int:
+        return size
+    if kind is float:
+        return size + 0.5
+    if kind is str:
+        return "".join(rng.choice("abcdefghij ") for _ in range(size))
+    if kind is bytes:
+        return bytes(rng.randrange(256) for _ in range(size))
+    if origin in (list, tuple, set, frozenset, collections.abc.Sequence, collections.abc.Iterable):
+        if args and args[0] is str:
+            items = ["".join(rng.choice("abcdefghij") for _ in range(8)) for _ in range(size)]
+        elif args and args[0] is float:
+            items = [rng.uniform(-size, size) for _ in range(size)]
+        else:
+            items = [rng.randrange(-size, size) for _ in range(size)]
+        return set(items) if origin in (set, frozenset) else tuple(items) if origin is tuple else items
+    if origin is dict:
+        return {f"k{i}": rng.randrange(size) for i in range(size)}
+    return None
+
+
+def _guess(parameter: inspect.Parameter, size: int, rng: random.Random):
+    """Argument of a generated input, from the annotation, else the parameter's name"""
+    if parameter.annotation is not inspect.Parameter.empty:
+        value = _value(parameter.annotation, size, rng)
+        if value is not None:
+            return value
+    name = parameter.name.lower()
+    if name in _SEQUENCE_NAMES or name.endswith("s") and len(name) > 3:
+        return _value(list, size, rng)
+    if name in _STRING_NAMES:
+        return _value(str, size, rng)
+    if name in _MAPPING_NAMES:
+        return _value(dict, size, rng)
+    if name in _FLOAT_NAMES:
+        return _value(float, size, rng)
+    return size
+
+
+def generate_inputs(function, sizes):
+    """Inputs of growing size for the required parameters; [] when the signature cannot be filled"""
+    try:
+        signature = inspect.signature(function, eval_str=True)
+    except Exception:  # unresolvable string annotations
+        try:
+            signature = inspect.signature(function)
+        except (TypeError, ValueError):
+            return []
+    required = [p for p in signature.parameters.values()
+                if p.default is inspect.Parameter.empty
+                and p.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)]
+    inputs = []
+    for size in sizes:
+        rng = random.Random(size)
+        inputs.append({"label": f"generated n={size}", "args": [_guess(p, size, rng) for p in required],
+                       "kwargs": {}})
+    return inputs
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float):
+        return a == b or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12) or (math.isnan(a) and math.isnan(b))
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return type(a) is type(b) and len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(a[key], b[key]) for key in a)
+    try:
+        equal = a == b
+        if isinstance(equal, bool):
+            return equal
+    except Exception:
+        pass
+    return repr(a) == repr(b)
+
+
+def _call(function, args, kwargs, call_timeout):
+    """(outcome, value) of one call: ("return", result) or ("raise", exception type name)"""
+    random.seed(0)
+    signal.setitimer(signal.ITIMER_REAL, call_timeout)
+    try:
+        result = function(*args, **kwargs)
+        if inspect.isgenerator(result):
+            result = list(result)
+        return "return", result
+    except _CallTimeout:
+        raise
+    except Exception as e:
+        return "raise", type(e).__name__
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _batch_seconds(function, inputs, kwargs, copies_needed, number):
+    calls = [copy.deepcopy(inputs) for _ in range(number)] if copies_needed else [inputs] * number
+    start = time.perf_counter()
+    for args in calls:
+        function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def _stats(samples):
+    """Seconds per call over the repeats; ``cv`` is the coefficient of variation (stdev / mean)"""
+    median, mean = statistics.median(samples), statistics.fmean(samples)
+    stdev = statistics.stdev(samples) if len(samples) > 1 else 0.0
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [median, median, median]
+    return {"median": median, "mean": mean, "stdev": stdev, "min": min(samples), "max": max(samples),
+            "cv": stdev / mean if mean else 0.0, "q1": quartiles[0], "q3": quartiles[2]}
+
+
+def _peak_memory(function, args, kwargs):
+    args = copy.deepcopy(args)
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+    except Exception:
+        pass
+    finally:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return peak
+
+
+def compare_input(original, optimized, case, options):
+    """Equivalence, timing and memory of both versions on one input"""
+    args, kwargs = case.get("args", []), case.get("kwargs", {})
+    entry = {"label": case["label"]}
+    try:
+        before = (copy.deepcopy(args), copy.deepcopy(args))
+        outcomes = [_call(function, state, kwargs, options["call_timeout"])
+                    for function, state in zip((original, optimized), before)]
+    except _CallTimeout:
+        entry.update(status="too_slow")
+        return entry
+    (kind_a, value_a), (kind_b, value_b) = outcomes
+    entry["equivalent"] = kind_a == kind_b and _same(value_a, value_b) and _same(before[0], before[1])
+    if kind_a == "raise":
+        entry.update(status="raises", exception=value_a)
+        return entry
+    if not entry["equivalent"]:
+        entry.update(status="different", original=repr(value_a)[:200], optimized=repr(value_b)[:200])
+        return entry
+
+    # Mutating functions get a fresh copy of their arguments per call
+    copies_needed = not _same(before[0], args)
+    max_number = min(options["max_number"], 1000) if copies_needed else options["max_number"]
+    number = 1
+    while True:
+        elapsed = _batch_seconds(original, args, kwargs, copies_needed, number)
+        if elapsed >= options["min_batch_seconds"] or number >= max_number:
+            break
+        number = min(max_number, number * 10 if elapsed < options["min_batch_seconds"] / 10 else number * 2)
+
+    samples = ([], [])
+    for repeat in range(options["repeats"]):
+        order = (0, 1) if repeat % 2 == 0 else (1, 0)  # alternate which runs first, against drift
+        for side in order:
+            function = (original, optimized)[side]
+            samples[side].append(_batch_seconds(function, args, kwargs, copies_needed, number) / number)
+    original_stats, optimized_stats = _stats(samples[0]), _stats(samples[1])
+    entry.update(
+        status="measured", number=number, repeats=options["repeats"],
+        original=original_stats, optimized=optimized_stats,
+        speedup=original_stats["median"] / optimized_stats["median"] if optimized_stats["median"] else None,
+        # Interquartile ranges apart: the difference is larger than the run-to-run noise
+        significant=original_stats["q1"] > optimized_stats["q3"] or optimized_stats["q1"] > original_stats["q3"],
+        memory_peak_original=_peak_memory(original, args, kwargs),
+        memory_peak_optimized=_peak_memory(optimized, args, kwargs),
+    )
+    entry["memory_delta"] = entry["memory_peak_optimized"] - entry["memory_peak_original"]
+    return entry
+
+
+def run(job):
+    """Benchmark runner of the sandbox worker"""
+    options = job["options"]
+    deadline = time.perf_counter() + options["budget_seconds"]
+    signal.signal(signal.SIGALRM, _on_alarm)
+    original_module = importlib.import_module("original")
+    optimized_module = importlib.import_module("optimized")
+    results = []
+    for name in options["functions"]:
+        original, optimized = getattr(original_module, name, None), getattr(optimized_module, name, None)
+        if not callable(original) or not callable(optimized):
+            results.append({"function": name, "status": "missing"})
+            continue
+        cases = options.get("inputs")
+        if cases:
+            cases = [case if isinstance(case, dict) else {"args": case} for case in cases]
+            cases = [dict(case, label=case.get("label", f"input {i}")) for i, case in enumerate(cases, 1)]
+        else:
+            cases = generate_inputs(original, options["sizes"])
+        measured = []
+        for case in cases:
+            if time.perf_counter() > deadline:  # report what was measured rather than be killed mid-input
+                measured.append({"label": case["label"], "status": "over_budget"})
+                continue
+            entry = compare_input(original, optimized, case, options)
+            measured.append(entry)
+            if entry["status"] == "too_slow" and case["label"].startswith("generated"):
+                break  # larger generated inputs would be slower still
+        results.append({"function": name, "status": "compared" if measured else "no_inputs", "inputs": measured})
+    return {"functions": results}
@@ -0,0 +1,208 @@
+"""Warm sandbox worker (see ``core.sandbox``)
+
+Runs as its own interpreter with pytest already imported, reading one JSON
+job per line on stdin and answering with one JSON line on stdout. Each job
+runs in a forked child in a fresh temporary directory, with CPU, address
+space, file size and wall-clock limits, so nothing a job does survives it
+and the worker stays warm for the next one. Only the standard library,
+pytest and ``sandbox_benchmark`` (next to this file) are imported here: the
+worker must start fast and must not load the application (or its secrets).
+"""
+import json
+import os
+import resource
+import shutil
+import signal
+import sys
+import tempfile
+import time
+
+import pytest  # noqa: F401  (imported once here, inherited by every forked job)
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # -I leaves the script's directory off the path
+import sandbox_benchmark  # noqa: E402
+
+_RESULT_FILE = "__sandbox_result__.json"
+_TESTS_FILE = "__sandbox_tests__.jsonl"  # written as tests run, so a killed job still reports the finished ones
+_MESSAGE_CHARS = 400
+
+
+class _Collector:
+    """pytest plugin recording outcome and duration of every test, one JSON line per update"""
+
+    def __init__(self, path):
+        self.tests = {}
+        self.stream = open(path, "a", buffering=1)
+
+    def _write(self, entry):
+        self.stream.write(json.dumps(entry) + "\n")
+
+    def pytest_runtest_logstart(self, nodeid, location):
+        self.tests[nodeid] = {"nodeid": nodeid, "outcome": "running", "duration": 0.0, "message": ""}
+        self._write(self.tests[nodeid])
+
+    def pytest_runtest_logreport(self, report):
+        entry = self.tests.setdefault(report.nodeid, {"nodeid": report.nodeid, "outcome": "running",
+                                                     "duration": 0.0, "message": ""})
+        entry["duration"] += report.duration
+        if report.failed:
+            entry["outcome"] = "failed" if report.when == "call" else "error"
+            entry["message"] = _message(report)
+        elif report.skipped and entry["outcome"] == "running":
+            entry["outcome"] = "skipped"
+        if report.when == "teardown" and entry["outcome"] == "running":
+            entry["outcome"] = "passed"
+        self._write(entry)
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self._write({"nodeid": report.nodeid or "collection", "outcome": "error", "duration": 0.0,
+                         "message": _message(report)})
+
+
+def _read_tests(directory, unfinished):
+    """Latest state of every test from the stream; tests still running are marked ``unfinished``"""
+    tests = {}
+    try:
+        with open(os.path.join(directory, _TESTS_FILE)) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # cut off mid-line
+                tests[entry["nodeid"]] = entry
+    except OSError:
+        return []
+    for entry in tests.values():
+        if entry["outcome"] == "running":
+            entry["outcome"], entry["message"] = unfinished, f"stopped by the sandbox: {unfinished}"
+    return list(tests.values())
+
+
+def _message(report) -> str:
+    text = getattr(report, "longreprtext", "") or str(report.longrepr or "")
+    lines = [line for line in text.splitlines() if line.startswith("E ")] or text.splitlines()[-3:]
+    return "\n".join(lines)[:_MESSAGE_CHARS]
+
+
+def _limit(job):
+    resource.setrlimit(resource.RLIMIT_CPU, (job["cpu_seconds"], job["cpu_seconds"] + 1))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (job["file_mb"] << 20, job["file_mb"] << 20))
+    try:
+        # The address space limit is on top of what the warm interpreter already maps
+        with open("/proc/self/statm") as statm:
+            current = int(statm.read().split()[0]) * resource.getpagesize()
+    except OSError:
+        current = 0
+    limit = current + (job["memory_mb"] << 20)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _run_pytest(job):
+    collector = _Collector(_TESTS_FILE)
+    start = time.perf_counter()
+    exit_code = pytest.main(["-q", "-p", "no:cacheprovider", "--no-header", "--rootdir", "."] + job["targets"],
+                            plugins=[collector])
+    return {"exit_code": int(exit_code), "duration": time.perf_counter() - start}
+
+
+RUNNERS = {"pytest": _run_pytest, "benchmark": sandbox_benchmark.run}
+
+
+def _child(job, directory):
+    os.setsid()  # own process group, so a timeout also kills anything the job started
+    os.chdir(directory)
+    sys.path.insert(0, directory)
+    output = os.open(os.path.join(directory, "__sandbox_output__.txt"), os.O_WRONLY | os.O_CREAT)
+    os.dup2(output, 1)
+    os.dup2(output, 2)
+    stdin = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(stdin, 0)
+    status = 0
+    try:
+        _limit(job)
+        result = {"status": "completed", "result": RUNNERS[job["mode"]](job)}
+    except MemoryError:
+        result, status = {"status": "memory_limit"}, 1
+    except BaseException as e:  # the job's own failures are results, not worker errors
+        result, status = {"status": "error", "error": f"{type(e).__name__}: {e}"[:_MESSAGE_CHARS]}, 1
+    try:
+        with open(os.path.join(directory, _RESULT_FILE), "w") as f:
+            json.dump(result, f, default=repr)
+    finally:
+        os._exit(status)
+
+
+def _kill_group(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    except PermissionError:  # the child had not called setsid yet
+        os.kill(pid, signal.SIGKILL)
+
+
+def run_job(job):
+    directory = tempfile.mkdtemp(prefix="sandbox-")
+    try:
+        for name, content in job["files"].items():
+            with open(os.path.join(directory, name), "w") as f:
+                f.write(content)
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            _child(job, directory)
+        deadline = start + job["timeout"]
+        status = None
+        while time.perf_counter() < deadline:
+            waited, status = os.waitpid(pid, os.WNOHANG)
+            if waited:
+                break
+            time.sleep(0.005)
+        else:
+            _kill_group(pid)
+            os.waitpid(pid, 0)
+            status = None
+        wall_time = time.perf_counter() - start
+        _kill_group(pid)  # processes the job left behind
+        try:
+            with open(os.path.join(directory, _RESULT_FILE)) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            # Killed before it could report: wall clock, CPU limit (SIGXCPU, then SIGKILL) or a crash
+            if status is None:
+                result = {"status": "timeout"}
+            else:
+                signal_number = os.WTERMSIG(status) if os.WIFSIGNALED(status) else None
+                result = {"status": "cpu_limit" if signal_number in (signal.SIGXCPU, signal.SIGKILL) else "crashed",
+                          "signal": signal_number}
+        if job["mode"] == "pytest":
+            result.setdefault("result", {})["tests"] = _read_tests(directory, result["status"])
+        result["wall_time"] = wall_time
+        if job.get("output"):
+            with open(os.path.join(directory, "__sandbox_output__.txt"), errors="replace") as f:
+                result["output"] = f.read()[-job["output"]:]
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    # Nothing the job prints may reach the protocol stream
+    protocol = os.fdopen(os.dup(1), "w")
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+    protocol.write(json.dumps({"status": "ready"}) + "\n")
+    protocol.flush()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            reply = run_job(json.loads(line))
+        except Exception as e:
+            reply = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+        protocol.write(json.dumps(reply, default=repr) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from core.tokenizer import count_tokens
+
+# SQLite history configuration (overridable through environment)
+CHAT_HISTORY_SQLITE_PATH = os.getenv("CHAT_HISTORY_SQLITE_PATH", "chat_history.sqlite3")
+CHAT_HISTORY_WINDOW_TURNS = int(os.getenv("CHAT_HISTORY_WINDOW_TURNS", "10"))
+CHAT_HISTORY_WINDOW_TOKENS = int(os.getenv("CHAT_HISTORY_WINDOW_TOKENS", "3000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    message TEXT NOT NULL,
+    tokens INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, id);
+"""
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def _get_connection(path: str) -> sqlite3.Connection:
+    """One shared connection per database file (WAL mode, safe across threads)"""
+    with _connections_lock:
+        if path not in _connections:
+            connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            _connections[path] = (connection, threading.Lock())
+        return _connections[path]
+
+
+@contextmanager
+def _transaction(connection: sqlite3.Connection):
+    """Explicit transaction: the connection is in autocommit mode, where ``with connection`` opens none"""
+    connection.execute("BEGIN")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+def _estimate_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    return count_tokens(content) + 4
+
+
+def window_messages(messages: Sequence[BaseMessage], last_n_turns: Optional[int] = None,
+                    max_tokens: Optional[int] = None) -> List[BaseMessage]:
+    """Newest messages of an in-memory history, limited like ``SQLiteChatMessageHistory.get_window``"""
+    if last_n_turns:
+        messages = messages[-last_n_turns * 2:]
+    if not max_tokens:
+        return list(messages)
+
+    selected = []
+    used_tokens = 0
+    for message in reversed(messages):
+        tokens = _estimate_tokens(message)
+        if selected and used_tokens + tokens > max_tokens:
+            break
+        selected.append(message)
+        used_tokens += tokens
+    return selected[::-1]
+
+
+class SQLiteChatMessageHistory(BaseChatMessageHistory):
+    """Local chat history stored in SQLite.
+
+    ``messages`` returns only a window of the newest messages (the last
+    ``window_turns`` turns, capped at ``window_tokens``) through the
+    (session_id, id) index, so per-turn read cost stays constant as a
+    session grows. ``get_all`` still returns the full history.
+    """
+
+    def __init__(self, session_id: str, path: str = CHAT_HISTORY_SQLITE_PATH,
+                 window_turns: Optional[int] = CHAT_HISTORY_WINDOW_TURNS,
+                 window_tokens: Optional[int] = CHAT_HISTORY_WINDOW_TOKENS):
+        self.session_id = session_id
+        self.window_turns = window_turns
+        self.window_tokens = window_tokens
+        self._connection, self._lock = _get_connection(path)
+
+    def get_window(self, last_n_turns: Optional[int] = None, max_tokens: Optional[int] = None) -> List[BaseMessage]:
+        """Newest messages, limited to the last N turns (2 messages each) and/or K tokens"""
+        limit = last_n_turns * 2 if last_n_turns else -1
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT message, tokens FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (self.session_id, limit),
+            ).fetchall()
+
+        selected = []
+        used_tokens = 0
+        for message, tokens in rows:
+            if max_tokens and selected and used_tokens + tokens > max_tokens:
+                break
+            selected.append(message)
+            used_tokens += tokens
+        return messages_from_dict([json.loads(message) for message in reversed(selected)])
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self.get_window(self.window_turns, self.window_tokens)
+
+    def get_all(self) -> List[BaseMessage]:
+        return self.get_window()
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Append messages in one transaction"""
+        rows = [(self.session_id, json.dumps(message_to_dict(message)), _estimate_tokens(message))
+                for message in messages]
+        with self._lock:
+            with _transaction(self._connection):
+                self._connection.executemany(
+                    "INSERT INTO chat_messages (session_id, message, tokens) VALUES (?, ?, ?)", rows
+                )
+
+    def compact(self, keep_last: int = 200) -> int:
+        """Delete all but the newest ``keep_last`` messages of the session; returns rows deleted"""
+        with self._lock:
+            with _transaction(self._connection):
+                cursor = self._connection.execute(
+                    """DELETE FROM chat_messages WHERE session_id = ? AND id <= (
+                           SELECT id FROM chat_messages WHERE session_id = ?
+                           ORDER BY id DESC LIMIT 1 OFFSET ?)""",
+                    (self.session_id, self.session_id, keep_last),
+                )
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            with _transaction(self._connection):
+                self._connection.execute("DELETE FROM chat_messages WHERE session_id = ?", (self.session_id,))
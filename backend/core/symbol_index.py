@@ -0,0 +1,259 @@
+import ast
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.src.logger import logging
+
+# Definition kinds
+KIND_FUNCTION = "function"
+KIND_CLASS = "class"
+KIND_METHOD = "method"
+KIND_VARIABLE = "variable"
+
+_BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.With, ast.AsyncWith,
+                 ast.BoolOp, ast.IfExp, ast.comprehension, ast.ExceptHandler)
+
+
+def module_names_for_path(path: str) -> List[str]:
+    """All dotted module names a project-relative path can be imported as.
+
+    Uploaded archives usually wrap the code in a top-level folder
+    (``repo-main/pkg/mod.py``), so every dotted suffix is a candidate.
+    """
+    parts = path.replace("\\", "/").split("/")
+    parts[-1] = parts[-1][:-3] if parts[-1].endswith(".py") else parts[-1]
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return [".".join(parts[i:]) for i in range(len(parts)) if parts[i:]]
+
+
+class _FileVisitor(ast.NodeVisitor):
+    """Collects definitions, references, call sites and imports of one file"""
+
+    def __init__(self):
+        self.definitions: List[Tuple[str, str, int, Optional[str]]] = []
+        self.references: List[Tuple[str, int]] = []
+        self.calls: List[Tuple[str, int, Optional[str]]] = []
+        self.imports: List[Tuple[str, int, int, List[str]]] = []
+        self._scope: List[Tuple[str, str]] = []
+
+    def _current_scope(self) -> Optional[str]:
+        return ".".join(name for _, name in self._scope) or None
+
+    def _visit_function(self, node):
+        in_class = bool(self._scope) and self._scope[-1][0] == KIND_CLASS
+        kind = KIND_METHOD if in_class else KIND_FUNCTION
+        self.definitions.append((node.name, kind, node.lineno, self._current_scope()))
+        self._scope.append((kind, node.name))
+        self.generic_visit(node)
+        self._scope.pop()
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def visit_ClassDef(self, node):
+        self.definitions.append((node.name, KIND_CLASS, node.lineno, self._current_scope()))
+        self._scope.append((KIND_CLASS, node.name))
+        self.generic_visit(node)
+        self._scope.pop()
+
+    def visit_Assign(self, node):
+        # Only module-level assignments count as definitions
+        if not self._scope:
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    self.definitions.append((target.id, KIND_VARIABLE, node.lineno, None))
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.imports.append((alias.name, 0, node.lineno, []))
+
+    def visit_ImportFrom(self, node):
+        self.imports.append((node.module or "", node.level, node.lineno, [alias.name for alias in node.names]))
+
+    def visit_Call(self, node):
+        callee = node.func
+        if isinstance(callee, ast.Name):
+            self.calls.append((callee.id, node.lineno, self._current_scope()))
+        elif isinstance(callee, ast.Attribute):
+            self.calls.append((callee.attr, node.lineno, self._current_scope()))
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.references.append((node.id, node.lineno))
+
+    def visit_Attribute(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.references.append((node.attr, node.lineno))
+        self.generic_visit(node)
+
+
+class ProjectSymbolIndex:
+    """Compact symbol index for a project.
+
+    Names are interned once into ``names``; every posting is a small tuple of
+    integers keyed by name id, so the index stays a fraction of the source size.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self._name_ids: Dict[str, int] = {}
+        self.files: List[str] = []
+        # name_id -> [(file_index, line, kind, scope_name_id or -1)]
+        self.definitions: Dict[int, List[Tuple[int, int, str, int]]] = defaultdict(list)
+        # name_id -> [(file_index, line)]
+        self.references: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+        # name_id -> [(file_index, line, caller_name_id or -1)]
+        self.calls: Dict[int, List[Tuple[int, int, int]]] = defaultdict(list)
+        # (importer_file_index, module_name_id, target_file_index or -1, line)
+        self.imports: List[Tuple[int, int, int, int]] = []
+        self.parse_errors: List[int] = []
+        # file_index -> cyclomatic-style branch count
+        self.complexity: Dict[int, int] = {}
+        self._modules: Dict[str, int] = {}
+
+    def _intern(self, name: Optional[str]) -> int:
+        if name is None:
+            return -1
+        if name not in self._name_ids:
+            self._name_ids[name] = len(self.names)
+            self.names.append(name)
+        return self._name_ids[name]
+
+    def _name(self, name_id: int) -> Optional[str]:
+        return self.names[name_id] if name_id >= 0 else None
+
+    def resolve_module(self, module: str, importer: Optional[int] = None, level: int = 0) -> int:
+        """Map an import to a project file index (-1 for third-party/stdlib)"""
+        if level and importer is not None:
+            package = self.files[importer].replace("\\", "/").split("/")[:-1]
+            if level > 1:
+                package = package[:-(level - 1)] if level - 1 <= len(package) else []
+            module = ".".join([p for p in package if p] + ([module] if module else []))
+        return self._modules.get(module, -1)
+
+    @classmethod
+    def build(cls, python_files: List[Dict[str, Any]]) -> "ProjectSymbolIndex":
+        """Build the index from the project's ``python_files`` list"""
+        index = cls()
+        sources = {}
+        for file_info in python_files:
+            index.files.append(file_info["path"])
+            for module in module_names_for_path(file_info["path"]):
+                # Ambiguous suffixes (e.g. two "utils" modules) resolve to the first file seen
+                index._modules.setdefault(module, file_info["index"])
+            try:
+                with open(file_info["full_path"], "r", encoding="utf-8", errors="ignore") as f:
+                    sources[file_info["index"]] = f.read()
+            except OSError:
+                sources[file_info["index"]] = ""
+
+        for file_index, code in sources.items():
+            index.add_file(file_index, code)
+
+        logging.info(f"Symbol index built: {len(index.names)} names, {len(index.imports)} import edges")
+        return index
+
+    def add_file(self, file_index: int, code: str) -> None:
+        """Index one file's source"""
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            self.parse_errors.append(file_index)
+            return
+
+        visitor = _FileVisitor()
+        visitor.visit(tree)
+        self.complexity[file_index] = 1 + sum(isinstance(node, _BRANCH_NODES) for node in ast.walk(tree))
+
+        for name, kind, line, scope in visitor.definitions:
+            self.definitions[self._intern(name)].append((file_index, line, kind, self._intern(scope)))
+        for name, line in visitor.references:
+            self.references[self._intern(name)].append((file_index, line))
+        for name, line, caller in visitor.calls:
+            self.calls[self._intern(name)].append((file_index, line, self._intern(caller)))
+
+        for module, level, line, imported_names in visitor.imports:
+            target = self.resolve_module(module, file_index, level)
+            # "from pkg import mod" may import a submodule rather than a name
+            if imported_names:
+                for imported in imported_names:
+                    submodule = f"{module}.{imported}" if module else imported
+                    sub_target = self.resolve_module(submodule, file_index, level)
+                    if sub_target >= 0:
+                        self.imports.append((file_index, self._intern(submodule), sub_target, line))
+            if target >= 0 or not imported_names or module:
+                self.imports.append((file_index, self._intern(module), target, line))
+
+    def find_definitions(self, name: str) -> List[Dict[str, Any]]:
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            return []
+        return [{"file_index": f, "path": self.files[f], "line": line, "kind": kind, "scope": self._name(scope)}
+                for f, line, kind, scope in self.definitions.get(name_id, [])]
+
+    def find_references(self, name: str) -> List[Dict[str, Any]]:
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            return []
+        return [{"file_index": f, "path": self.files[f], "line": line}
+                for f, line in self.references.get(name_id, [])]
+
+    def find_calls(self, name: str) -> List[Dict[str, Any]]:
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            return []
+        return [{"file_index": f, "path": self.files[f], "line": line, "caller": self._name(caller)}
+                for f, line, caller in self.calls.get(name_id, [])]
+
+    def import_edges(self, file_index: Optional[int] = None, local_only: bool = False) -> List[Dict[str, Any]]:
+        edges = []
+        for importer, module_id, target, line in self.imports:
+            if file_index is not None and importer != file_index and target != file_index:
+                continue
+            if local_only and target < 0:
+                continue
+            edges.append({
+                "from_index": importer,
+                "from_path": self.files[importer],
+                "module": self._name(module_id),
+                "to_index": target if target >= 0 else None,
+                "to_path": self.files[target] if target >= 0 else None,
+                "line": line,
+            })
+        return edges
+
+    def local_imports(self, file_index: int) -> List[int]:
+        """Project files directly imported by a file"""
+        targets = []
+        for importer, _, target, _ in self.imports:
+            if importer == file_index and target >= 0 and target != file_index and target not in targets:
+                targets.append(target)
+        return targets
+
+    def file_definitions(self, file_index: int) -> List[Dict[str, Any]]:
+        found = []
+        for name_id, postings in self.definitions.items():
+            for f, line, kind, scope in postings:
+                if f == file_index:
+                    found.append({"name": self.names[name_id], "line": line, "kind": kind, "scope": self._name(scope)})
+        return sorted(found, key=lambda d: d["line"])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "files": len(self.files),
+            "names": len(self.names),
+            "definitions": sum(len(p) for p in self.definitions.values()),
+            "references": sum(len(p) for p in self.references.values()),
+            "calls": sum(len(p) for p in self.calls.values()),
+            "imports": len(self.imports),
+            "local_imports": sum(1 for edge in self.imports if edge[2] >= 0),
+            "parse_errors": len(self.parse_errors),
+        }
+
+
+def build_symbol_index(python_files: List[Dict[str, Any]]) -> ProjectSymbolIndex:
+    """Build a symbol index for uploaded project files"""
+    return ProjectSymbolIndex.build(python_files)
@@ -0,0 +1,111 @@
+import ast
+import asyncio
+import re
+import sys
+from functools import lru_cache
+from importlib import metadata
+from typing import Any, Dict, List
+
+from core.sandbox import SandboxUnavailable, sandbox_pool
+from core.src.logger import logging
+
+# Module name the analyzed code is importable under in the sandbox
+TARGET_MODULE = "target"
+
+_PYTHON_BLOCK = re.compile(r"```(?:python3?|py)[ \t]*\n(.*?)```", re.DOTALL)
+_TEST_DEFINITION = re.compile(r"^\s*(?:async\s+)?def test_|^\s*class Test", re.MULTILINE)
+
+
+def extract_test_files(answer: str) -> List[str]:
+    """Python blocks of a generated answer that define pytest tests, one test file each"""
+    return [block for block in _PYTHON_BLOCK.findall(answer or "") if _TEST_DEFINITION.search(block)]
+
+
+@lru_cache(maxsize=1)
+def _installed_modules() -> frozenset:
+    """Top-level modules a sandboxed test can import: the standard library and installed distributions"""
+    return frozenset(sys.stdlib_module_names) | frozenset(metadata.packages_distributions())
+
+
+def point_imports_at_target(test_code: str) -> str:
+    """Test code importing the analyzed code as ``target``
+
+    Generated tests import the code under a guessed module name ("main",
+    "your_module", "calculator", ...). Imports of modules that are neither
+    standard library nor installed are redirected to the target module, and
+    ``from target import *`` is prepended for tests that assume the code's
+    names are simply in scope.
+    """
+    try:
+        tree = ast.parse(test_code)
+    except SyntaxError:
+        return test_code
+    lines = test_code.split("\n")
+    replacements = []
+    installed = _installed_modules()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom):
+            top = (node.module or "").split(".")[0]
+            if node.level or (top and top != TARGET_MODULE and top not in installed):
+                names = ", ".join(f"{a.name} as {a.asname}" if a.asname else a.name for a in node.names)
+                replacements.append((node, f"from {TARGET_MODULE} import {names}"))
+        elif isinstance(node, ast.Import):
+            unknown = [a for a in node.names if a.name.split(".")[0] not in installed and "." not in a.name]
+            if unknown and len(unknown) == len(node.names):
+                replacements.append((node, "; ".join(f"import {TARGET_MODULE} as {a.asname or a.name}"
+                                                     for a in unknown)))
+    for node, statement in sorted(replacements, key=lambda pair: -pair[0].lineno):
+        indent = lines[node.lineno - 1][:node.col_offset]
+        lines[node.lineno - 1:node.end_lineno] = [indent + statement]
+    # After any "from __future__" imports, which must come first
+    future_end = max((node.end_lineno for node in tree.body
+                      if isinstance(node, ast.ImportFrom) and node.module == "__future__"), default=0)
+    lines.insert(future_end, f"from {TARGET_MODULE} import *  # the code under test")
+    return "\n".join(lines)
+
+
+def _summary(files: List[Dict[str, Any]], tests: List[Dict[str, Any]]) -> Dict[str, Any]:
+    counts = {outcome: sum(test["outcome"] == outcome for test in tests) for outcome in ("passed", "failed", "skipped")}
+    # Errors: tests failing outside their body or stopped by a limit, and files that stopped before any test ran
+    tested_files = {test["file"] for test in tests}
+    errors = len(tests) - sum(counts.values()) + sum(
+        f["status"] != "completed" and f["file"] not in tested_files for f in files)
+    return {"status": "completed", "passed": counts["passed"], "failed": counts["failed"], "errors": errors,
+            "skipped": counts["skipped"], "duration": round(sum(f["wall_time"] for f in files), 3),
+            "files": files, "tests": tests}
+
+
+async def run_generated_tests(code: str, answer: str) -> Dict[str, Any]:
+    """Run the pytest tests of a generated answer against ``code`` in the sandbox
+
+    Each test file is its own sandbox job, so files run in parallel on the
+    warm workers. Returns counts, per-file status (``completed``, ``timeout``,
+    ``cpu_limit``, ``memory_limit``, ``crashed``, ...) and per-test outcome,
+    duration and failure message.
+    """
+    test_files = extract_test_files(answer)
+    if not test_files:
+        return {"status": "no_tests", "passed": 0, "failed": 0, "errors": 0, "skipped": 0, "files": [], "tests": []}
+    if not sandbox_pool.available:
+        return {"status": "unavailable", "files": [], "tests": []}
+
+    names = [f"test_generated_{index}.py" for index in range(1, len(test_files) + 1)]
+    try:
+        replies = await asyncio.gather(*[
+            sandbox_pool.arun("pytest", {f"{TARGET_MODULE}.py": code, name: point_imports_at_target(test_code)},
+                              [name])
+            for name, test_code in zip(names, test_files)
+        ])
+    except SandboxUnavailable as e:
+        logging.info(f"Generated tests not run: {e}")
+        return {"status": "unavailable", "files": [], "tests": []}
+
+    files, tests = [], []
+    for name, reply in zip(names, replies):
+        run = reply.get("result") or {}
+        files.append({"file": name, "status": reply.get("status"), "wall_time": round(reply.get("wall_time", 0.0), 3),
+                      "exit_code": run.get("exit_code"), "error": reply.get("error")})
+        for test in run.get("tests", []):
+            tests.append({"file": name, "test": test["nodeid"].split("::", 1)[-1], "outcome": test["outcome"],
+                          "duration": round(test["duration"], 4), "message": test["message"]})
+    return _summary(files, tests)
@@ -0,0 +1,173 @@
+import ast
+import hashlib
+import io
+import os
+import threading
+import tokenize
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence
+
+from core.src.logger import logging
+
+# Tokenizer and complexity scoring configuration (overridable through environment)
+TOKENIZER_DEFAULT_ENCODING = os.getenv("TOKENIZER_DEFAULT_ENCODING", "o200k_base")
+TOKENIZER_CACHE_SIZE = int(os.getenv("TOKENIZER_CACHE_SIZE", "8192"))
+TOKENIZER_MIN_CACHED_CHARS = 256  # shorter texts are cheaper to encode than to hash
+
+_BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.With, ast.AsyncWith,
+                 ast.ExceptHandler, ast.IfExp, ast.comprehension, ast.BoolOp) + \
+                ((ast.Match,) if hasattr(ast, "Match") else ())
+_NESTING_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.With, ast.AsyncWith,
+                  ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+_encodings: Dict[str, Any] = {}  # encoding name -> tiktoken Encoding, or None when it cannot be loaded
+_token_cache: "OrderedDict[tuple, int]" = OrderedDict()
+_complexity_cache: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _encoding(model: Optional[str] = None):
+    """tiktoken encoding for a model (the default one for unknown models); None if unavailable"""
+    try:
+        import tiktoken
+        from tiktoken.model import encoding_name_for_model
+    except ImportError:
+        return None
+    try:
+        name = encoding_name_for_model(model) if model else TOKENIZER_DEFAULT_ENCODING
+    except KeyError:
+        name = TOKENIZER_DEFAULT_ENCODING
+    if name not in _encodings:
+        try:
+            _encodings[name] = tiktoken.get_encoding(name)
+        except Exception as e:
+            # Encodings are downloaded on first use; offline hosts fall back to estimates
+            logging.info(f"Tokenizer {name} unavailable ({type(e).__name__}); estimating token counts")
+            _encodings[name] = None
+    return _encodings[name]
+
+
+def _estimate(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Tokens of ``text`` for ``model``'s tokenizer, cached by content hash for long texts"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return _estimate(text)
+    if len(text) < TOKENIZER_MIN_CACHED_CHARS:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    key = (encoding.name, hashlib.sha256(text.encode("utf-8")).hexdigest())
+    with _lock:
+        if key in _token_cache:
+            _token_cache.move_to_end(key)
+            return _token_cache[key]
+    count = len(encoding.encode(text, disallowed_special=()))
+    with _lock:
+        _token_cache[key] = count
+        while len(_token_cache) > TOKENIZER_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return count
+
+
+def count_prompt_tokens(template: str, inputs: Dict[str, Any], model: Optional[str] = None) -> int:
+    """Prompt tokens of a template filled with ``inputs`` (template and inputs are counted and cached separately)"""
+    return count_tokens(template, model) + sum(count_tokens(str(value), model) for value in inputs.values())
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None,
+                       marker: str = "\n# ... (truncated)") -> str:
+    """``text`` cut to at most ``max_tokens`` tokens at a line boundary, with a marker"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = _encoding(model)
+    if encoding is None:
+        cut = text[:max_tokens * 4]
+    else:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    if "\n" in cut:
+        cut = cut[:cut.rfind("\n")]
+    return cut + marker
+
+
+def _depth(node: ast.AST, level: int = 0) -> int:
+    nested = level + 1 if isinstance(node, _NESTING_NODES) else level
+    return max([nested] + [_depth(child, nested) for child in ast.iter_child_nodes(node)])
+
+
+def _tokenize_metrics(code: str) -> Dict[str, int]:
+    """Fallback for code that does not parse: logical lines and def/class keywords, ignoring strings and comments"""
+    metrics = {"statements": 0, "functions": 0, "classes": 0, "imports": 0, "branches": 0, "max_depth": 0}
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type == tokenize.NEWLINE:
+                metrics["statements"] += 1
+            elif token.type == tokenize.NAME:
+                if token.string == "def":
+                    metrics["functions"] += 1
+                elif token.string == "class":
+                    metrics["classes"] += 1
+                elif token.string == "import":
+                    metrics["imports"] += 1
+                elif token.string in ("if", "elif", "for", "while", "except", "with", "and", "or"):
+                    metrics["branches"] += 1
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        lines = [line.strip() for line in code.splitlines() if line.strip() and not line.strip().startswith("#")]
+        metrics["statements"] = len(lines)
+        metrics["functions"] = sum(line.startswith(("def ", "async def ")) for line in lines)
+        metrics["classes"] = sum(line.startswith("class ") for line in lines)
+        metrics["imports"] = sum(line.startswith(("import ", "from ")) for line in lines)
+    return metrics
+
+
+def complexity_metrics(code: str) -> Dict[str, int]:
+    """AST-based size and structure of code (docstrings, comments and strings do not count)
+
+    ``score`` is on the scale of the analyzers' former line-count heuristic
+    (statements plus weighted functions, classes and imports), with branches
+    and deep nesting added.
+    """
+    key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    with _lock:
+        if key in _complexity_cache:
+            _complexity_cache.move_to_end(key)
+            return _complexity_cache[key]
+
+    try:
+        tree = ast.parse(code)
+        metrics = {"statements": 0, "functions": 0, "classes": 0, "imports": 0, "branches": 0,
+                   "max_depth": _depth(tree)}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.stmt):
+                is_docstring = isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) \
+                    and isinstance(node.value.value, str)
+                metrics["statements"] += 0 if is_docstring else 1
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+                metrics["functions"] += 1
+            elif isinstance(node, ast.ClassDef):
+                metrics["classes"] += 1
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                metrics["imports"] += 1
+            if isinstance(node, _BRANCH_NODES):
+                metrics["branches"] += 1
+    except (SyntaxError, ValueError, RecursionError):
+        metrics = _tokenize_metrics(code)
+
+    metrics["score"] = (metrics["statements"] + 3 * metrics["functions"] + 5 * metrics["classes"]
+                        + metrics["imports"] + metrics["branches"] + 2 * max(0, metrics["max_depth"] - 3))
+    with _lock:
+        _complexity_cache[key] = metrics
+        while len(_complexity_cache) > TOKENIZER_CACHE_SIZE:
+            _complexity_cache.popitem(last=False)
+    return metrics
+
+
+def complexity_level(code: str, levels: Sequence[str] = ("simple", "medium", "complex"),
+                     thresholds: Sequence[int] = (20, 60)) -> str:
+    """``levels[i]`` where i is the number of ``thresholds`` the complexity score reaches"""
+    score = complexity_metrics(code)["score"]
+    return levels[sum(score >= threshold for threshold in thresholds)]
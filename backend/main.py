@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from api.routes import analysis, chat, projects  # Importing the analysis route
+from core.sandbox import sandbox_pool
 
 # # Import route modules (we'll create these next)
 # from backend.api.routes import analysis, auth, projects
@@ -29,6 +30,11 @@ app.include_router(projects.router, prefix="/api/v1", tags=["projects"])
 # app.include_router(auth.router, prefix="/api/v1", tags=["auth"])
 # app.include_router(projects.router, prefix="/api/v1", tags=["projects"])
 
+# Start the test sandbox's interpreters before the first request needs them (only when SANDBOX_ENABLED)
+@app.on_event("startup")
+async def warm_sandbox():
+    sandbox_pool.warm()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -37,7 +37,8 @@ def create_analysis_section(upload_data: Dict[str, Any], api_client: AICodeRevie
     model_options = {
         'gpt-4o': 'GPT-4o (Fastest & Smartest)',
         'gpt-3.5-turbo': 'GPT-3.5 Turbo (Cheaper & Fast)', 
-        'o3-mini': 'O3-Mini (Reasoning Model)'
+        'o3-mini': 'O3-Mini (Reasoning Model)',
+        'auto': 'Auto (Routed by Code Complexity)'
     }
     
     model_choice = st.selectbox(
@@ -149,8 +150,12 @@ def _handle_multi_file_project_analysis(project_data: Dict[str, Any], analysis_t
         if not confirmed:
             return None
     
+    # Most important files (by import/call centrality, size and complexity) go first
+    file_order = project_data.get("ranked_files") or list(range(len(files)))
+    
     # Show analysis plan
     st.info(f"🎯 Will analyze: **{max_files} files** with **{len(analysis_types)} analysis types**")
+    st.caption("📌 Priority order: " + ", ".join(files[i]["name"] for i in file_order[:max_files]))
     
     if st.button("🚀 Start Multi-File Analysis", type="primary"):
         return _run_optimized_multi_file_analysis(
@@ -158,7 +163,8 @@ def _handle_multi_file_project_analysis(project_data: Dict[str, Any], analysis_t
             max_files, 
             analysis_types, 
             model_choice, 
-            api_client
+            api_client,
+            file_order
         )
     
     return None
@@ -237,8 +243,8 @@ def _run_project_file_analysis(project_id: str, file_index: int, analysis_types:
     
     return analysis_results
 
-def _run_optimized_multi_file_analysis(project_id: str, max_files: int, analysis_types: List[str], model_choice: str, api_client: AICodeReviewAPIClient) -> Dict[str, Any]:
-    """Execute optimized multi-file analysis"""
+def _run_optimized_multi_file_analysis(project_id: str, max_files: int, analysis_types: List[str], model_choice: str, api_client: AICodeReviewAPIClient, file_order: Optional[List[int]] = None) -> Dict[str, Any]:
+    """Execute optimized multi-file analysis, highest-priority files first"""
     
     multi_file_results = {}
     total_operations = max_files * len(analysis_types)
@@ -249,9 +255,12 @@ def _run_optimized_multi_file_analysis(project_id: str, max_files: int, analysis
     operation_count = 0
     start_time = time.time()
     
-    for file_index in range(max_files):
+    if file_order is None:
+        file_order = list(range(max_files))
+    
+    for position, file_index in enumerate(file_order[:max_files]):
         for analysis_type in analysis_types:
-            status_text.text(f"🔄 File {file_index + 1}/{max_files}: {analysis_type}")
+            status_text.text(f"🔄 File {position + 1}/{max_files}: {analysis_type}")
             
             try:
                 api_type = _map_analysis_type_to_api(analysis_type)
@@ -171,6 +171,35 @@ def _process_single_file_chat(code: str, question: str, api_client: AICodeReview
         
         session_id = st.session_state["chat_session_id"]
         
+        # Stream the answer over the session's WebSocket; fall back to a regular request
+        # when the connection cannot be used (nothing has been shown at that point)
+        try:
+            stream = api_client.stream_chat_about_code(
+                code=code,
+                question=question,
+                session_id=session_id,
+                model_choice="gpt-4o"
+            )
+            first_chunk = next(stream, "")
+        except Exception:
+            stream = None
+        
+        if stream is not None:
+            def _answer_chunks():
+                yield first_chunk
+                yield from stream
+            
+            with st.container():
+                st.markdown("**🧑 You:**")
+                st.write(question)
+                
+                st.markdown("**🤖 AI Assistant:**")
+                st.write_stream(_answer_chunks())
+                
+                st.caption(f"⏱️ Response time: {api_client.last_stream_result.get('execution_time', 0):.2f}s")
+                st.markdown("---")
+            return
+        
         api_response = api_client.chat_about_code(
             code=code,
             question=question,
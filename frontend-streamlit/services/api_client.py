@@ -1,6 +1,8 @@
 # services/api_client.py - Fixed to match your backend
 import requests
 import json
+import hashlib
+import websocket
 from typing import Dict, Any, Optional, List
 import time
 
@@ -11,6 +13,11 @@ class AICodeReviewAPIClient:
         self.session.headers.update({
             "Content-Type": "application/json"
         })
+        # Hashes of code the backend already holds (sent as code_ref instead of the code)
+        self._registered_code = set()
+        # session_id -> (socket, code hash, model) of open streaming chat connections
+        self._chat_sockets = {}
+        self.last_stream_result: Dict[str, Any] = {}
     
     def is_backend_healthy(self) -> bool:
         """Check if backend is running"""
@@ -28,31 +35,50 @@ class AICodeReviewAPIClient:
     
     def get_available_models(self) -> List[str]:
         """Get available AI models"""
-        return ['gpt-4o', 'gpt-3.5-turbo', 'o3-mini']
+        return ['gpt-4o', 'gpt-3.5-turbo', 'o3-mini', 'auto']
     
     def get_model_info(self, model: str) -> str:
         """Get model information"""
         model_info = {
             'gpt-4o': 'GPT-4o (Fastest & Smartest)',
             'gpt-3.5-turbo': 'GPT-3.5 Turbo (Cheaper & Fast)', 
-            'o3-mini': 'O3-Mini (Reasoning Model)'
+            'o3-mini': 'O3-Mini (Reasoning Model)',
+            'auto': 'Auto (Routed by Code Complexity)'
         }
         return model_info.get(model, model)
     
+    def _code_ref(self, code: str) -> Optional[str]:
+        """Register code once with POST /api/v1/code; returns its code_ref, or None if registration failed"""
+        ref = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        if ref in self._registered_code:
+            return ref
+        try:
+            response = self.session.post(f"{self.base_url}/api/v1/code", json={"code": code}, timeout=30)
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            return None
+        self._registered_code.add(ref)
+        return ref
+    
+    def _post_with_code(self, path: str, code: str, payload: Dict[str, Any], timeout: int = 60) -> requests.Response:
+        """POST a code request by reference, re-sending the code if the backend no longer has it"""
+        ref = self._code_ref(code)
+        body = dict(payload, code_ref=ref) if ref else dict(payload, code=code)
+        response = self.session.post(f"{self.base_url}{path}", json=body, timeout=timeout)
+        if ref and response.status_code == 404:
+            self._registered_code.discard(ref)
+            response = self.session.post(f"{self.base_url}{path}", json=dict(payload, code=code), timeout=timeout)
+        return response
+    
     # FIXED: Analysis methods that match your backend exactly
     def analyze_bugs(self, code: str, model_choice: str = "gpt-4o") -> Dict[str, Any]:
         """Analyze code for bugs - matches POST /api/v1/analyze/bugs"""
         try:
             payload = {
-                "code": code,
                 "model_choice": model_choice
             }
             
-            response = self.session.post(
-                f"{self.base_url}/api/v1/analyze/bugs",
-                json=payload,
-                timeout=60
-            )
+            response = self._post_with_code("/api/v1/analyze/bugs", code, payload)
             response.raise_for_status()
             
             result = response.json()
@@ -80,15 +106,10 @@ class AICodeReviewAPIClient:
         """Explain code - matches POST /api/v1/analyze/explaincode"""
         try:
             payload = {
-                "code": code,
                 "model_choice": model_choice
             }
             
-            response = self.session.post(
-                f"{self.base_url}/api/v1/analyze/explaincode",
-                json=payload,
-                timeout=60
-            )
+            response = self._post_with_code("/api/v1/analyze/explaincode", code, payload)
             response.raise_for_status()
             
             result = response.json()
@@ -111,15 +132,10 @@ class AICodeReviewAPIClient:
         """Optimize code - matches POST /api/v1/analyze/optimize"""
         try:
             payload = {
-                "code": code,
                 "model_choice": model_choice
             }
             
-            response = self.session.post(
-                f"{self.base_url}/api/v1/analyze/optimize",
-                json=payload,
-                timeout=60
-            )
+            response = self._post_with_code("/api/v1/analyze/optimize", code, payload)
             response.raise_for_status()
             
             result = response.json()
@@ -142,15 +158,10 @@ class AICodeReviewAPIClient:
         """Generate edge cases - matches POST /api/v1/analyze/edgecase"""
         try:
             payload = {
-                "code": code,
                 "model_choice": model_choice
             }
             
-            response = self.session.post(
-                f"{self.base_url}/api/v1/analyze/edgecase",
-                json=payload,
-                timeout=60
-            )
+            response = self._post_with_code("/api/v1/analyze/edgecase", code, payload)
             response.raise_for_status()
             
             result = response.json()
@@ -173,15 +184,10 @@ class AICodeReviewAPIClient:
         """Generate unit tests - matches POST /api/v1/analyze/unittest"""
         try:
             payload = {
-                "code": code,
                 "model_choice": model_choice
             }
             
-            response = self.session.post(
-                f"{self.base_url}/api/v1/analyze/unittest",
-                json=payload,
-                timeout=60
-            )
+            response = self._post_with_code("/api/v1/analyze/unittest", code, payload)
             response.raise_for_status()
             
             result = response.json()
@@ -205,17 +211,12 @@ class AICodeReviewAPIClient:
         """Chat about code - matches POST /api/v1/conversational/chat"""
         try:
             payload = {
-                "code": code,
                 "question": question,
                 "session_id": session_id,
                 "model_choice": model_choice
             }
             
-            response = self.session.post(
-                f"{self.base_url}/api/v1/conversational/chat",
-                json=payload,
-                timeout=60
-            )
+            response = self._post_with_code("/api/v1/conversational/chat", code, payload)
             response.raise_for_status()
             
             return response.json()
@@ -226,6 +227,54 @@ class AICodeReviewAPIClient:
                 "message": f"Chat error: {str(e)}"
             }
     
+    def _chat_socket(self, session_id: str, code: str, model_choice: str):
+        """Open (or reuse) the streaming chat connection of a session, initialized with the code"""
+        ref = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        existing = self._chat_sockets.get(session_id)
+        if existing and existing[0].connected and existing[1:] == (ref, model_choice):
+            return existing[0]
+        if existing:
+            existing[0].close()
+        
+        ws_url = self.base_url.replace("http://", "ws://").replace("https://", "wss://")
+        ws = websocket.create_connection(f"{ws_url}/api/v1/ws/conversational/{session_id}", timeout=120)
+        init = {"type": "init", "model_choice": model_choice}
+        init.update({"code_ref": ref} if self._code_ref(code) else {"code": code})
+        ws.send(json.dumps(init))
+        message = json.loads(ws.recv())
+        if message.get("type") != "ready":
+            ws.close()
+            raise RuntimeError(message.get("detail", "Chat session could not be started"))
+        self._chat_sockets[session_id] = (ws, ref, model_choice)
+        return ws
+    
+    def stream_chat_about_code(self, code: str, question: str, session_id: str, model_choice: str = "gpt-4o"):
+        """Chat about code, yielding the answer as it is generated - matches WS /api/v1/ws/conversational/{session_id}
+        
+        The connection stays open between turns; the final message is kept in ``last_stream_result``.
+        """
+        ws = self._chat_socket(session_id, code, model_choice)
+        try:
+            ws.send(json.dumps({"type": "question", "question": question}))
+            while True:
+                message = json.loads(ws.recv())
+                if message["type"] == "token":
+                    yield message["content"]
+                elif message["type"] in ("done", "cancelled"):
+                    self.last_stream_result = message
+                    return
+                elif message["type"] == "error":
+                    raise RuntimeError(message.get("detail", "Chat error"))
+        except (websocket.WebSocketException, OSError):
+            self._chat_sockets.pop(session_id, None)
+            raise
+    
+    def cancel_chat(self, session_id: str) -> None:
+        """Cancel the answer currently being streamed for a session"""
+        existing = self._chat_sockets.get(session_id)
+        if existing and existing[0].connected:
+            existing[0].send(json.dumps({"type": "cancel"}))
+    
     def chat_about_project(self, project_id: str, question: str, file_index: Optional[int], session_id: str) -> Dict[str, Any]:
         """Chat about project - matches POST /api/v1/conversational/{project_id}/chat"""
         try:
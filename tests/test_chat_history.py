@@ -0,0 +1,175 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_google_firestore import FirestoreChatMessageHistory
+from langchain_google_firestore.chat_message_history import encode_messages
+
+from core import chat_history
+from core.chat_history import BufferedChatMessageHistory, _HistoryFlusher
+
+
+class FakeDocument:
+    """In-memory stand-in for a Firestore document reference"""
+
+    def __init__(self):
+        self.data = None
+        self.reads = 0
+        self.writes = []
+        self.fail_writes = 0
+
+    def get(self):
+        self.reads += 1
+        return SimpleNamespace(exists=self.data is not None, to_dict=lambda: dict(self.data))
+
+    def set(self, data):
+        if self.fail_writes:
+            self.fail_writes -= 1
+            raise ConnectionError("firestore unavailable")
+        self.writes.append(data)
+        self.data = data
+
+    def delete(self):
+        self.data = None
+
+
+class FakeFirestoreClient:
+    def __init__(self):
+        self._client_info = SimpleNamespace(user_agent="")
+        self.documents = {}
+
+    def collection(self, name):
+        return SimpleNamespace(document=lambda key: self.documents.setdefault((name, key), FakeDocument()))
+
+
+@pytest.fixture
+def flusher(monkeypatch):
+    """A private flusher, so tests do not share the module's background thread"""
+    flusher = _HistoryFlusher(interval=0.05)
+    monkeypatch.setattr(chat_history, "_flusher", flusher)
+    return flusher
+
+
+def firestore_store(client, session_id="s1"):
+    return FirestoreChatMessageHistory(session_id=session_id, collection="chats", client=client)
+
+
+def stored_messages(client, session_id="s1"):
+    document = client.documents[("chats", session_id)]
+    return firestore_store(client, session_id).messages if document.data else []
+
+
+def test_loads_once_and_reads_from_memory(flusher):
+    client = FakeFirestoreClient()
+    document = client.collection("chats").document("s1")
+    document.data = {"messages": encode_messages([HumanMessage("hi"), AIMessage("hello")])}
+
+    history = BufferedChatMessageHistory("s1", firestore_store(client))
+    for _ in range(5):
+        assert [m.content for m in history.messages] == ["hi", "hello"]
+    assert document.reads == 1
+
+
+def test_appends_are_written_behind_in_one_document_write(flusher):
+    client = FakeFirestoreClient()
+    history = BufferedChatMessageHistory("s1", firestore_store(client))
+    document = client.documents[("chats", "s1")]
+
+    history.add_messages([HumanMessage("q1"), AIMessage("a1")])
+    history.add_messages([HumanMessage("q2"), AIMessage("a2")])
+    assert document.writes == []  # the turn did not wait on the database
+    assert [m.content for m in history.messages] == ["q1", "a1", "q2", "a2"]
+
+    history.flush()
+    assert len(document.writes) == 1
+    assert [m.content for m in stored_messages(client)] == ["q1", "a1", "q2", "a2"]
+
+    history.flush()  # nothing pending: no write
+    assert len(document.writes) == 1
+
+
+def test_failed_flush_keeps_messages_queued_in_order(flusher):
+    client = FakeFirestoreClient()
+    store = firestore_store(client)
+    history = BufferedChatMessageHistory("s1", store)
+    document = client.documents[("chats", "s1")]
+
+    history.add_messages([HumanMessage("q1")])
+    document.fail_writes = 1
+    with pytest.raises(ConnectionError):
+        history.flush()
+    assert store.messages == []  # the failed batch is not left in the store's copy
+
+    history.add_messages([AIMessage("a1")])
+    history.flush()
+    assert [m.content for m in stored_messages(client)] == ["q1", "a1"]
+
+
+def test_flusher_writes_dirty_sessions_in_the_background(flusher):
+    client = FakeFirestoreClient()
+    history = BufferedChatMessageHistory("s1", firestore_store(client))
+
+    history.add_messages([HumanMessage("q1"), AIMessage("a1")])
+    deadline = time.monotonic() + 5
+    while not client.documents[("chats", "s1")].writes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [m.content for m in stored_messages(client)] == ["q1", "a1"]
+
+
+def test_flusher_retries_a_session_whose_flush_failed(flusher):
+    client = FakeFirestoreClient()
+    history = BufferedChatMessageHistory("s1", firestore_store(client))
+    document = client.documents[("chats", "s1")]
+    flusher.interval = 3600  # flushed by hand below
+
+    document.fail_writes = 1
+    history.add_messages([HumanMessage("q1")])
+    flusher.flush_all()
+    assert document.writes == []
+    assert history in flusher._dirty
+
+    flusher.flush_all()
+    assert [m.content for m in stored_messages(client)] == ["q1"]
+    assert not flusher._dirty
+
+
+def test_concurrent_appends_are_all_flushed(flusher):
+    client = FakeFirestoreClient()
+    history = BufferedChatMessageHistory("s1", firestore_store(client))
+    flusher.interval = 0.001
+
+    def _append(worker):
+        for turn in range(25):
+            history.add_messages([HumanMessage(f"{worker}-{turn}")])
+
+    threads = [threading.Thread(target=_append, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    flusher.flush_all()
+
+    stored = [m.content for m in stored_messages(client)]
+    assert sorted(stored) == sorted(f"{worker}-{turn}" for worker in range(4) for turn in range(25))
+    for worker in range(4):  # each writer's messages keep their order
+        assert [m for m in stored if m.startswith(f"{worker}-")] == [f"{worker}-{turn}" for turn in range(25)]
+
+
+def test_evicted_sessions_are_flushed(flusher, monkeypatch):
+    stores = {}
+    monkeypatch.setattr(chat_history, "_create_store", lambda session_id: stores.setdefault(
+        session_id, InMemoryChatMessageHistory()))
+    monkeypatch.setattr(chat_history, "CHAT_HISTORY_CACHE_SESSIONS", 1)
+    monkeypatch.setattr(chat_history, "_session_histories", type(chat_history._session_histories)())
+    flusher.interval = 3600
+
+    first = chat_history.get_chat_history("a")
+    first.add_messages([HumanMessage("kept")])
+    assert chat_history.get_chat_history("a") is first
+    chat_history.get_chat_history("b")  # evicts "a"
+
+    assert [m.content for m in stores["a"].messages] == ["kept"]
+    assert list(chat_history._session_histories) == ["b"]
@@ -0,0 +1,66 @@
+from core.code_compactor import compact_code, number_lines
+
+SOURCE = '''"""Module docstring
+that spans lines."""
+import os  # operating system
+
+
+class Config:
+    """Settings loaded from the environment."""
+
+    def name(self):
+        return os.getenv("NAME")
+
+    def path(self):
+        # Resolved lazily
+        base = os.getenv("BASE", "/tmp")
+
+        return os.path.join(base, "line 2")
+'''
+
+
+def test_line_map_points_at_the_original_lines():
+    compacted = compact_code(SOURCE)
+    original = SOURCE.split("\n")
+
+    assert compacted.compacted and len(compacted.line_map) == len(compacted.text.split("\n"))
+    for line, number in zip(compacted.text.split("\n"), compacted.line_map):
+        # Every kept line starts with the original line it came from (comments cut, bodies joined)
+        assert line.strip().startswith(original[number - 1].split("  #")[0].strip())
+    assert "def name(self): return os.getenv(\"NAME\")" in compacted.text
+    assert compacted.original_line(compacted.text.split("\n").index("import os") + 1) == 3
+
+
+def test_numbered_code_shows_original_line_numbers():
+    compacted = compact_code(SOURCE)
+    numbered = compacted.numbered().split("\n")
+    assert numbered[0] == "3| import os"
+    assert any(line.startswith("16|") and "os.path.join" in line for line in numbered)
+    assert number_lines("a\nb") == "1| a\n2| b"
+    assert number_lines("a\n# inserted\nb", [4, 0, 9]) == "4| a\n# inserted\n9| b"
+
+
+def test_remap_rewrites_prose_but_not_code():
+    compacted = compact_code(SOURCE)
+    join_line = compacted.line_map.index(16) + 1
+    answer = (f"The join on line {join_line} ignores BASE (lines {join_line - 1}-{join_line}).\n"
+              "```python\n"
+              f"def test_path():\n    assert Config().path().endswith(\"line {join_line}\")\n"
+              "```\n"
+              f"Inline `line {join_line}` is code too.")
+
+    remapped = compacted.remap(answer)
+    assert remapped.startswith("The join on line 16 ignores BASE (lines 14-16).")
+    assert f'endswith("line {join_line}")' in remapped
+    assert remapped.endswith(f"Inline `line {join_line}` is code too.")
+
+
+def test_unclosed_fence_is_left_alone():
+    compacted = compact_code(SOURCE)
+    assert compacted.remap("```python\nx = 'line 1'") == "```python\nx = 'line 1'"
+
+
+def test_code_that_does_not_parse_is_sent_unchanged():
+    compacted = compact_code("def broken(:\n    # note\n    pass\n")
+    assert not compacted.compacted
+    assert compacted.remap("line 2") == "line 2"
@@ -0,0 +1,82 @@
+from core.code_patcher import apply_unified_diff, make_unified_diff, parse_unified_diff
+
+CODE = """import math
+
+
+def area(radius):
+    result = math.pi * radius ** 2
+    return result
+
+
+def scale(values, factor):
+    out = []
+    for value in values:
+        out.append(value * factor)
+    return out
+"""
+
+
+def test_hunk_is_located_by_context_not_by_its_line_number():
+    diff = """```diff
+@@ -40,4 +40,2 @@
+ def scale(values, factor):
+-    out = []
+-    for value in values:
+-        out.append(value * factor)
+-    return out
++    return [value * factor for value in values]
+```"""
+    patched = apply_unified_diff(CODE, diff)
+    assert patched.applied and patched.fuzzy == 0
+    assert patched.code == CODE.replace("""    out = []
+    for value in values:
+        out.append(value * factor)
+    return out
+""", "    return [value * factor for value in values]\n")
+    assert make_unified_diff(CODE, patched.code).startswith("--- a/code.py\n+++ b/code.py\n")
+
+
+def test_fuzz_drops_context_the_model_got_wrong_and_fixes_indentation():
+    # The trailing context line does not match the file
+    diff = ("@@ -5,3 +5,3 @@\n"
+            " def area(radius):\n"
+            "-    result = math.pi * radius ** 2\n"
+            "+    result = math.pi * radius * radius\n"
+            "     return result  # done\n")
+    patched = apply_unified_diff(CODE, diff)
+    assert patched.applied and patched.fuzzy == 1
+    assert "    result = math.pi * radius * radius\n    return result\n" in patched.code
+
+    # The hunk lost one level of indentation
+    unindented = """@@ -5,2 +5,2 @@
+-result = math.pi * radius ** 2
++result = math.pi * radius * radius
+ return result"""
+    patched = apply_unified_diff(CODE, unindented)
+    assert patched.applied and "\n    result = math.pi * radius * radius\n    return result\n" in patched.code
+
+
+def test_line_hint_picks_between_identical_blocks():
+    code = "def a():\n    x = 1\n    return x\n\n\ndef b():\n    x = 1\n    return x\n"
+    diff = "@@ -2,1 +2,1 @@\n-    x = 1\n+    x = 2\n"
+    assert apply_unified_diff(code, diff).code.index("x = 2") < code.index("def b")
+    # Hunk numbers refer to compacted code: original_line translates them
+    patched = apply_unified_diff(code, diff, original_line=lambda line: {2: 7}.get(line, line))
+    assert patched.code.index("x = 2") > code.index("def b")
+
+
+def test_patch_that_breaks_parsing_falls_back():
+    diff = "@@ -5,1 +5,1 @@\n-    result = math.pi * radius ** 2\n+    result = math.pi * (radius ** 2\n"
+    patched = apply_unified_diff(CODE, diff)
+    assert not patched.applied and patched.error.startswith("patched code does not parse")
+
+    # Code that did not parse before is patched as asked
+    broken = CODE.replace("def scale(values, factor):", "def scale(values, factor)")
+    assert apply_unified_diff(broken, diff).applied
+
+
+def test_answers_that_do_not_apply():
+    assert apply_unified_diff(CODE, "The code is already optimal.").error == "answer is not a unified diff"
+    missing = apply_unified_diff(CODE, "@@ -1,1 +1,1 @@\n-import numpy\n+import numpy as np\n")
+    assert not missing.applied and missing.error == "hunk 1 of 1 does not match the code"
+    assert parse_unified_diff("```diff\n```") == []
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from core import code_repair
+from core.code_repair import repair_generated_code, syntax_error
+
+BROKEN = """def total(values):
+    result = 0
+    for value in values
+        result += value
+    return result
+"""
+
+ANSWER = f"""The fix:
+
+```python
+{BROKEN}```
+
+And a usage example:
+
+```python
+print(total([1, 2]))
+```
+"""
+
+
+class FakeRepairChain:
+    """Answers each repair call with the next queued answer"""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.inputs = []
+
+    async def ainvoke(self, inputs):
+        self.inputs.append(inputs)
+        return self.answers.pop(0)
+
+
+@pytest.fixture
+def repair_chain(monkeypatch):
+    holder = {}
+    monkeypatch.setattr(code_repair, "create_llm", lambda model, priority, **kwargs: None)
+    monkeypatch.setattr(code_repair, "get_repair_chain", lambda llm: holder["chain"])
+
+    def _use(*answers):
+        holder["chain"] = FakeRepairChain(*answers)
+        return holder["chain"]
+
+    return _use
+
+
+def test_syntax_error_ignores_fragment_errors():
+    assert syntax_error(BROKEN).lineno == 3
+    assert syntax_error("    return value\n") is None  # a snippet of a function body
+    assert syntax_error("x = 1\x00") is not None
+
+
+def test_only_the_broken_region_is_sent_and_spliced_back(repair_chain, monkeypatch):
+    monkeypatch.setattr(code_repair, "SYNTAX_REPAIR_CONTEXT", 1)
+    chain = repair_chain("```python\n2|     result = 0\n3|     for value in values:\n4|         result += value\n```")
+
+    result = asyncio.run(repair_generated_code(ANSWER, "gpt-4o"))
+
+    sent = chain.inputs[0]
+    assert (sent["start"], sent["end"]) == (2, 4)
+    assert sent["region"] == "2|     result = 0\n3|     for value in values\n4|         result += value"
+    assert result.blocks == 2 and result.invalid == 1 and result.repaired == 1 and result.valid
+    # Line numbers stripped, the rest of the block and of the answer untouched
+    assert result.text == ANSWER.replace("for value in values\n", "for value in values:\n")
+
+
+def test_block_left_as_written_when_repair_fails(repair_chain):
+    # The model answered with the whole file instead of the region
+    repair_chain("```python\n" + "x = 1\n" * 40 + "```")
+    result = asyncio.run(repair_generated_code(ANSWER, "gpt-4o"))
+    assert result.text == ANSWER and not result.valid
+    assert result.repair_calls == 1 and result.errors == ["expected ':' (line 3)"]
+
+    # Still broken after every attempt
+    chain = repair_chain("```python\nfor value in values\n```", "```python\nfor value in values\n```")
+    result = asyncio.run(repair_generated_code(ANSWER, "gpt-4o"))
+    assert result.text == ANSWER and len(chain.inputs) == code_repair.SYNTAX_REPAIR_ATTEMPTS
@@ -0,0 +1,18 @@
+from core.code_slicer import slice_code_for_lines, slice_code_for_question
+
+CODE = "import os\n\n\n" + "".join(f"def step_{i}(path):\n    return os.path.join(path, '{i}')\n\n\n" for i in range(40))
+
+
+def test_regions_pull_in_whole_units():
+    text, info = slice_code_for_lines(CODE, [(9, 9)])
+    assert info["sliced"] and info["units"] == ["step_1"]
+    assert "import os" in text and "def step_1(path):" in text and "def step_2" not in text
+
+
+def test_unparseable_code_is_sent_whole():
+    # Too deeply nested for the parser: RecursionError rather than SyntaxError
+    deep = CODE + "x = " + "-" * 5000 + "1\n"
+    assert slice_code_for_lines(deep, [(9, 9)]) == (deep, {"sliced": False, "units": [], "original_lines": 165,
+                                                           "slice_lines": 165})
+    assert slice_code_for_question(deep, "What does step_3 do?")[0] == deep
+    assert slice_code_for_lines("x = 1\x00", [(1, 1)])[1]["sliced"] is False
@@ -0,0 +1,41 @@
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+
+from core import conversation_memory
+from core.conversation_memory import SummarizingChatMessageHistory
+
+
+class FakeSummaryChain:
+    def __init__(self):
+        self.folded = []
+
+    def invoke(self, inputs):
+        self.folded.append(inputs["new_lines"])
+        return f"summary {len(self.folded)}"
+
+
+class InlineExecutor:
+    def submit(self, function, *args):
+        function(*args)
+
+
+def turn(number):
+    return [HumanMessage(content=f"question {number}"), AIMessage(content=f"answer {number}")]
+
+
+def test_folds_only_new_messages_when_the_folded_one_changed(monkeypatch):
+    monkeypatch.setattr(conversation_memory, "_summary_executor", InlineExecutor())
+    history = InMemoryChatMessageHistory()
+    history.add_messages(turn(1) + turn(2) + turn(3))
+    chain = FakeSummaryChain()
+    memory = SummarizingChatMessageHistory(history, chain, verbatim_turns=1)
+
+    memory.messages
+    assert chain.folded == ["Human: question 1\nAI: answer 1\nHuman: question 2\nAI: answer 2"]
+
+    # The last folded message comes back from the store changed, then one more turn is added
+    history.messages[3] = AIMessage(content="answer 2 (reloaded)")
+    history.add_messages(turn(4))
+    messages = memory.messages
+    assert chain.folded[1] == "Human: question 3\nAI: answer 3"
+    assert messages[0].content == "Summary of the earlier conversation: summary 1"
@@ -0,0 +1,43 @@
+from core.findings import Finding, merge_findings, parse_findings, read_findings, render_findings
+
+
+def rows(findings):
+    return [finding.as_row() for finding in findings]
+
+
+def test_parse_normalizes_rows_and_objects():
+    answer = ('```json\n{"findings": [{"severity": "major", "line": 4, "description": "x is unbound"},'
+              ' {"message": ""}, ["warning", 9, 7, "Error Handling", "open() is never closed", "use with"]]}\n```')
+    assert rows(parse_findings(answer)) == [
+        ["high", 4, 4, "general", "x is unbound", ""],
+        ["medium", 7, 9, "error_handling", "open() is never closed", "use with"],
+    ]
+    assert parse_findings("No issues found.") is None
+    assert parse_findings('{"issues": []}') is None
+    assert parse_findings('{"findings": []}') == []
+
+
+def test_merge_joins_the_same_issue_across_groups_in_any_order():
+    chunk_a = [Finding.from_raw(["high", 10, 12, "logic", "Loop returns on the first item", "move the return"]),
+               Finding.from_raw(["low", 3, 3, "error_handling", "open() is never closed", ""])]
+    chunk_b = [Finding.from_raw(["critical", 11, 14, "logic", "Loop returns on the first item early", ""]),
+               Finding.from_raw(["low", 30, 30, "logic", "Unrelated counter issue", ""])]
+
+    merged = merge_findings([chunk_a, chunk_b])
+    assert rows(merged) == [
+        ["low", 3, 3, "error_handling", "open() is never closed", ""],
+        # One issue: the ranges are joined, the more severe wording kept, the known fix kept
+        ["critical", 10, 14, "logic", "Loop returns on the first item early", "move the return"],
+        ["low", 30, 30, "logic", "Unrelated counter issue", ""],
+    ]
+    assert rows(merge_findings([chunk_b, chunk_a])) == rows(merged)
+    assert rows(chunk_a)[0] == ["high", 10, 12, "logic", "Loop returns on the first item", "move the return"]
+
+
+def test_read_findings_maps_lines_and_render_orders_by_severity():
+    findings = read_findings('{"findings": [["low", 2, 3, "style", "long line", ""], ["high", 5, 5, "crash", "x/0", ""]]}',
+                             lambda line: line + 10)
+    assert rows(findings) == [["low", 12, 13, "style", "long line", ""], ["high", 15, 15, "crash", "x/0", ""]]
+    assert render_findings(findings) == ("- **HIGH** [crash] (line 15): x/0\n"
+                                         "- **LOW** [style] (lines 12-13): long line")
+    assert render_findings([], empty="No unhandled edge cases found.") == "No unhandled edge cases found."
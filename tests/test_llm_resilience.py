@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from core import llm_resilience
+from core.llm_resilience import LatencyTracker, _hedged, acall_with_retries
+
+MODEL = "fake-model"
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    """A fresh latency tracker whose hedge delay is 0.1s"""
+    tracker = LatencyTracker()
+    monkeypatch.setattr(llm_resilience, "latency_tracker", tracker)
+    monkeypatch.setattr(tracker, "hedge_delay", lambda model: 0.1)
+    return tracker
+
+
+def fake_call(queued: float, running: float, calls: list):
+    """A call that waits ``queued`` for its slot, then takes ``running`` to answer"""
+
+    async def _call(admitted):
+        calls.append("sent")
+        try:
+            await asyncio.sleep(queued)
+            admitted()
+            await asyncio.sleep(running)
+        except asyncio.CancelledError:
+            calls.append("cancelled")
+            raise
+        return "answer"
+
+    return _call
+
+
+def test_queue_time_does_not_trigger_a_hedge_or_count_as_latency(tracker):
+    calls = []
+    answer = asyncio.run(acall_with_retries(fake_call(0.3, 0.05, calls), MODEL, hedge=True))
+
+    assert answer == "answer" and calls == ["sent"]
+    assert "hedges_sent" not in tracker.counters
+    assert tracker.median(MODEL) < 0.2  # the 0.3s in the queue is not model latency
+
+
+def test_slow_admitted_call_is_hedged(tracker):
+    calls = []
+    slow_then_fast = iter([fake_call(0, 1.0, calls), fake_call(0, 0.01, calls)])
+
+    async def _call(admitted):
+        return await next(slow_then_fast)(admitted)
+
+    answer = asyncio.run(acall_with_retries(_call, MODEL, hedge=True))
+    assert answer == "answer"
+    assert tracker.counters["hedges_sent"] == 1 and tracker.counters["hedges_won"] == 1
+    assert calls == ["sent", "sent", "cancelled"]  # the slow primary was cancelled
+
+
+def test_cancelled_caller_cancels_the_primary_before_the_hedge(tracker):
+    calls = []
+
+    async def _run():
+        waiting = asyncio.ensure_future(_hedged(fake_call(10, 0, calls), MODEL))
+        await asyncio.sleep(0.05)  # the primary is still queued
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        await asyncio.sleep(0)
+        assert calls == ["sent", "cancelled"]  # before asyncio.run would cancel leftovers itself
+
+    asyncio.run(_run())
@@ -0,0 +1,218 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+
+from core import llm_scheduler as scheduler_module
+from core.llm_scheduler import (
+    PRIORITY_ANALYSIS,
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    LLMScheduler,
+    _holding_slot,
+    create_llm,
+)
+
+MODEL = "fake-model"
+
+
+class RateLimited(Exception):
+    """What the OpenAI client raises on a 429"""
+
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": str(retry_after)})
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """A fresh scheduler for the fake model, used by every ScheduledChatOpenAI in the test"""
+    scheduler = LLMScheduler()
+    monkeypatch.setattr(scheduler_module, "llm_scheduler", scheduler)
+    return scheduler
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """Fake async model in place of the OpenAI API: scripted failures, chunked streams"""
+    provider = SimpleNamespace(calls=0, failures=[], flag_seen=[], chunks=["a", "b", "c"])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        provider.calls += 1
+        provider.flag_seen.append(_holding_slot.get())
+        await asyncio.sleep(0.01)
+        if provider.failures:
+            raise provider.failures.pop(0)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage("answer"))],
+                          llm_output={"token_usage": {"prompt_tokens": 5, "completion_tokens": 1}})
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for text in provider.chunks:
+            provider.flag_seen.append(_holding_slot.get())
+            await asyncio.sleep(0.01)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+    monkeypatch.setattr(ChatOpenAI, "_agenerate", _agenerate)
+    monkeypatch.setattr(ChatOpenAI, "_astream", _astream)
+    return provider
+
+
+def _limiter(scheduler, rpm=600, tpm=100000, window=4):
+    limiter = scheduler._limiter(MODEL)
+    limiter.rpm, limiter.tpm = rpm, tpm
+    limiter.request_bucket, limiter.token_bucket = float(rpm), float(tpm)
+    limiter.window = limiter.max_concurrency = window
+    return limiter
+
+
+async def _grant_times(scheduler, tokens, priority=PRIORITY_ANALYSIS):
+    """Seconds after the start at which each concurrent slot request was granted"""
+    start = time.monotonic()
+    granted = []
+
+    async def _call(amount):
+        async with scheduler.aslot(MODEL, amount, priority):
+            granted.append(time.monotonic() - start)
+
+    await asyncio.gather(*[_call(amount) for amount in tokens])
+    return sorted(granted)
+
+
+def test_requests_per_minute_bucket_blocks(scheduler):
+    limiter = _limiter(scheduler, rpm=120)  # one request every 0.5s once the bucket is empty
+    limiter.request_bucket = 1.0
+
+    granted = asyncio.run(_grant_times(scheduler, [1, 1, 1]))
+    assert granted[0] < 0.1
+    assert 0.4 < granted[1] < 0.9
+    assert 0.9 < granted[2] < 1.5
+
+
+def test_tokens_per_minute_bucket_blocks(scheduler):
+    limiter = _limiter(scheduler, tpm=6000)  # 100 tokens per second
+    limiter.token_bucket = 100.0
+
+    granted = asyncio.run(_grant_times(scheduler, [100, 50]))
+    assert granted[0] < 0.1
+    assert 0.4 < granted[1] < 0.9
+
+
+def test_rate_limit_halves_the_window_and_cools_down(scheduler, provider):
+    limiter = _limiter(scheduler, window=8)
+    provider.failures = [RateLimited(retry_after=0.3)]
+    llm = create_llm(MODEL, priority=PRIORITY_ANALYSIS, openai_api_key="test")
+
+    async def _run():
+        start = time.monotonic()
+        answer = await llm.ainvoke("hi")
+        return answer, time.monotonic() - start
+
+    answer, elapsed = asyncio.run(_run())
+    assert answer.content == "answer"
+    assert provider.calls == 2  # retried after the 429
+    assert limiter.rate_limited == 1
+    assert limiter.window < 5  # halved from 8, then one additive step on the success
+    assert elapsed >= 0.3  # the retry waited out the server's retry-after
+    assert limiter.in_flight == 0
+
+
+def test_window_grows_additively_on_fast_successes(scheduler):
+    limiter = _limiter(scheduler, window=16)
+    limiter.window = 2.0
+    for _ in range(3):
+        limiter.in_flight += 1
+        scheduler._release(limiter, 0.01, None)
+    assert 2.0 < limiter.window < 4.0
+
+
+def test_waiting_calls_are_granted_by_priority(scheduler):
+    _limiter(scheduler, window=1)
+    order = []
+
+    async def _run():
+        holder_granted, release_holder = asyncio.Event(), asyncio.Event()
+
+        async def _holder():
+            async with scheduler.aslot(MODEL, 1, PRIORITY_BULK):
+                holder_granted.set()
+                await release_holder.wait()
+
+        async def _call(name, priority):
+            async with scheduler.aslot(MODEL, 1, priority):
+                order.append(name)
+
+        holder = asyncio.ensure_future(_holder())
+        await holder_granted.wait()
+        calls = []
+        for name, priority in [("bulk-1", PRIORITY_BULK), ("analysis", PRIORITY_ANALYSIS),
+                               ("bulk-2", PRIORITY_BULK), ("chat", PRIORITY_INTERACTIVE)]:
+            calls.append(asyncio.ensure_future(_call(name, priority)))
+            await asyncio.sleep(0.01)  # queued in this order
+        release_holder.set()
+        await asyncio.gather(holder, *calls)
+
+    asyncio.run(_run())
+    assert order == ["chat", "analysis", "bulk-1", "bulk-2"]
+
+
+def test_cancelled_waiter_gives_its_place_back(scheduler):
+    limiter = _limiter(scheduler, window=1)
+
+    async def _run():
+        async with scheduler.aslot(MODEL, 1):
+            waiting = asyncio.ensure_future(scheduler.aslot(MODEL, 1).__aenter__())
+            await asyncio.sleep(0.01)
+            waiting.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiting
+        async with scheduler.aslot(MODEL, 1):
+            return limiter.in_flight
+
+    assert asyncio.run(_run()) == 1
+    assert limiter.in_flight == 0
+
+
+def test_stream_consumer_calls_are_scheduled(scheduler, provider):
+    limiter = _limiter(scheduler)
+    llm = create_llm(MODEL, priority=PRIORITY_ANALYSIS, openai_api_key="test")
+    consumer_flags = []
+
+    async def _run():
+        async for _ in llm.astream("stream"):
+            consumer_flags.append(_holding_slot.get())
+            await llm.ainvoke("nested")  # made mid-stream, must take its own slot
+
+    asyncio.run(_run())
+    assert consumer_flags == [False, False, False]
+    # Provider code ran with the flag set; the nested calls were admitted and completed on their own
+    assert provider.flag_seen[0] is True and provider.calls == 3
+    assert limiter.completed == 4  # the stream and each nested call
+    assert limiter.in_flight == 0
+
+
+def test_flag_is_restored_after_errors_and_early_close(scheduler, provider):
+    limiter = _limiter(scheduler)
+    llm = create_llm(MODEL, priority=PRIORITY_ANALYSIS, openai_api_key="test")
+    provider.failures = [ValueError("bad request")]
+
+    async def _run():
+        with pytest.raises(ValueError):
+            await llm.ainvoke("fails")
+        assert _holding_slot.get() is False
+
+        stream = llm.astream("stream")
+        async for _ in stream:
+            break
+        await stream.aclose()
+        assert _holding_slot.get() is False
+        await llm.ainvoke("after")
+
+    asyncio.run(_run())
+    assert limiter.in_flight == 0
+    assert limiter.completed >= 1
@@ -0,0 +1,37 @@
+from core.minhash_index import AnalysisDedupIndex
+
+RETURN_IN_LOOP = """def total_of(values, scale=1):
+    total = 0
+    for value in values:
+        total += value * scale
+        return total
+"""
+# The same tokens once indentation is ignored
+RETURN_AFTER_LOOP = """def total_of(values, scale=1):
+    total = 0
+    for value in values:
+        total += value * scale
+    return total
+"""
+
+
+def test_exact_reuse_needs_identical_source():
+    index = AnalysisDedupIndex()
+    index.record(RETURN_IN_LOOP, "bugs", "line 5: returns inside the loop", "gpt-4o")
+
+    hit = index.lookup(RETURN_IN_LOOP, "bugs", exact_only=True)
+    assert hit == {"result": "line 5: returns inside the loop", "model_used": "gpt-4o", "similarity": 1.0, "exact": True}
+    # Same tokens, other line numbers: findings that cite lines must not come back
+    assert index.lookup("# helpers\n\n" + RETURN_IN_LOOP, "bugs", exact_only=True) is None
+    assert index.lookup(RETURN_IN_LOOP.replace("\n", "\n\n"), "bugs", exact_only=True) is None
+    assert index.lookup(RETURN_AFTER_LOOP, "bugs", exact_only=True) is None
+    assert index.lookup(RETURN_IN_LOOP, "edge-cases", exact_only=True) is None
+
+
+def test_near_duplicates_are_hints_without_exact_only():
+    index = AnalysisDedupIndex()
+    index.record(RETURN_IN_LOOP, "explain", "Sums the values.", "gpt-4o-mini")
+
+    hit = index.lookup("# helpers\n" + RETURN_IN_LOOP, "explain")
+    assert hit["result"] == "Sums the values." and not hit["exact"]
+    assert hit["model_used"] == "gpt-4o-mini"
@@ -0,0 +1,27 @@
+import json
+
+from core.model_router import needs_escalation
+
+
+def findings_answer(*severities):
+    return json.dumps({"findings": [[severity, 3, 3, "logic", f"{severity} issue", ""] for severity in severities]})
+
+
+def test_structured_answers_escalate_on_severity_fields():
+    assert not needs_escalation(findings_answer())  # a clean result is a valid answer, however short
+    assert not needs_escalation(findings_answer("low", "medium"))
+    assert needs_escalation(findings_answer("medium", "critical"))
+    assert needs_escalation(findings_answer("high"))
+    # Words in the message are not severities
+    assert not needs_escalation(json.dumps({"findings": [
+        {"severity": "low", "start_line": 1, "message": "not critical, just unclear naming"}]}))
+
+
+def test_malformed_structured_answer_escalates():
+    assert needs_escalation('{"findings": [["low", 1, 1, "style"')
+
+
+def test_prose_answers_keep_the_text_checks():
+    assert needs_escalation("Looks fine.")
+    assert needs_escalation("The loop " * 40 + "may be a critical problem.")
+    assert not needs_escalation("The loop bound is off by one on line 3; use range(len(items)). " * 5)
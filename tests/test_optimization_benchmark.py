@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+
+from core import optimization_benchmark
+from core.optimization_benchmark import benchmark_optimization, common_functions, extract_optimized_code
+
+ORIGINAL = """def total(values):
+    result = 0
+    for value in values:
+        result += value
+    return result
+
+
+def _helper(x):
+    return x
+
+
+async def fetch():
+    return 1
+"""
+
+OPTIMIZED = """def total(values):
+    return sum(values)
+
+
+def _helper(x):
+    return x
+
+
+async def fetch():
+    return 1
+"""
+
+
+def test_extract_optimized_code():
+    assert extract_optimized_code(OPTIMIZED) == OPTIMIZED
+    answer = f"Use sum:\n```python\n{OPTIMIZED}```\nor, shorter:\n```python\ntotal = sum\n```\n```python\ndef broken(:\n```"
+    assert extract_optimized_code(answer) == OPTIMIZED  # the longest block that compiles
+    assert extract_optimized_code(None) is None
+    assert extract_optimized_code("") is None
+    assert extract_optimized_code("Already optimal, no changes needed.") is None
+
+
+def test_common_functions_skip_coroutines_and_put_public_ones_first():
+    assert common_functions("def _a(): pass\ndef b(): pass\n" + ORIGINAL, OPTIMIZED + "def _a(): pass\ndef b(): pass\n") == [
+        "b", "total", "_a"]
+
+
+def test_benchmark_summary(monkeypatch):
+    sent = {}
+
+    async def arun(kind, files, args, **options):
+        sent.update(files=files, options=options["options"])
+        return {"status": "completed", "wall_time": 1.23456, "result": {"functions": [{"name": "total", "inputs": [
+            {"equivalent": True, "speedup": 2.0, "significant": True, "memory_delta": -10},
+            {"equivalent": True, "speedup": 0.5, "significant": True, "memory_delta": 40}]}]}}
+
+    monkeypatch.setattr(optimization_benchmark, "sandbox_pool", SimpleNamespace(available=True, arun=arun))
+    result = asyncio.run(benchmark_optimization(ORIGINAL, f"```python\n{OPTIMIZED}```"))
+
+    assert sent["files"] == {"original.py": ORIGINAL, "optimized.py": OPTIMIZED}
+    assert sent["options"]["functions"] == ["total", "_helper"]
+    assert result["equivalent"] is True and result["inputs_measured"] == 2
+    assert abs(result["speedup"] - 1.0) < 1e-9  # geometric mean: 2x and 0.5x cancel out
+    assert result["max_memory_delta"] == 40 and result["wall_time"] == 1.235
+
+    assert asyncio.run(benchmark_optimization(ORIGINAL, None))["status"] == "no_code"
+    assert asyncio.run(benchmark_optimization(ORIGINAL, "x = 1"))["status"] == "no_functions"
+    monkeypatch.setattr(optimization_benchmark, "sandbox_pool", SimpleNamespace(available=False))
+    assert asyncio.run(benchmark_optimization(ORIGINAL, OPTIMIZED))["status"] == "unavailable"
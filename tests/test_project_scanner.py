@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from core import project_scanner
+from core.minhash_index import AnalysisDedupIndex
+from core.project_scanner import ProjectScanner
+
+
+def source(name: str) -> str:
+    """52 lines; compacted, line k is the one-line function at original line 13 + 4 * (k - 1)"""
+    header = "".join(f"# {name} notes, part {part}\n" for part in range(1, 13))
+    body = "".join(f"def {name}_{i}(value):\n    # check\n    return value + {i}\n\n" for i in range(10))
+    return header + body
+
+
+class FakeChain:
+    """A ``template | llm | parser`` chain answering from a function of its inputs"""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.inputs = []
+        self.first = SimpleNamespace(template="{code}")
+
+    async def ainvoke(self, inputs):
+        self.inputs.append(inputs)
+        return self.answer(inputs)
+
+
+@pytest.fixture
+def chains(monkeypatch):
+    """Fake single-file, packed and triage chains in place of the models"""
+    chains = SimpleNamespace(single=None, packed=None, triage=None)
+    monkeypatch.setattr(project_scanner, "analysis_index", AnalysisDedupIndex())
+    monkeypatch.setattr(project_scanner, "_analysis_chain", lambda analysis_type, llm, code, structured=False: chains.single)
+    monkeypatch.setattr(project_scanner, "get_packed_analysis_chain", lambda llm, analysis_type: chains.packed)
+    monkeypatch.setattr(project_scanner, "get_triage_chain", lambda llm, analysis_type: chains.triage)
+    monkeypatch.setattr(project_scanner, "_triage_cache", type(project_scanner._triage_cache)())
+    return chains
+
+
+def scan(files, ranking=None, **options):
+    scanner = ProjectScanner("bugs", "gpt-4o", openai_api_key="test", **options)
+    return asyncio.run(scanner.scan([(index, {"path": f"{name}.py"}, source(name))
+                                     for index, name in enumerate(files)], ranking))
+
+
+def test_packed_prose_findings_cite_original_lines(chains):
+    chains.single = FakeChain(lambda inputs: "unused")
+    chains.packed = FakeChain(lambda inputs: "### FILE f0\nline 2 adds the wrong constant.\n"
+                                             "### FILE f1\nlines 1-3 repeat the same logic.")
+
+    entries = scan(["alpha", "beta"], cascade=False, compact=True)
+
+    assert "# alpha notes" not in chains.packed.inputs[0]["files"]  # the files were sent compacted
+    assert [entry["packed"] for entry in entries] == [True, True]
+    assert entries[0]["result"] == "line 17 adds the wrong constant."
+    assert entries[1]["result"] == "lines 13-21 repeat the same logic."
+    # The stored result is the remapped one
+    stored = project_scanner.analysis_index.lookup(source("alpha"), "bugs", exact_only=True)
+    assert stored["result"] == "line 17 adds the wrong constant."
+
+
+def test_file_missing_from_packed_answer_is_retried_alone(chains):
+    chains.single = FakeChain(lambda inputs: "line 3 never handles None.")
+    chains.packed = FakeChain(lambda inputs: "### FILE f0\nNo issues found.")
+
+    entries = scan(["alpha", "beta"], cascade=False, compact=True)
+
+    assert [entry["packed"] for entry in entries] == [True, False]
+    assert len(chains.single.inputs) == 1
+    assert entries[1]["result"] == "line 21 never handles None."
+
+
+def test_escalated_slice_is_numbered_with_original_lines(chains):
+    chains.triage = FakeChain(lambda inputs: '{"verdict": "suspicious", "regions": '
+                                             '[{"start": 45, "end": 45, "reason": "adds 8"}]}')
+    chains.single = FakeChain(lambda inputs: "line 45 should add 9.")
+
+    entries = scan(["alpha"], compact=True)
+
+    # Triage saw the compacted file with original numbers; the slice keeps the file's own numbers too
+    assert chains.triage.inputs[0]["code"].split("\n")[0] == "13| def alpha_0(value): return value + 0"
+    sent = chains.single.inputs[0]["code"]
+    assert "45| def alpha_8(value):" in sent and "47|     return value + 8" in sent
+    assert "13| def alpha_0" not in sent
+    assert "# Triage flagged lines 45-45: adds 8" in sent
+    assert entries[0]["status"] == "escalated"
+    assert entries[0]["result"] == "line 45 should add 9."
+
+
+def test_files_are_sent_in_ranking_order(chains, monkeypatch):
+    monkeypatch.setattr(project_scanner, "SCAN_MAX_CONCURRENCY", 1)
+    chains.single = FakeChain(lambda inputs: "No issues found.")
+
+    entries = scan(["alpha", "beta", "gamma", "delta"], ranking=[2, 0, 3], cascade=False, pack=False)
+
+    sent = [inputs["code"].split("def ")[1].split("_")[0] for inputs in chains.single.inputs]
+    assert sent == ["gamma", "alpha", "delta", "beta"]  # unranked last
+    assert [entry["path"] for entry in entries] == ["alpha.py", "beta.py", "gamma.py", "delta.py"]
@@ -0,0 +1,50 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from core.chains.conversational import DYNAMIC_CONVERSATIONAL_TEMPLATES
+from core.dependency_context import dependency_messages
+from core.prompt_layout import layout_prompt
+
+ANALYSIS_TEMPLATE = """You are a Python reviewer. Report bugs with line numbers.
+
+Code to analyze:
+{code}
+
+Be concise."""
+
+
+def render(prompt, **inputs):
+    return [(message.type, message.content) for message in prompt.format_messages(**inputs)]
+
+
+def test_chat_requests_share_the_leading_messages():
+    prompt = layout_prompt(DYNAMIC_CONVERSATIONAL_TEMPLATES["general"]["beginner"])
+    first = render(prompt, code="def add(a, b):\n    return a + b", question="What does add do?",
+                   history=[HumanMessage("hi"), AIMessage("hello")])
+    second = render(prompt, code="class Stack:\n    items = {}", question="Is Stack safe?",
+                    history=[HumanMessage("earlier question"), AIMessage("earlier answer"),
+                             HumanMessage("another"), AIMessage("reply")])
+
+    # Different code and history: the instructions are byte-identical and lead both prompts
+    assert first[0][0] == "system"
+    assert first[0] == second[0]
+    assert "def add" not in first[0][1] and "What does add do?" not in first[0][1]
+
+    # Later turns on the same code extend the earlier prompt instead of changing its start
+    turn_1 = render(prompt, code="def add(a, b):\n    return a + b", question="q1", history=[])
+    turn_2 = render(prompt, code="def add(a, b):\n    return a + b", question="q2",
+                    history=[HumanMessage("q1"), AIMessage("a1")])
+    assert turn_2[:len(turn_1) - 1] == turn_1[:-1]
+    assert turn_2[-1] == ("human", turn_1[-1][1].replace("q1", "q2"))
+
+
+def test_analysis_requests_share_the_leading_messages():
+    prompt = layout_prompt(ANALYSIS_TEMPLATE, context="Detected risk areas:\n- dict literal {}")
+    plain = render(prompt, code="x = 1")
+    with_dependencies = render(prompt, code="import util\nx = util.f()",
+                               dependencies=dependency_messages("--- util.py ---\ndef f(): ..."))
+
+    assert plain[0] == with_dependencies[0]
+    assert plain[0][0] == "system" and "x = 1" not in plain[0][1]
+    # The code comes right after the instructions; module summaries only after the code
+    assert with_dependencies[1][0] == "human" and "import util" in with_dependencies[1][1]
+    assert "<imported_modules>" in with_dependencies[-1][1]
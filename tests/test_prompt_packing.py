@@ -0,0 +1,21 @@
+from core.prompt_packing import pack_items, render_files, split_sections
+
+
+def test_pack_items_respects_the_budget_and_file_limit():
+    groups = pack_items([("a", 3000), ("b", 2500), ("c", 4000), ("d", 7000), ("e", 100)], budget=6000, max_items=2)
+
+    assert groups == [["d"], ["c", "e"], ["a", "b"]]  # first fit, largest first; oversized files alone
+    sizes = {"a": 3000, "b": 2500, "c": 4000, "d": 7000, "e": 100}
+    assert all(sum(sizes[key] for key in group) <= 6000 for group in groups if len(group) > 1)
+    assert pack_items([(key, 10) for key in "abcde"], budget=6000, max_items=2) == [["a", "b"], ["c", "d"], ["e"]]
+
+
+def test_render_and_split_round_trip():
+    rendered = render_files([("f0", "a.py", "x = 1"), ("f1", "pkg/b.py", "y = 2")])
+    assert rendered == ("===== FILE f0: a.py =====\nx = 1\n===== END FILE f0 =====\n\n"
+                        "===== FILE f1: pkg/b.py =====\ny = 2\n===== END FILE f1 =====")
+
+    answer = ("Overview first.\n### FILE f0 (a.py)\nline 1 shadows x.\n"
+              "## FILE f1\n\n### FILE f7\nnot asked for\n### FILE f0\nrepeated section")
+    # Unknown ids are ignored, empty sections left out for a retry, the first section of an id wins
+    assert split_sections(answer, ["f0", "f1"]) == {"f0": "line 1 shadows x."}
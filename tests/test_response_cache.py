@@ -0,0 +1,44 @@
+import asyncio
+import threading
+
+from core import response_cache
+from core.response_cache import ChatResponseCache
+
+CODE = "def add(a, b):\n    return a + b\n"
+
+
+class FakeEmbedder:
+    """Embeds by word counts over a fixed vocabulary, recording the thread it ran on"""
+
+    def __init__(self):
+        self.threads = []
+
+    def embed_query(self, text):
+        self.threads.append(threading.get_ident())
+        return [float(text.split().count(word)) for word in ("what", "add", "return", "bug")]
+
+
+def test_embeddings_run_off_the_event_loop():
+    cache = ChatResponseCache()
+    cache._embeddings = embedder = FakeEmbedder()
+
+    async def _run():
+        await cache.astore(CODE, "gpt-4o", "What does add return?", "a + b", "s1")
+        return await cache.alookup(CODE, "gpt-4o", "what does add return", "s1"), \
+            await cache.alookup(CODE, "gpt-4o", "What does add really return?", "s1")
+
+    exact, similar = asyncio.run(_run())
+    assert exact["similarity"] == 1.0 and similar["answer"] == "a + b"
+    assert embedder.threads and threading.get_ident() not in embedder.threads
+
+
+def test_bypassed_sessions_are_bounded(monkeypatch):
+    monkeypatch.setattr(response_cache, "CHAT_CACHE_MAX_BYPASS_SESSIONS", 2)
+    cache = ChatResponseCache()
+    for session in ("s1", "s2", "s3"):
+        cache.set_bypass(session, True)
+    cache.set_bypass("s2", None)  # keeps the current setting
+
+    assert [cache.is_bypassed(session) for session in ("s1", "s2", "s3")] == [False, True, True]
+    cache.set_bypass("s2", False)
+    assert not cache.is_bypassed("s2") and cache.is_bypassed("s3")
@@ -0,0 +1,34 @@
+import sqlite3
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from core.sqlite_history import SQLiteChatMessageHistory
+
+
+@pytest.fixture
+def history(tmp_path):
+    return SQLiteChatMessageHistory("s1", path=str(tmp_path / "chat.sqlite3"), window_turns=None, window_tokens=None)
+
+
+def test_add_messages_is_one_transaction(history):
+    history.add_messages([HumanMessage("q1"), AIMessage("a1")])
+    # Any row of the batch failing must leave none of it behind
+    history._connection.execute("""CREATE TEMP TRIGGER reject_marked BEFORE INSERT ON chat_messages
+                                   WHEN NEW.message LIKE '%reject me%'
+                                   BEGIN SELECT RAISE(ABORT, 'rejected'); END""")
+    with pytest.raises(sqlite3.IntegrityError):
+        history.add_messages([HumanMessage("q2"), AIMessage("reject me")])
+
+    assert [m.content for m in history.get_all()] == ["q1", "a1"]
+    assert not history._connection.in_transaction
+    history.add_messages([HumanMessage("q3")])
+    assert [m.content for m in history.get_all()] == ["q1", "a1", "q3"]
+
+
+def test_compact_keeps_the_newest_messages(history):
+    history.add_messages([HumanMessage(f"m{i}") for i in range(10)])
+    assert history.compact(keep_last=3) == 7
+    assert [m.content for m in history.get_all()] == ["m7", "m8", "m9"]
+    history.clear()
+    assert history.get_all() == []
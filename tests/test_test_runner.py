@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+from core import test_runner
+from core.test_runner import extract_test_files, point_imports_at_target, run_generated_tests
+
+
+def test_guessed_imports_are_pointed_at_the_target_module():
+    test_code = """from __future__ import annotations
+import os
+import pytest
+import calculator
+from your_module import add, divide as div
+from .helpers import make
+
+
+def test_add():
+    from main import add
+    assert add(1, 2) == 3"""
+
+    assert point_imports_at_target(test_code) == """from __future__ import annotations
+from target import *  # the code under test
+import os
+import pytest
+import target as calculator
+from target import add, divide as div
+from target import make
+
+
+def test_add():
+    from target import add
+    assert add(1, 2) == 3"""
+
+
+def test_imports_left_alone():
+    # Mixed imports keep their known modules; code that does not parse is returned unchanged
+    assert point_imports_at_target("import os, calculator\nfrom target import add") == (
+        "from target import *  # the code under test\nimport os, calculator\nfrom target import add")
+    assert point_imports_at_target("def test_x(:\n    pass") == "def test_x(:\n    pass"
+
+
+def test_only_blocks_defining_tests_are_run(monkeypatch):
+    answer = ("```python\ndef add(a, b):\n    return a + b\n```\n"
+              "```python\nimport calculator\n\ndef test_add():\n    assert calculator.add(1, 2) == 3\n```")
+    assert extract_test_files(answer) == ["import calculator\n\ndef test_add():\n    assert calculator.add(1, 2) == 3\n"]
+
+    sent = []
+
+    async def arun(kind, files, args):
+        sent.append(files)
+        return {"status": "completed", "wall_time": 0.2, "result": {"exit_code": 0, "tests": [
+            {"nodeid": "test_generated_1.py::test_add", "outcome": "passed", "duration": 0.001, "message": ""}]}}
+
+    monkeypatch.setattr(test_runner, "sandbox_pool", SimpleNamespace(available=True, arun=arun))
+    result = asyncio.run(run_generated_tests("def add(a, b):\n    return a + b\n", answer))
+
+    assert sent[0]["target.py"] == "def add(a, b):\n    return a + b\n"
+    assert "import target as calculator" in sent[0]["test_generated_1.py"]
+    assert (result["status"], result["passed"], result["failed"], result["errors"]) == ("completed", 1, 0, 0)
+    assert asyncio.run(run_generated_tests("x = 1", "No tests here."))["status"] == "no_tests"